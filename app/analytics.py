@@ -1,10 +1,27 @@
 from __future__ import annotations
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Sequence
 import calendar
+import threading
+import numpy as np
 import pandas as pd
 from app.kpis import FilterCtx
+from app.dataset import OrdersDataset
+from app.backends import LINES, Backend, PandasBackend
+from app.cube import APPROX_ORDERS
+from app.hll import HLL_P, Sketches, estimate, rel_error
+from app.perf import timed
 
-def apply_filters(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp, fctx: FilterCtx) -> pd.DataFrame:
+@timed()
+def apply_filters(df: pd.DataFrame | OrdersDataset, start: pd.Timestamp, end: pd.Timestamp, fctx: FilterCtx) -> pd.DataFrame:
+    """Rows in [start, end] matching the filter, as a frame independent of `df` for any input.
+
+    `df` may also be a Backend, which then reads just these rows.
+    """
+    if isinstance(df, OrdersDataset):
+        return df.window(start, end, fctx).copy()
+    if not isinstance(df, pd.DataFrame):
+        return df.filter(start, end, fctx)
     m = (df["order_date"] >= start) & (df["order_date"] <= end)
     if fctx.category:
         m &= df["category"] == fctx.category
@@ -17,33 +34,107 @@ def daily_revenue(df: pd.DataFrame) -> pd.Series:
         return pd.Series(dtype=float)
     return df.groupby(df["order_date"].dt.date)["revenue"].sum()
 
+def previous_period(start: pd.Timestamp, end: pd.Timestamp):
+    period_len = (end - start).days + 1
+    return (start - pd.Timedelta(days=period_len), start - pd.Timedelta(days=1))
+
 def yoy_period(start: pd.Timestamp, end: pd.Timestamp):
     return (start - pd.DateOffset(years=1), end - pd.DateOffset(years=1))
 
-def mix_table(cur: pd.DataFrame, prev: Optional[pd.DataFrame], by: str = "category", top_n: int = 10) -> pd.DataFrame:
-    if cur.empty or by not in cur.columns:
-        return pd.DataFrame(columns=["segment","revenue_cur","share_cur","share_prev","delta_share"])
-    cur_rev = cur.groupby(by, dropna=False)["revenue"].sum()
-    total_cur = float(cur_rev.sum()) or 1.0
-    df_cur = (cur_rev / total_cur).rename("share_cur").to_frame()
-    df_cur["revenue_cur"] = cur_rev
-
-    if prev is not None and not prev.empty and by in prev.columns:
-        prev_rev = prev.groupby(by, dropna=False)["revenue"].sum()
-        total_prev = float(prev_rev.sum()) or 1.0
-        df_prev = (prev_rev / total_prev).rename("share_prev").to_frame()
-        joined = df_cur.join(df_prev, how="outer").fillna(0.0)
-        joined["delta_share"] = joined["share_cur"] - joined["share_prev"]
+SEGMENT_DIMS = ("category", "store", "product")
+DRILL = {"category": "product", "store": "category"}  # next level shown when drilling into a segment
+_SEG_VALUES = ["revenue_cur", "revenue_prev", "quantity_cur", "quantity_prev", "lines_cur", "lines_prev"]
+_MIX_COLS = ["segment", "revenue_cur", "share_cur", "share_prev", "delta_share"]
+
+@dataclass
+class SegmentAgg:
+    """Revenue, quantity and line counts of the current/previous slices at the finest grain of `dims`.
+
+    Built with one grouped pass per slice; any coarser grouping, or the next level inside one
+    segment (category → product, ...), is a sum over these few rows instead of a rescan.
+    """
+    leaf: pd.DataFrame
+    dims: tuple
+    has_prev: bool
+
+    def rollup(self, by: str | Sequence[str], where: Optional[dict] = None) -> pd.DataFrame:
+        """Summed `revenue_*`, `quantity_*` and `lines_*` per `by`, optionally inside `where` ({dim: value})."""
+        leaf = self.leaf
+        for k, v in (where or {}).items():
+            leaf = leaf[leaf[k] == v]
+        by = [by] if isinstance(by, str) else list(by)
+        return leaf.groupby(by, dropna=False, observed=True, sort=True)[_SEG_VALUES].sum()
+
+@timed()
+def segment_agg(cur: pd.DataFrame, prev: Optional[pd.DataFrame], dims: Sequence[str] = SEGMENT_DIMS) -> SegmentAgg:
+    """Aggregate both slices once by all of `dims` (those present in `cur`)."""
+    dims = tuple(d for d in dims if d in cur.columns)
+    has_prev = prev is not None and not prev.empty and all(d in prev.columns for d in dims)
+    if not dims or cur.empty:
+        return SegmentAgg(pd.DataFrame(columns=[*dims, *_SEG_VALUES]), dims, has_prev)
+
+    def side(df: pd.DataFrame, tag: str) -> pd.DataFrame:
+        g = df.groupby(list(dims), dropna=False, observed=True)
+        out = g[[c for c in ("revenue", "quantity") if c in df.columns]].sum()
+        out["lines"] = g.size()
+        return out.reindex(columns=["revenue", "quantity", "lines"], fill_value=0).add_suffix(f"_{tag}")
+
+    leaf = side(cur, "cur")
+    if has_prev:
+        leaf = leaf.join(side(prev, "prev"), how="outer")
+    else:
+        leaf = leaf.assign(revenue_prev=0.0, quantity_prev=0, lines_prev=0)
+    leaf = leaf.fillna(0).astype({"lines_cur": "int64", "lines_prev": "int64"})
+    return SegmentAgg(leaf.reset_index()[[*dims, *_SEG_VALUES]], dims, has_prev)
+
+def segment_agg_windows(backend: Backend, cur: tuple, prev: Optional[tuple],
+                        dims: Sequence[str] = SEGMENT_DIMS) -> SegmentAgg:
+    """`segment_agg` of two (start, end, FilterCtx) windows, summed by `backend` without fetching rows."""
+    dims = tuple(dims)
+
+    def side(window: tuple, tag: str) -> pd.DataFrame:
+        out = backend.group_sum(*window, by=list(dims), value=["revenue", "quantity", LINES])
+        return out.add_suffix(f"_{tag}")
+
+    leaf = side(cur, "cur")
+    p = side(prev, "prev") if prev is not None else None
+    has_prev = p is not None and not p.empty
+    if leaf.empty:
+        return SegmentAgg(pd.DataFrame(columns=[*dims, *_SEG_VALUES]), dims, has_prev)
+    if has_prev:
+        leaf = leaf.join(p, how="outer")
     else:
-        joined = df_cur
-        joined["share_prev"] = 0.0
-        joined["delta_share"] = joined["share_cur"]
+        leaf = leaf.assign(revenue_prev=0.0, quantity_prev=0, lines_prev=0)
+    leaf = leaf.fillna(0).astype({"lines_cur": "int64", "lines_prev": "int64"})
+    return SegmentAgg(leaf.reset_index()[[*dims, *_SEG_VALUES]], dims, has_prev)
 
-    out = joined.reset_index().rename(columns={by: "segment"})
+def mix_from_agg(agg: SegmentAgg, by: str = "category", top_n: int = 10,
+                 where: Optional[dict] = None) -> pd.DataFrame:
+    """Share of revenue per `by` segment, current vs previous (within `where` when drilling down)."""
+    if by not in agg.dims or agg.leaf.empty:
+        return pd.DataFrame(columns=_MIX_COLS)
+    r = agg.rollup(by, where)
+    if not agg.has_prev:
+        r = r[r["lines_cur"] > 0]
+    out = pd.DataFrame({"revenue_cur": r["revenue_cur"],
+                        "share_cur": r["revenue_cur"] / (float(r["revenue_cur"].sum()) or 1.0)})
+    if agg.has_prev:
+        out["share_prev"] = r["revenue_prev"] / (float(r["revenue_prev"].sum()) or 1.0)
+    else:
+        out["share_prev"] = 0.0
+    out["delta_share"] = out["share_cur"] - out["share_prev"]
+    out = out.reset_index().rename(columns={by: "segment"})
     out["abs_delta_share"] = out["delta_share"].abs()
     out = out.sort_values(["abs_delta_share","revenue_cur"], ascending=[False, False]).head(top_n)
-    return out[["segment","revenue_cur","share_cur","share_prev","delta_share"]]
+    return out[_MIX_COLS]
 
+@timed()
+def mix_table(cur: pd.DataFrame, prev: Optional[pd.DataFrame], by: str = "category", top_n: int = 10) -> pd.DataFrame:
+    if cur.empty or by not in cur.columns:
+        return pd.DataFrame(columns=_MIX_COLS)
+    return mix_from_agg(segment_agg(cur, prev, (by,)), by, top_n)
+
+@timed()
 def price_volume_bridge(cur: pd.DataFrame, prev: Optional[pd.DataFrame]) -> pd.DataFrame:
     if prev is None or cur.empty or prev.empty:
         return pd.DataFrame(columns=["component","value"])
@@ -64,6 +155,69 @@ def price_volume_bridge(cur: pd.DataFrame, prev: Optional[pd.DataFrame]) -> pd.D
         "value":     [prev_rev,            vol_effect,     price_effect,   interaction,   cur_rev,           delta_rev]
     })
 
+PVM_EFFECTS = ["volume", "mix", "price", "new", "lost"]
+_PVM_LABELS = {"volume": "Volume effect", "mix": "Mix effect", "price": "Price effect",
+               "new": "New items", "lost": "Lost items"}
+
+@timed()
+def pvm_bridge(agg: SegmentAgg) -> pd.DataFrame:
+    """Price/volume/mix effects per item (a leaf row of `agg`: category × store × product).
+
+    For items sold in both slices, with total quantities Q and item shares s = q / Q taken over
+    those continuing items, and unit prices p = revenue / quantity:
+    volume = (Qc - Qp)·s_p·p_p, mix = Qc·(s_c - s_p)·p_p, price = q_c·(p_c - p_p).
+    Items sold in only one slice go to `new` / `lost`, so the effects of every item add up to
+    its revenue change (`delta`). Pure array arithmetic over the aligned aggregates.
+    """
+    leaf = agg.leaf
+    cols = [*agg.dims, *PVM_EFFECTS, "delta"]
+    if leaf.empty or not agg.has_prev:
+        return pd.DataFrame(columns=cols)
+    qc, qp = leaf["quantity_cur"].to_numpy(float), leaf["quantity_prev"].to_numpy(float)
+    rc, rp = leaf["revenue_cur"].to_numpy(float), leaf["revenue_prev"].to_numpy(float)
+    both = (qc > 0) & (qp > 0)
+    Qc, Qp = qc[both].sum(), qp[both].sum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pc, pp = np.where(both, rc / qc, 0.0), np.where(both, rp / qp, 0.0)
+        sc, sp = np.where(both, qc / Qc, 0.0), np.where(both, qp / Qp, 0.0)
+    out = leaf[list(agg.dims)].copy()
+    out["volume"] = (Qc - Qp) * sp * pp
+    out["mix"] = Qc * (sc - sp) * pp
+    out["price"] = np.where(both, qc * (pc - pp), 0.0)
+    out["new"] = np.where(~both & (qp <= 0), rc - rp, 0.0)
+    out["lost"] = np.where(~both & (qp > 0), rc - rp, 0.0)
+    out["delta"] = rc - rp
+    return out[cols]
+
+def pvm_summary(items: pd.DataFrame, agg: SegmentAgg) -> pd.DataFrame:
+    """Bridge from previous to current revenue: one row per effect (same layout as price_volume_bridge)."""
+    if items.empty:
+        return pd.DataFrame(columns=["component", "value"])
+    prev_rev, cur_rev = float(agg.leaf["revenue_prev"].sum()), float(agg.leaf["revenue_cur"].sum())
+    return pd.DataFrame({
+        "component": ["Previous revenue", *(_PVM_LABELS[e] for e in PVM_EFFECTS), "Current revenue", "Δ Revenue"],
+        "value": [prev_rev, *(float(items[e].sum()) for e in PVM_EFFECTS), cur_rev, cur_rev - prev_rev],
+    })
+
+def pvm_rollup(items: pd.DataFrame, by: str | Sequence[str] = "category") -> pd.DataFrame:
+    """Effects summed per `by` (e.g. category, store or product), largest |Δ revenue| first."""
+    by = [by] if isinstance(by, str) else list(by)
+    if items.empty:
+        return pd.DataFrame(columns=[*by, *PVM_EFFECTS, "delta"])
+    out = items.groupby(by, dropna=False, observed=True)[[*PVM_EFFECTS, "delta"]].sum().reset_index()
+    return out.iloc[np.argsort(-out["delta"].abs().to_numpy(), kind="stable")].reset_index(drop=True)
+
+def pvm_top(items: pd.DataFrame, effect: str, n: int = 10, by: str = "product") -> pd.DataFrame:
+    """The `n` items (products by default, summed over stores) contributing most to `effect`, by magnitude."""
+    if effect not in PVM_EFFECTS:
+        raise ValueError(f"unknown effect: {effect}")
+    r = pvm_rollup(items, by)
+    if r.empty:
+        return r
+    mag = r[effect].abs().to_numpy()
+    top = np.argsort(-mag, kind="stable")[: min(n, int((mag > 0).sum()))]
+    return r.iloc[top].reset_index(drop=True)
+
 def zscore_last_day(series: pd.Series) -> Optional[float]:
     if series is None or len(series) < 2:
         return None
@@ -87,27 +241,148 @@ def _fiscal_alias_from_start(start_month: int) -> str:
     end_abbr = calendar.month_abbr[end_month].upper()
     return f"Q-{end_abbr}"
 
+def _month_period(m: int) -> pd.Period:
+    # m: months since 1970-01 (numpy datetime64[M] ordinal)
+    return pd.Period(year=1970 + m // 12, month=m % 12 + 1, freq="M")
+
+_SIG_COLS = ("order_id", "order_date", "category", "store", "revenue")
+
+class QuarterlyCache:
+    """Incremental quarter aggregates for `quarterly_report`.
+
+    Keeps month × category × store partials (revenue, line counts and the distinct
+    (category, store, order_id) triples) tagged with a month signature: the row count and an
+    order-independent sum of row hashes over every key column, so edits to any label or
+    amount are caught. Each refresh rescans only months whose signature changed, i.e. new or
+    appended data, normally just the open quarter. Callers that know the dataset `version`
+    pass it, and the refresh (an O(rows) hashing pass) is skipped while it is unchanged. Quarter rows are cached per (fiscal alias,
+    filter) and rebuilt only when one of their months changed; toggling the fiscal start or
+    the filter reuses the month partials.
+
+    With `approx_orders` (default: APPROX_DISTINCT_ORDERS=1) each month keeps HyperLogLog
+    sketches per category × store instead of the order triples, and quarter orders are
+    estimates within `orders_rel_error`.
+    """
+
+    def __init__(self, approx_orders: Optional[bool] = None, precision: int = HLL_P):
+        self.approx_orders = APPROX_ORDERS if approx_orders is None else approx_orders
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._sig: dict[int, tuple] = {}
+        self._cells: dict[int, pd.DataFrame] = {}
+        self._orders: dict[int, pd.DataFrame] = {}
+        self._quarters: dict[tuple, dict] = {}
+        self._version = None
+        self.months_scanned = 0
+
+    def _refresh(self, frame: pd.DataFrame, version=None) -> None:
+        month = frame["order_date"].to_numpy().astype("datetime64[M]").astype(np.int64)
+        sig = {}
+        if len(month):
+            cols = [c for c in _SIG_COLS if c in frame.columns]
+            h = pd.util.hash_pandas_object(frame[cols], index=False).to_numpy()
+            order = np.argsort(month, kind="stable")
+            ms, hs = month[order], h[order]
+            starts = np.r_[0, np.flatnonzero(np.diff(ms)) + 1]
+            sums = np.add.reduceat(hs, starts)  # uint64, wraps: independent of row order
+            counts = np.diff(np.r_[starts, len(ms)])
+            sig = {int(ms[i]): (int(c), int(v)) for i, c, v in zip(starts, counts, sums)}
+        stale = [m for m, v in sig.items() if self._sig.get(m) != v]
+        for m in set(self._sig) - set(sig):
+            self._cells.pop(m, None)
+            self._orders.pop(m, None)
+        if stale:
+            hit = np.isin(month, stale)
+            rows, keys = frame[hit], pd.Series(month[hit], index=frame.index[hit], name="month")
+            g = rows.groupby([keys, rows["category"], rows["store"]], dropna=False, observed=True)
+            cells = g["revenue"].agg(["sum", "size"]).rename(columns={"sum": "revenue", "size": "lines"}).reset_index()
+            cell_parts = dict(tuple(cells.groupby("month")))
+            if self.approx_orders:
+                # one sketch per cell; a month's cells keep their row labels in `cells` as sketch groups
+                sk = Sketches.build(g.ngroup().to_numpy(), rows["order_id"], self.precision)
+                order_parts, empty = dict.fromkeys(stale, sk), sk
+            else:
+                ords = pd.DataFrame({"month": keys, "category": rows["category"], "store": rows["store"],
+                                     "order_id": rows["order_id"]}).dropna(subset=["order_id"]).drop_duplicates()
+                order_parts, empty = dict(tuple(ords.groupby("month"))), ords.iloc[0:0]
+            for m in stale:
+                self._cells[m] = cell_parts.get(m, cells.iloc[0:0])
+                self._orders[m] = order_parts.get(m, empty)
+            self.months_scanned += len(stale)
+        self._sig = sig
+        self._version = version
+
+    @property
+    def orders_rel_error(self) -> float:
+        return rel_error(self.precision) if self.approx_orders else 0.0
+
+    def _distinct_orders(self, months: list, fctx: FilterCtx) -> int:
+        if not self.approx_orders:
+            return int(pd.concat([self._match(self._orders[m], fctx) for m in months])["order_id"].nunique())
+        regs = np.zeros(1 << self.precision, dtype=np.uint8)
+        for m in months:
+            self._orders[m].dense(self._match(self._cells[m], fctx).index.to_numpy(), out=regs)
+        return int(round(estimate(regs)))
+
+    @staticmethod
+    def _match(part: pd.DataFrame, fctx: FilterCtx) -> pd.DataFrame:
+        if fctx.category:
+            part = part[part["category"] == fctx.category]
+        if fctx.store:
+            part = part[part["store"] == fctx.store]
+        return part
+
+    def period_agg(self, df: pd.DataFrame | OrdersDataset | None, fctx: FilterCtx, alias: str,
+                   version=None) -> pd.DataFrame:
+        """Same frame as `Backend.period_agg(fctx, alias)`, served from cached partials.
+
+        With an unchanged `version`, `df` is not touched and may be None.
+        """
+        with self._lock:
+            if version is None or version != self._version:
+                self._refresh(df.df if isinstance(df, OrdersDataset) else df, version)
+            cached = self._quarters.setdefault((alias, fctx.category, fctx.store), {})
+            by_q: dict = {}
+            for m in sorted(self._sig):
+                by_q.setdefault(_month_period(m).asfreq(alias), []).append(m)
+            rows = {}
+            for q, months in by_q.items():
+                tag = tuple((m, self._sig[m]) for m in months)
+                if q not in cached or cached[q][0] != tag:
+                    cells = pd.concat([self._match(self._cells[m], fctx) for m in months])
+                    cached[q] = (tag, float(cells["revenue"].sum()), int(cells["lines"].sum()),
+                                 self._distinct_orders(months, fctx))
+                _, rev, lines, n_orders = cached[q]
+                if lines:
+                    rows[q] = (rev, n_orders)
+            for q in set(cached) - set(by_q):
+                del cached[q]
+        idx = pd.PeriodIndex(sorted(rows), freq=alias, name="period")
+        return pd.DataFrame({"revenue": [rows[q][0] for q in idx], "orders": [rows[q][1] for q in idx]},
+                            index=idx)
+
+@timed()
 def quarterly_report(
-    df: pd.DataFrame, fctx: FilterCtx, n_quarters: int = 8, fiscal_start_month: int = 1
+    df: pd.DataFrame | OrdersDataset | None, fctx: FilterCtx, n_quarters: int = 8, fiscal_start_month: int = 1,
+    backend: Optional[Backend] = None, cache: Optional[QuarterlyCache] = None, version=None,
 ) -> pd.DataFrame:
-    """Quarterly revenue, orders (unique order_id), AOV, with QoQ% and YoY% (fiscal-aware)."""
-    if df.empty:
-        return pd.DataFrame(columns=["quarter","revenue","orders","aov","qoq_pct","yoy_pct"])
-
-    # filter by category/store across full date span
-    start, end = df["order_date"].min(), df["order_date"].max()
-    dff = apply_filters(df, start, end, fctx)
-    if dff.empty:
-        return pd.DataFrame(columns=["quarter","revenue","orders","aov","qoq_pct","yoy_pct"])
+    """Quarterly revenue, orders (unique order_id), AOV, with QoQ% and YoY% (fiscal-aware).
 
-    dff = dff.copy()
+    Aggregation runs on `backend` when given (e.g. DuckDB over the Parquet files), else from
+    `cache` (incremental, see QuarterlyCache; `version` lets it skip unchanged data) or in
+    pandas on `df`.
+    """
     # Fiscal quarter alias (e.g., 'Q-MAR' for FY starting April)
     alias = _fiscal_alias_from_start(int(fiscal_start_month))
-    dff["qtr"] = dff["order_date"].dt.to_period(alias)
+    if backend is None and cache is not None:
+        agg = cache.period_agg(df, fctx, alias, version)
+    else:
+        agg = (backend or PandasBackend(df)).period_agg(fctx, alias)
+    if agg.empty:
+        return pd.DataFrame(columns=["quarter","revenue","orders","aov","qoq_pct","yoy_pct"])
 
-    # aggregates
-    rev = dff.groupby("qtr")["revenue"].sum()
-    ords = dff.groupby("qtr")["order_id"].nunique()
+    rev = agg["revenue"]
+    ords = agg["orders"]
     aov = rev / ords.replace({0: pd.NA})
 
     out = pd.DataFrame({"revenue": rev, "orders": ords, "aov": aov})
@@ -115,7 +390,7 @@ def quarterly_report(
     out["qoq_pct"] = out["revenue"].pct_change()      # vs previous quarter (fiscal-aware)
     out["yoy_pct"] = out["revenue"].pct_change(4)     # vs same fiscal quarter last year
 
-    out = out.reset_index().rename(columns={"qtr": "quarter"})
+    out = out.reset_index().rename(columns={"period": "quarter"})
     out["quarter"] = out["quarter"].apply(_quarter_str)
     out = out.sort_values("quarter").tail(n_quarters).reset_index(drop=True)
     return out
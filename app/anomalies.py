@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from .perf import timed
+
+KEYS = ["category", "store"]
+METHODS = {
+    "rolling": "z-score vs the trailing window mean/std",
+    "seasonal": "z-score vs the same weekday over the trailing weeks",
+    "robust": "robust z-score vs the trailing window median/MAD",
+}
+_ROBUST_CHUNK = 4_000_000  # window cells materialized at once by the median/MAD pass
+
+def segment_daily(df: pd.DataFrame, value: str = "revenue") -> pd.DataFrame:
+    """Day × category × store sums (the same shape as the KPI cube's cells)."""
+    day = pd.to_datetime(df["order_date"]).dt.normalize().rename("day")
+    g = df.groupby([day, df["category"], df["store"]], observed=True, sort=False, dropna=False)
+    return g[value].sum().reset_index()
+
+def series_matrix(cells: pd.DataFrame, value: str = "revenue") -> Tuple[pd.DatetimeIndex, pd.DataFrame, np.ndarray]:
+    """(days, series keys, values) with one dense row per category × store; missing days are 0."""
+    day = pd.to_datetime(cells["day"]).to_numpy("datetime64[D]")
+    d0 = day.min()
+    n_days = int((day.max() - d0).astype(np.int64)) + 1
+    g = cells.groupby(KEYS, observed=True, sort=True, dropna=False)
+    sid = g.ngroup().to_numpy()
+    keys = g.size().index.to_frame(index=False)
+    flat = sid.astype(np.int64) * n_days + (day - d0).astype(np.int64)
+    x = np.bincount(flat, weights=cells[value].to_numpy(dtype=float), minlength=len(keys) * n_days)
+    return pd.date_range(pd.Timestamp(d0), periods=n_days, freq="D"), keys, x.reshape(len(keys), n_days)
+
+def _trailing_mean_std(x: np.ndarray, window: int, min_periods: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean/std of the `window` values before each column (the column itself excluded), via cumsums."""
+    n = x.shape[1]
+    c1 = np.zeros((x.shape[0], n + 1))
+    c2 = np.zeros((x.shape[0], n + 1))
+    np.cumsum(x, axis=1, out=c1[:, 1:])
+    np.cumsum(x * x, axis=1, out=c2[:, 1:])
+    t = np.arange(n)
+    lo = np.maximum(t - window, 0)
+    cnt = (t - lo).astype(float)
+    s1, s2 = c1[:, t] - c1[:, lo], c2[:, t] - c2[:, lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / cnt
+        sd = np.sqrt(np.maximum(s2 - s1 * mean, 0.0) / (cnt - 1))
+    short = cnt < max(min_periods, 2)
+    mean[:, short] = np.nan
+    sd[:, short] = np.nan
+    return mean, sd
+
+def _sorted_median(s: np.ndarray) -> np.ndarray:
+    # sorting short windows is much faster than np.median's partition on a strided view
+    k = s.shape[-1]
+    return s[..., k // 2] if k % 2 else 0.5 * (s[..., k // 2 - 1] + s[..., k // 2])
+
+def _trailing_median_mad(x: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Median/MAD of the full `window` values before each column, in series chunks to bound memory."""
+    s, n = x.shape
+    med = np.full((s, n), np.nan)
+    mad = np.full((s, n), np.nan)
+    if n <= window:
+        return med, mad
+    win = sliding_window_view(x, window, axis=1)[:, : n - window]  # win[:, j] = x[:, j:j+window] -> day j+window
+    step = max(1, _ROBUST_CHUNK // ((n - window) * window))
+    for i in range(0, s, step):
+        w = win[i:i + step]
+        m = _sorted_median(np.sort(w, axis=2))
+        med[i:i + step, window:] = m
+        mad[i:i + step, window:] = _sorted_median(np.sort(np.abs(w - m[..., None]), axis=2))
+    return med, mad
+
+def score_matrix(x: np.ndarray, method: str = "rolling", window: int = 28, min_periods: int = 7,
+                 weeks: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+    """(expected, score) for every cell of a series × day matrix; NaN where there is no baseline.
+
+    `seasonal` compares each day with the same weekday over the previous `weeks` weeks;
+    `robust` needs a full window and scores 0.6745 * (x - median) / MAD. Flat baselines
+    (zero spread) are not scored.
+    """
+    if method == "rolling":
+        expected, spread = _trailing_mean_std(x, window, min_periods)
+    elif method == "seasonal":
+        expected, spread = np.full(x.shape, np.nan), np.full(x.shape, np.nan)
+        for r in range(7):  # columns r, r+7, ... share a weekday
+            expected[:, r::7], spread[:, r::7] = _trailing_mean_std(x[:, r::7], weeks, max(3, weeks // 2))
+    elif method == "robust":
+        expected, mad = _trailing_median_mad(x, window)
+        spread = mad / 0.6745
+    else:
+        raise ValueError(f"unknown anomaly method: {method}")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = np.where(spread > 0, (x - expected) / spread, np.nan)
+    return expected, score
+
+@timed()
+def detect_anomalies(cells: pd.DataFrame, method: str = "rolling", window: int = 28, threshold: float = 3.0,
+                     start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                     min_periods: int = 7, weeks: int = 8, value: str = "revenue") -> pd.DataFrame:
+    """Flagged (segment, day) points with |score| >= threshold, most extreme first.
+
+    Every day of every category × store series is scored in one vectorized pass over the
+    whole history in `cells` (see `segment_daily`); `start`/`end` only limit which days
+    can be flagged, baselines still use the days before them.
+    """
+    cols = KEYS + ["day", value, "expected", "score", "direction"]
+    if cells.empty:
+        return pd.DataFrame(columns=cols)
+    days, keys, x = series_matrix(cells, value)
+    expected, score = score_matrix(x, method, window, min_periods, weeks)
+    lo = 0 if start is None else int(days.searchsorted(pd.Timestamp(start).normalize()))
+    hi = len(days) if end is None else int(days.searchsorted(pd.Timestamp(end).normalize(), "right"))
+    with np.errstate(invalid="ignore"):
+        si, di = np.nonzero(np.abs(score[:, lo:hi]) >= threshold)
+    di = di + lo
+    z = score[si, di]
+    out = keys.iloc[si].reset_index(drop=True)
+    out["day"] = days[di]
+    out[value] = x[si, di]
+    out["expected"] = expected[si, di]
+    out["score"] = z
+    out["direction"] = np.where(z > 0, "spike", "drop")
+    order = np.argsort(-np.abs(z), kind="stable")
+    return out.iloc[order].reset_index(drop=True)[cols]
+
+def rank_segments(flags: pd.DataFrame) -> pd.DataFrame:
+    """One row per flagged segment: flag count, worst |score| and its day, latest flagged day."""
+    cols = KEYS + ["flags", "max_abs_score", "worst_day", "last_flag"]
+    if flags.empty:
+        return pd.DataFrame(columns=cols)
+    f = flags.assign(abs_score=flags["score"].abs())
+    g = f.groupby(KEYS, observed=True, sort=False, dropna=False)
+    worst = f.loc[g["abs_score"].idxmax(), KEYS + ["day"]].rename(columns={"day": "worst_day"})
+    out = g.agg(flags=("day", "size"), max_abs_score=("abs_score", "max"), last_flag=("day", "max")).reset_index()
+    out = out.merge(worst, on=KEYS, how="left")
+    return out.sort_values(["max_abs_score", "flags"], ascending=False, kind="stable").reset_index(drop=True)[cols]
@@ -0,0 +1,148 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Optional, Protocol, Sequence, Union
+import pandas as pd
+from app.dataset import OrdersDataset
+from app.kpis import FilterCtx, select_window
+
+LINES = "lines"  # group_sum value: number of order lines (rows) per group
+Columns = Union[str, Sequence[str]]
+
+class Backend(Protocol):
+    """Query primitives the analytics layer needs, independent of where the rows live.
+
+    KPIs (`kpis.compute_kpis`, `top_products`), window slices (`analytics.apply_filters`),
+    segment aggregates and drivers, and the quarterly report accept a backend in place of
+    a frame and run through these calls.
+    """
+    name: str
+    def filter(self, start: pd.Timestamp, end: pd.Timestamp, fctx: FilterCtx,
+               columns: Optional[Sequence[str]] = None) -> pd.DataFrame: ...
+    def group_sum(self, start: pd.Timestamp, end: pd.Timestamp, fctx: FilterCtx,
+                  by: Columns, value: Columns = "revenue") -> pd.Series | pd.DataFrame:
+        """Sums per `by` group: a Series for one value column, a frame for several (LINES counts rows)."""
+    def distinct_count(self, start: pd.Timestamp, end: pd.Timestamp, fctx: FilterCtx,
+                       column: str = "order_id") -> int: ...
+    def period_agg(self, fctx: FilterCtx, freq: str) -> pd.DataFrame: ...
+
+def _period_index(labels: Sequence[str], freq: str) -> pd.PeriodIndex:
+    return pd.PeriodIndex([pd.Period(x, freq=freq) for x in labels], freq=freq, name="period")
+
+class PandasBackend:
+    """In-memory backend over a DataFrame or OrdersDataset."""
+    name = "pandas"
+
+    def __init__(self, df: pd.DataFrame | OrdersDataset):
+        self.df = df
+
+    def _frame(self) -> pd.DataFrame:
+        return self.df.df if isinstance(self.df, OrdersDataset) else self.df
+
+    def filter(self, start, end, fctx, columns=None):
+        d = select_window(self.df, start, end, fctx)
+        return d[list(columns)] if columns else d
+
+    def group_sum(self, start, end, fctx, by, value="revenue"):
+        d = select_window(self.df, start, end, fctx)
+        g = d.groupby(by, dropna=False, observed=True, sort=True)
+        if isinstance(value, str):
+            return g.size().rename(LINES) if value == LINES else g[value].sum()
+        out = g[[v for v in value if v != LINES]].sum()
+        if LINES in value:
+            out[LINES] = g.size()
+        return out[list(value)]
+
+    def distinct_count(self, start, end, fctx, column="order_id"):
+        return int(select_window(self.df, start, end, fctx)[column].nunique())
+
+    def period_agg(self, fctx, freq):
+        """Revenue and distinct orders per period (e.g. 'M' or a fiscal 'Q-MAR'), indexed by Period."""
+        frame = self._frame()
+        if frame.empty:
+            return pd.DataFrame(columns=["revenue", "orders"], index=_period_index([], freq))
+        d = select_window(self.df, frame["order_date"].min(), frame["order_date"].max(), fctx)
+        g = d.groupby(d["order_date"].dt.to_period(freq).rename("period"))
+        return pd.DataFrame({"revenue": g["revenue"].sum(), "orders": g["order_id"].nunique()})
+
+class DuckDBBackend:
+    """Embedded DuckDB over local Parquet (file, glob or Hive-partitioned directory) or a DataFrame.
+
+    Scans are multi-threaded and only the selected columns/row groups are read, so the data
+    does not have to fit in memory.
+    """
+    name = "duckdb"
+
+    def __init__(self, source: str | Path | pd.DataFrame):
+        try:
+            import duckdb
+        except ImportError as e:  # optional dependency
+            raise ImportError("DuckDBBackend needs the 'duckdb' package (pip install duckdb)") from e
+        self.con = duckdb.connect()
+        if isinstance(source, pd.DataFrame):
+            # registered frames are connection-local; materialize so per-query cursors can see it
+            self.con.register("orders_src", source)
+            self.con.execute("CREATE TABLE orders AS SELECT * FROM orders_src")
+            self.con.unregister("orders_src")
+        else:
+            p = Path(source)
+            pattern = str(p / "**" / "*.parquet") if p.is_dir() else str(p)
+            hive = "true" if p.is_dir() else "false"
+            self.con.execute(
+                f"CREATE VIEW orders AS SELECT * FROM read_parquet('{pattern}', hive_partitioning={hive})"
+            )
+        self.columns = self._query("DESCRIBE orders", [])["column_name"].tolist()
+
+    def _where(self, start, end, fctx):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("order_date >= ?")
+            params.append(pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            clauses.append("order_date <= ?")
+            params.append(pd.Timestamp(end).to_pydatetime())
+        for col in ("category", "store"):
+            value = getattr(fctx, col, None)
+            if value:
+                clauses.append(f"CAST({col} AS VARCHAR) = ?")
+                params.append(str(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _query(self, sql: str, params: list) -> pd.DataFrame:
+        # one cursor per query: DuckDB connections must not be shared across Streamlit threads
+        return self.con.cursor().execute(sql, params).df()
+
+    def filter(self, start, end, fctx, columns=None):
+        where, params = self._where(start, end, fctx)
+        cols = ", ".join(columns or [c for c in self.columns if c not in ("year", "month")])
+        return self._query(f"SELECT {cols} FROM orders{where} ORDER BY order_date", params)
+
+    def group_sum(self, start, end, fctx, by, value="revenue"):
+        where, params = self._where(start, end, fctx)
+        keys = [by] if isinstance(by, str) else list(by)
+        values = [value] if isinstance(value, str) else list(value)
+        aggs = ", ".join("COUNT(*) AS lines" if v == LINES else f"SUM({v}) AS {v}" for v in values)
+        cols = ", ".join(keys)
+        out = self._query(f"SELECT {cols}, {aggs} FROM orders{where} GROUP BY {cols} ORDER BY {cols}", params)
+        out = out.set_index(by if isinstance(by, str) else keys)[values]
+        return out[value] if isinstance(value, str) else out
+
+    def distinct_count(self, start, end, fctx, column="order_id"):
+        where, params = self._where(start, end, fctx)
+        return int(self._query(f"SELECT COUNT(DISTINCT {column}) AS n FROM orders{where}", params)["n"].iat[0])
+
+    def period_agg(self, fctx, freq):
+        where, params = self._where(None, None, fctx)
+        if freq == "M":
+            label = "strftime(order_date, '%Y-%m')"
+        elif freq.startswith("Q-"):
+            # pandas fiscal quarters (Q-<end month>): shift forward so the fiscal year starts in January
+            end_month = pd.Timestamp(f"2000-{freq[2:]}-01").month
+            shifted = f"(order_date + INTERVAL {12 - end_month} MONTH)"
+            label = f"CAST(year({shifted}) AS VARCHAR) || 'Q' || CAST(quarter({shifted}) AS VARCHAR)"
+        else:
+            raise ValueError(f"unsupported period frequency: {freq}")
+        out = self._query(
+            f"SELECT {label} AS period, SUM(revenue) AS revenue, COUNT(DISTINCT order_id) AS orders "
+            f"FROM orders{where} GROUP BY 1 ORDER BY 1", params)
+        idx = _period_index(out["period"].tolist(), freq)
+        return pd.DataFrame({"revenue": out["revenue"].to_numpy(), "orders": out["orders"].to_numpy()}, index=idx)
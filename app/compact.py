@@ -0,0 +1,50 @@
+from __future__ import annotations
+import sys
+import numpy as np
+import pandas as pd
+
+ENCODED = ["order_id", "product", "category", "store"]
+
+def compact_orders(df: pd.DataFrame) -> pd.DataFrame:
+    """Dictionary-encode string columns and downcast integral quantities; values are unchanged.
+
+    Prices and revenue stay float64: float32 would round them (19.99 -> 19.98999977) and
+    revenue/price checks downstream would disagree with the source.
+    """
+    out = df.copy()
+    for c in ENCODED:
+        if c in out.columns and not isinstance(out[c].dtype, pd.CategoricalDtype):
+            # near-unique columns (single-line orders) would only grow as categoricals
+            if out[c].nunique(dropna=True) <= len(out) // 2:
+                out[c] = out[c].astype("category")
+    if "quantity" in out.columns:
+        q = out["quantity"]
+        if q.notna().all() and np.array_equal(q, np.round(q)):
+            out["quantity"] = pd.to_numeric(q.astype(np.int64), downcast="integer")
+    return out
+
+def uncompacted_bytes(df: pd.DataFrame) -> pd.Series:
+    """Per-column bytes `df` would take before `compact_orders` (object strings, int64),
+    computed from the compact frame itself so the source needn't be read again."""
+    out = df.memory_usage(deep=True, index=False).astype(np.int64)
+    for c in df.columns:
+        col = df[c]
+        if isinstance(col.dtype, pd.CategoricalDtype) and c in ENCODED:
+            sizes = np.array([sys.getsizeof(v) for v in col.cat.categories], dtype=np.int64)
+            codes = col.cat.codes.to_numpy()
+            out[c] = 8 * len(col) + int(sizes[codes[codes >= 0]].sum())
+        elif c == "quantity" and pd.api.types.is_integer_dtype(col.dtype):
+            out[c] = 8 * len(col)
+    return out
+
+def memory_report(before: pd.DataFrame | pd.Series, after: pd.DataFrame) -> pd.DataFrame:
+    """Per-column memory (MB) before and after compaction, with a total row.
+
+    `before` may also be a Series of per-column bytes (e.g. summed over streamed chunks).
+    """
+    b = before if isinstance(before, pd.Series) else before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False).reindex(b.index)
+    out = pd.DataFrame({"before_mb": b / 1e6, "after_mb": a / 1e6})
+    out.loc["(total)"] = out.sum()
+    out["saved_pct"] = (1 - out["after_mb"] / out["before_mb"].where(out["before_mb"] > 0)) * 100
+    return out.round(3).rename_axis("column").reset_index()
@@ -17,7 +17,7 @@ def trend_chart(df: pd.DataFrame, freq: str = "M"):
     st.plotly_chart(fig, use_container_width=True)
 
 def top_products_bar(df: pd.DataFrame, n: int = 10):
-    g = df.groupby("product", as_index=False).agg(revenue=("revenue","sum"))
+    g = df.groupby("product", as_index=False, observed=True).agg(revenue=("revenue","sum"))
     g = g.sort_values("revenue", ascending=False).head(n)
     fig = px.bar(g, x="product", y="revenue", title=f"Top {n} Products by Revenue")
     st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+from app.hll import HLL_P, Sketches
+
+APPROX_ORDERS = os.getenv("APPROX_DISTINCT_ORDERS") == "1"  # default for build_cube
+
+@dataclass
+class KpiCube:
+    """Day × category × store aggregates of an orders table.
+
+    `cells` holds revenue sums, line counts and per-cell distinct orders, sorted by day.
+    Distinct orders are kept as sorted (cell, order code) pairs so any set of cells can be
+    merged exactly; when every order sits in a single cell the per-cell counts simply add up.
+    In approximate mode (`build_cube(..., approx_orders=True)`) no pairs are kept: each cell
+    has a sparse HyperLogLog sketch instead, and `orders` is an estimate within
+    `orders_rel_error` (relative, ~95%).
+    """
+    cells: pd.DataFrame
+    pair_cell: np.ndarray
+    pair_order: np.ndarray
+    single_cell_orders: bool
+    day_aligned: bool
+    sketches: Optional[Sketches] = None
+
+    @property
+    def orders_rel_error(self) -> float:
+        return self.sketches.rel_error if self.sketches is not None else 0.0
+
+    def supports(self, f) -> bool:
+        # Only category/store live in the cube; intraday timestamps would need the raw rows.
+        extra = [k for k, v in vars(f).items() if v and k not in ("category", "store")]
+        return self.day_aligned and not extra
+
+    def _select(self, start: pd.Timestamp, end: pd.Timestamp, f) -> np.ndarray:
+        days = self.cells["day"].to_numpy()
+        lo = int(days.searchsorted(np.datetime64(pd.Timestamp(start)), "left"))
+        hi = int(days.searchsorted(np.datetime64(pd.Timestamp(end)), "right"))
+        pos = np.arange(lo, max(lo, hi))
+        if f.category:
+            pos = pos[(self.cells["category"].to_numpy()[pos] == f.category)]
+        if f.store:
+            pos = pos[(self.cells["store"].to_numpy()[pos] == f.store)]
+        return pos
+
+    def revenue(self, start: pd.Timestamp, end: pd.Timestamp, f) -> float:
+        pos = self._select(start, end, f)
+        return float(self.cells["revenue"].to_numpy()[pos].sum())
+
+    def orders(self, start: pd.Timestamp, end: pd.Timestamp, f) -> int:
+        pos = self._select(start, end, f)
+        if self.sketches is not None:
+            return int(round(self.sketches.count(pos))) if len(pos) else 0
+        if self.single_cell_orders or len(pos) == 0:
+            return int(self.cells["orders"].to_numpy()[pos].sum())
+        lo = int(self.pair_cell.searchsorted(pos[0], side="left"))
+        hi = int(self.pair_cell.searchsorted(pos[-1], side="right"))
+        cells, codes = self.pair_cell[lo:hi], self.pair_order[lo:hi]
+        return _n_unique(codes[np.isin(cells, pos)])
+
+# np.unique takes a hash path on numpy 2 that is several times slower than sorting int64 keys
+def _sorted_unique(a: np.ndarray) -> np.ndarray:
+    a = np.sort(a)
+    return a[np.r_[True, a[1:] != a[:-1]]] if len(a) else a
+
+def _n_unique(a: np.ndarray) -> int:
+    return int(len(_sorted_unique(a)))
+
+def _dim_codes(col: pd.Series) -> tuple:
+    """(codes with -1 for missing, what decodes them): categoricals reuse their codes."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy().astype(np.int64), col.dtype
+    codes, uniques = pd.factorize(col, sort=True)
+    return codes.astype(np.int64), uniques
+
+def _dim_values(codes: np.ndarray, kind) -> pd.Series:
+    """Labels of `codes`, with code -1 decoded as missing (not as the last label)."""
+    if isinstance(kind, pd.CategoricalDtype):
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=kind))
+    return pd.Series(pd.Categorical.from_codes(codes, categories=kind)).astype(kind.dtype)
+
+def _cells(df: pd.DataFrame, dates: pd.Series) -> tuple:
+    """(cells frame sorted by day, cell id of every row) via integer keys instead of a pandas groupby."""
+    days = dates.to_numpy().astype("datetime64[D]")
+    d0 = days.min() if len(days) else np.datetime64("1970-01-01", "D")
+    dn = (days - d0).astype(np.int64)
+    (cc, ckind), (sc, skind) = _dim_codes(df["category"]), _dim_codes(df["store"])
+    k1, k2 = int(cc.max(initial=-1)) + 2, int(sc.max(initial=-1)) + 2
+    key = (dn * k1 + cc + 1) * k2 + sc + 1
+    uniq = _sorted_unique(key)
+    cell_id = uniq.searchsorted(key)
+    rev = df["revenue"].to_numpy(dtype=float)
+    cells = pd.DataFrame({
+        "day": pd.Series((d0 + uniq // (k1 * k2)).astype("datetime64[D]")).astype(dates.dtype),
+        "category": _dim_values((uniq // k2) % k1 - 1, ckind),
+        "store": _dim_values(uniq % k2 - 1, skind),
+        "revenue": np.bincount(cell_id, weights=rev, minlength=len(uniq)),
+        "lines": np.bincount(cell_id, minlength=len(uniq)).astype(np.int64),
+    })
+    return cells, cell_id.astype(np.int64)
+
+def build_cube(df: pd.DataFrame, approx_orders: Optional[bool] = None, precision: int = HLL_P) -> KpiCube:
+    """Materialize the KPI cube from a raw orders frame (one pass, done once at load).
+
+    `approx_orders` keeps per-cell HyperLogLog sketches (2**precision registers at most)
+    instead of exact (cell, order) pairs; it defaults to APPROX_DISTINCT_ORDERS=1 in the env.
+    """
+    approx_orders = APPROX_ORDERS if approx_orders is None else approx_orders
+    dates = pd.to_datetime(df["order_date"])
+    df = df[dates.notna().to_numpy()]  # undated rows fall in no window
+    dates = dates[dates.notna()]
+    cells, cell_id = _cells(df, dates)
+    day_aligned = bool((dates.dt.normalize() == dates).all())
+    if approx_orders:
+        sk = Sketches.build(cell_id, df["order_id"].reset_index(drop=True), precision)
+        cells["orders"] = np.round(sk.per_group(len(cells))).astype(np.int64)
+        empty = np.zeros(0, dtype=np.int64)
+        return KpiCube(cells=cells, pair_cell=empty, pair_order=empty, single_cell_orders=False,
+                       day_aligned=day_aligned, sketches=sk)
+
+    codes, uniques = pd.factorize(df["order_id"])
+    keep = codes >= 0
+    n = max(len(uniques), 1)
+    pairs = _sorted_unique(cell_id[keep] * n + codes[keep])
+    pair_cell, pair_order = pairs // n, pairs % n
+    cells["orders"] = np.bincount(pair_cell, minlength=len(cells)).astype(np.int64)
+
+    return KpiCube(
+        cells=cells,
+        pair_cell=pair_cell,
+        pair_order=pair_order,
+        single_cell_orders=bool(len(pairs) == len(uniques)),
+        day_aligned=day_aligned,
+    )
@@ -1,11 +1,23 @@
 import argparse
+import json
+import os
+import time
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
 from pathlib import Path
+from typing import Optional, Sequence
 
 BASE = Path(__file__).resolve().parent.parent
 PROC = BASE / "data" / "processed"
 SAMP = BASE / "data" / "samples"
+PART = Path(os.getenv("ORDERS_DIR", PROC / "orders"))  # the partitioned dataset the dashboard reads
+SYNTH = BASE / "data" / "synthetic" / "orders"
+PARTITION_COLS = ["year", "month", "store"]
+MANIFEST = "_manifest.json"  # leading underscore: skipped by pyarrow dataset discovery
+ORDER_COLUMNS = ["order_id", "order_date", "product", "category", "store", "quantity", "unit_price", "revenue"]
 
 def generate_sample(seed: int = 7, n_orders: int = 2000) -> pd.DataFrame:
     rng = np.random.default_rng(seed)
@@ -17,11 +29,12 @@ def generate_sample(seed: int = 7, n_orders: int = 2000) -> pd.DataFrame:
         "Keyboard":"Peripherals","HDMI Cable":"Accessories","Laptop Stand":"Accessories",
         "Earbuds":"Audio","Charger":"Accessories","Webcam":"Peripherals","Monitor":"Displays"
     }
-    product = rng.choice(products, size=n_orders)
-    category = [categories[p] for p in product]
+    codes = rng.integers(0, len(products), size=n_orders)  # same draws as rng.choice(products)
+    product = np.asarray(products, dtype=object)[codes]
+    category = np.asarray([categories[p] for p in products], dtype=object)[codes]
     quantity = rng.integers(1, 5, size=n_orders)
     unit_price = rng.choice([9.99,14.99,19.99,24.99,29.99,49.99,79.99,149.99,199.99], size=n_orders)
-    order_id = [f"O{100000+i}" for i in range(n_orders)]
+    order_id = np.char.add("O", (100000 + np.arange(n_orders)).astype(str)).astype(object)
     store = rng.choice(["East","West","Central"], size=n_orders, p=[0.4,0.35,0.25])
     df = pd.DataFrame({
         "order_id": order_id,
@@ -39,17 +52,197 @@ def write_parquet(df: pd.DataFrame, out_path: Path) -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_parquet(out_path, index=False)
 
-def main(generate_sample_flag: bool = False):
+def write_partitioned(df: pd.DataFrame, root: Path = PART, basename_template: Optional[str] = None,
+                      existing_data_behavior: str = "delete_matching", schema: Optional[pa.Schema] = None) -> None:
+    """Write orders as a Hive-partitioned Parquet dataset (year=/month=/store=).
+
+    `schema` (e.g. the physical schema of existing files) casts matching columns so appended
+    files stay readable as one dataset; lossy casts raise.
+    """
+    dates = pd.to_datetime(df["order_date"])
+    table = pa.Table.from_pandas(
+        df.assign(year=dates.dt.year.astype("int16"), month=dates.dt.month.astype("int8"),
+                  store=df["store"].astype(str)),
+        preserve_index=False,
+    )
+    if schema is not None:
+        cols = [table[n].cast(schema.field(n).type) if n in schema.names else table[n] for n in table.column_names]
+        table = pa.Table.from_arrays(cols, names=table.column_names)
+    pads.write_dataset(
+        table, root, format="parquet", partitioning=PARTITION_COLS, partitioning_flavor="hive",
+        basename_template=basename_template, existing_data_behavior=existing_data_behavior,
+    )
+
+def _dataset(root: Path) -> pads.Dataset:
+    return pads.dataset(root, format="parquet", partitioning="hive")
+
+def _month_filter(start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]):
+    """Partition-level (year, month) bounds so whole directories are pruned before any read."""
+    ym = pads.field("year") * 100 + pads.field("month")
+    expr = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = ym >= start.year * 100 + start.month
+    if end is not None:
+        end = pd.Timestamp(end)
+        e = ym <= end.year * 100 + end.month
+        expr = e if expr is None else expr & e
+    return expr
+
+def load_orders(root: Path = PART, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                store: Optional[str] = None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Read only the partitions (and columns) covering [start, end] and `store`; None means unbounded."""
+    dataset = _dataset(root)
+    expr = _month_filter(start, end)
+    if start is not None:
+        expr = expr & (pads.field("order_date") >= pa.scalar(pd.Timestamp(start).to_datetime64()))
+    if end is not None:
+        e = pads.field("order_date") <= pa.scalar(pd.Timestamp(end).to_datetime64())
+        expr = e if expr is None else expr & e
+    if store:
+        e = pads.field("store") == str(store)
+        expr = e if expr is None else expr & e
+    names = [c for c in dataset.schema.names if c not in ("year", "month")]
+    cols = [c for c in names if columns is None or c in columns]
+    df = dataset.to_table(columns=cols, filter=expr).to_pandas()
+    order = [c for c in ORDER_COLUMNS if c in df.columns] + [c for c in df.columns if c not in ORDER_COLUMNS]
+    df = df[order]
+    if "store" in df.columns:
+        df["store"] = df["store"].astype(str)
+    return df.sort_values("order_date", kind="stable").reset_index(drop=True)
+
+def _summary(df: pd.DataFrame) -> dict:
+    dates = pd.to_datetime(df["order_date"])
+    return {"rows": len(df), "min_date": str(dates.min()), "max_date": str(dates.max()),
+            "categories": sorted(map(str, df["category"].unique())),
+            "stores": sorted(map(str, df["store"].unique()))}
+
+def _merge_summary(a: dict, b: dict) -> dict:
+    if not a.get("rows"):
+        return b
+    if not b.get("rows"):
+        return a
+    return {"rows": a["rows"] + b["rows"],
+            "min_date": str(min(pd.Timestamp(a["min_date"]), pd.Timestamp(b["min_date"]))),
+            "max_date": str(max(pd.Timestamp(a["max_date"]), pd.Timestamp(b["max_date"]))),
+            "categories": sorted(set(a["categories"]) | set(b["categories"])),
+            "stores": sorted(set(a["stores"]) | set(b["stores"]))}
+
+def read_manifest(root: Path = PART) -> dict:
+    try:
+        return json.loads((Path(root) / MANIFEST).read_text())
+    except FileNotFoundError:
+        return {}
+
+def _write_manifest(root: Path, summary: dict) -> dict:
+    m = dict(summary, version=read_manifest(root).get("version", 0) + 1)
+    p = Path(root) / MANIFEST
+    tmp = p.with_name(f".{MANIFEST}.tmp")
+    tmp.write_text(json.dumps(m, indent=2))
+    os.replace(tmp, p)
+    return m
+
+def dataset_version(root: Path = PART) -> int:
+    """Bumped on every rebuild or append; cheap enough to check on each dashboard rerun."""
+    return int(read_manifest(root).get("version", 0))
+
+def read_orders_file(path: Path) -> pd.DataFrame:
+    """Read a CSV/XLSX/Parquet orders file, map its columns like the upload widget and clean it."""
+    from app.upload import OPTIONAL, REQUIRED, _clean, _guess
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        raw = pd.read_parquet(path)
+    elif suffix in (".xlsx", ".xls"):
+        raw = pd.read_excel(path)
+    else:
+        raw = pd.read_csv(path)
+    cols = list(raw.columns)
+    mapping = {t: _guess(cols, t) for t in REQUIRED + OPTIONAL}
+    missing = [t for t in REQUIRED if mapping[t] is None]
+    if missing:
+        raise ValueError(f"{path.name}: missing required columns: {', '.join(missing)}")
+    return _clean(pd.DataFrame({t: raw[s] for t, s in mapping.items() if s is not None}))
+
+def append_orders(new: pd.DataFrame, root: Path = PART, create: bool = False) -> dict:
+    """Add cleaned orders to the partitioned dataset without rewriting existing files.
+
+    Orders are keyed by `order_id`: repeats within `new` keep their first row, and ids already
+    stored in any partition are dropped, even if the new row has another date or store
+    (re-running a nightly load is a no-op). The check scans only the `order_id` column and
+    keeps only the matches, so memory follows the batch, not the dataset. The rest land in
+    new files inside the matching partitions, and the manifest summary and version are
+    updated from the new rows only. A missing dataset is an error unless
+    `create`: the dashboard would prefer it over the existing source and show only the new rows.
+    """
+    root = Path(root)
+    n_read = len(new)
+    new = new.drop_duplicates("order_id")
+    schema = None
+    if any(root.rglob("*.parquet")):
+        dataset = _dataset(root)
+        ids = pa.array(new["order_id"].astype(str).to_numpy(dtype=object), pa.string())
+        seen = dataset.to_table(columns=["order_id"], filter=pads.field("order_id").isin(ids)).column("order_id")
+        seen = seen.cast(pa.string()).combine_chunks() if seen.num_chunks else pa.array([], pa.string())
+        dup = pd.Series(pc.is_in(ids, value_set=seen).to_numpy(zero_copy_only=False), index=new.index)
+        schema = next(iter(dataset.get_fragments())).physical_schema
+    elif not create:
+        raise FileNotFoundError(f"No orders dataset at {root}; seed it from the existing data first "
+                                "(python -m app.data_loader --seed FILE) or pass create=True.")
+    else:
+        dup = pd.Series(False, index=new.index)
+    fresh = new[~dup]
+    stats = {"read": n_read, "duplicates": n_read - len(fresh), "appended": len(fresh)}
+    if fresh.empty:
+        return dict(stats, version=dataset_version(root))
+    write_partitioned(fresh[ORDER_COLUMNS], root, basename_template=f"append-{time.time_ns()}-{{i}}.parquet",
+                      existing_data_behavior="overwrite_or_ignore", schema=schema)
+    base = read_manifest(root) or (_summary(load_orders(root, columns=["order_date", "category", "store"]))
+                                   if schema is not None else {})
+    base.pop("version", None)
+    m = _write_manifest(root, _merge_summary(base, _summary(fresh)))
+    return dict(stats, version=m["version"])
+
+def dataset_meta(root: Path = PART) -> dict:
+    """Date bounds, categories and stores of a partitioned dataset, from its manifest.
+
+    Datasets written before the manifest existed get one on first use (a single scan of
+    three columns), so later reruns never scan rows for metadata.
+    """
+    m = read_manifest(root)
+    if not m.get("rows"):
+        m = _write_manifest(root, _summary(load_orders(root, columns=["order_date", "category", "store"])))
+    return {"min_date": pd.Timestamp(m["min_date"]), "max_date": pd.Timestamp(m["max_date"]),
+            "categories": m["categories"], "stores": m["stores"]}
+
+def seed_orders(path: Path, root: Path = PART) -> dict:
+    """Build the partitioned dataset from an existing orders file (e.g. data/processed/orders.parquet)."""
+    if any(Path(root).rglob("*.parquet")):
+        raise FileExistsError(f"{root} already holds orders; use --append to add to it.")
+    return append_orders(read_orders_file(path), root, create=True)
+
+def main(generate_sample_flag: bool = False, append: Optional[Path] = None, seed: Optional[Path] = None):
     if generate_sample_flag:
         df = generate_sample()
         write_parquet(df, SAMP / "sample_orders.parquet")
-        write_parquet(df, PROC / "orders.parquet")
+        write_partitioned(df, PART, existing_data_behavior="delete_matching")
+        _write_manifest(PART, _summary(load_orders(PART, columns=["order_date", "category", "store"])))
         print("✔ Sample data written.")
+    elif seed:
+        stats = seed_orders(seed, PART)
+        print(f"✔ Seeded {PART} with {stats['appended']:,} rows; dataset version {stats['version']}.")
+    elif append:
+        t0 = time.perf_counter()
+        stats = append_orders(read_orders_file(append), PART)
+        print(f"✔ Appended {stats['appended']:,} rows ({stats['duplicates']:,} duplicate order lines skipped) "
+              f"in {time.perf_counter() - t0:.1f}s; dataset version {stats['version']}.")
     else:
-        raise SystemExit("Use --generate-sample for now.")
+        raise SystemExit("Use --generate-sample, --seed <file> or --append <file>.")
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--generate-sample", action="store_true")
+    ap.add_argument("--append", type=Path, metavar="FILE", help="validate and add new orders (CSV/XLSX/Parquet)")
+    ap.add_argument("--seed", type=Path, metavar="FILE", help="create the partitioned dataset from existing orders")
     args = ap.parse_args()
-    main(generate_sample_flag=args.generate_sample)
+    main(generate_sample_flag=args.generate_sample, append=args.append, seed=args.seed)
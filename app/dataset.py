@@ -0,0 +1,58 @@
+from __future__ import annotations
+from typing import Dict
+import numpy as np
+import pandas as pd
+
+INDEXED = ("category", "store")
+
+def _positions(col: pd.Series) -> Dict[object, np.ndarray]:
+    """Sorted row positions for every distinct value of `col`."""
+    codes, uniques = pd.factorize(col)
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    chunks = np.split(order[(codes < 0).sum():], np.cumsum(counts)[:-1])
+    return {u: c for u, c in zip(uniques, chunks)}
+
+class OrdersDataset:
+    """Orders kept sorted by `order_date`, with per-category and per-store row positions.
+
+    Date windows are cut with `searchsorted`, so slicing costs scale with the window
+    rather than with the whole history.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if not df["order_date"].is_monotonic_increasing:
+            df = df.sort_values("order_date", kind="stable")
+        self.df = df.reset_index(drop=True)
+        self._dates = self.df["order_date"].to_numpy()
+        self._pos = {c: _positions(self.df[c]) for c in INDEXED if c in self.df.columns}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def empty(self) -> bool:
+        return self.df.empty
+
+    def bounds(self, start: pd.Timestamp, end: pd.Timestamp) -> tuple[int, int]:
+        lo = int(self._dates.searchsorted(np.datetime64(pd.Timestamp(start)), "left"))
+        hi = int(self._dates.searchsorted(np.datetime64(pd.Timestamp(end)), "right"))
+        return lo, max(lo, hi)
+
+    def window(self, start: pd.Timestamp, end: pd.Timestamp, fctx) -> pd.DataFrame:
+        """Rows in [start, end] matching the category/store filter.
+
+        Returns a slice of `self.df` for read-only use; `apply_filters` copies it.
+        """
+        lo, hi = self.bounds(start, end)
+        pos = None
+        for dim in INDEXED:
+            value = getattr(fctx, dim, None)
+            if not value:
+                continue
+            p = self._pos.get(dim, {}).get(value, np.empty(0, dtype=np.intp))
+            p = p[p.searchsorted(lo):p.searchsorted(hi)]
+            pos = p if pos is None else np.intersect1d(pos, p, assume_unique=True)
+        if pos is None:
+            return self.df.iloc[lo:hi]
+        return self.df.iloc[pos]
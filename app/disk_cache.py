@@ -0,0 +1,63 @@
+from __future__ import annotations
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+class DiskCache:
+    """Files in a local directory addressed by key, capped in total size with LRU eviction.
+
+    Recency is the file mtime: hits touch the file, eviction removes the oldest first.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, suffix: str = ""):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.suffix = suffix
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        p = self.path(key)
+        try:
+            os.utime(p)
+        except FileNotFoundError:
+            return None
+        return p
+
+    def put(self, key: str, write: Callable[[Path], None]) -> Path:
+        """Write an entry through `write(tmp_path)`, publish it atomically and evict to the cap."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        p = self.path(key)
+        tmp = p.with_name(f".{p.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            write(tmp)
+            os.replace(tmp, p)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.evict(keep=p)
+        return p
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """Drop least recently used entries until the cache fits; returns how many were removed."""
+        if not self.root.exists():
+            return 0
+        entries = []
+        for p in self.root.glob(f"*{self.suffix}"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and p == keep:
+                continue
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
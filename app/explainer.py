@@ -1,49 +1,39 @@
 from __future__ import annotations
-import os, json
-from typing import List, Dict, Optional
+import json
+from typing import Iterator, List, Dict, Optional
 import pandas as pd
+from app.analytics import SegmentAgg, segment_agg, segment_agg_windows
+from app.perf import timed
+from app.llm_client import LLMError, get_client, hosted_enabled
+from app.llm_cache import get_response, put_response, record, response_key
 
 _METRIC_KEYS = {"cur", "prev", "delta", "revenue"}
 
-def _drivers(cur: pd.DataFrame, prev: Optional[pd.DataFrame] = None):
-    """Return top contributors and top movers for category/store/product."""
-    def one_dim(by: str):
-        if by not in cur.columns:
-            return None
-        # Current aggregates
-        cur_agg = cur.groupby(by, dropna=False)["revenue"].sum()
-        cur_agg.index.name = by
-        cur_agg = cur_agg.sort_values(ascending=False)
-
-        out = {"by": by}
-
-        contrib = cur_agg.head(5).reset_index().rename(columns={"revenue": "revenue"})
-        out["top"] = contrib.to_dict(orient="records")
-
-        # Previous aggregates (if provided)
-        movers = None
-        if prev is not None and len(prev) and by in prev.columns:
-            prev_agg = prev.groupby(by, dropna=False)["revenue"].sum()
-            prev_agg.index.name = by
-            joined = pd.DataFrame({"cur": cur_agg, "prev": prev_agg}).fillna(0.0)
-            joined.index.name = by
-            joined["delta"] = joined["cur"] - joined["prev"]
-            movers = (
-                joined.sort_values("delta", ascending=False)
-                .head(5)
-                .reset_index()
-                .to_dict(orient="records")
-            )
-        out["movers"] = movers or []
-        return out
-
+def drivers_from(agg: SegmentAgg) -> list:
+    """Top contributors and top movers for each dimension of a SegmentAgg."""
     dims = []
-    for by in ["category", "store", "product"]:
-        d = one_dim(by)
-        if d is not None:
-            dims.append(d)
+    for by in agg.dims:
+        r = agg.rollup(by)
+        cur = r.loc[r["lines_cur"] > 0, "revenue_cur"].rename("revenue").sort_values(ascending=False)
+        out = {"by": by, "top": cur.head(5).reset_index().to_dict(orient="records"), "movers": []}
+        if agg.has_prev:
+            joined = pd.DataFrame({"cur": r["revenue_cur"], "prev": r["revenue_prev"]})
+            joined["delta"] = joined["cur"] - joined["prev"]
+            out["movers"] = joined.sort_values("delta", ascending=False).head(5).reset_index().to_dict(orient="records")
+        dims.append(out)
     return dims
 
+@timed()
+def _drivers(cur, prev=None, backend=None):
+    """Return top contributors and top movers for category/store/product.
+
+    `cur`/`prev` are frames, or (start, end, FilterCtx) windows summed by `backend`.
+    """
+    dims = ("category", "store", "product")
+    if backend is not None:
+        return drivers_from(segment_agg_windows(backend, cur, prev, dims))
+    return drivers_from(segment_agg(cur, prev, dims))
+
 def _pick_label(row: Dict, dim_key: str) -> str:
     """Safely get the label value for this dimension from a dict row."""
     # Try exact, Title, UPPER, and common fallback 'index'
@@ -56,6 +46,66 @@ def _pick_label(row: Dict, dim_key: str) -> str:
             return str(v)
     return "N/A"
 
+SYSTEM_PROMPT = (
+    "You are a senior BI analyst. Write a crisp executive summary with four sections: "
+    "1) Key movements, 2) Drivers, 3) Risks/Watchouts, 4) Next actions. "
+    "Use ONLY provided numbers (kpis, verified claims, drivers). Keep under ~120 words."
+)
+
+def explain_stream(
+    rows: List[Dict],
+    kpis: Dict,
+    df_current: Optional[pd.DataFrame] = None,
+    df_prev: Optional[pd.DataFrame] = None,
+    model: Optional[str] = None,
+    temperature: float = 0.2,
+    agg: Optional[SegmentAgg] = None,
+) -> Iterator[str]:
+    """Executive summary as text chunks: streamed from the hosted model if enabled, else the offline summary.
+
+    Pass `agg` (segment_agg of the same slices) to reuse an existing aggregation for the drivers.
+    """
+    if agg is not None:
+        drivers = drivers_from(agg)
+    else:
+        cur_df = df_current if df_current is not None else pd.DataFrame(columns=["revenue"])
+        drivers = _drivers(cur_df, df_prev)
+
+    # Hosted model (optional); falls back to the offline summary when unavailable
+    note = ""
+    if hosted_enabled():
+        payload = {"kpis": kpis, "claims": rows, "drivers": drivers}
+        client = get_client()
+        mdl = model or client.config.model
+        key = response_key("explain", payload, mdl, temperature)
+        cached = get_response(key)
+        record("explain", key, cached is not None)
+        if cached is not None:
+            yield cached
+            return
+        parts: List[str] = []
+        try:
+            for delta in client.stream(
+                [{"role": "system", "content": SYSTEM_PROMPT},
+                 {"role": "user", "content": json.dumps(payload, ensure_ascii=False, default=str)}],
+                model=mdl, temperature=temperature, max_tokens=350,
+            ):
+                parts.append(delta)
+                yield delta
+        except LLMError as e:
+            if parts:
+                yield f"\n\n_(summary cut short: {e})_"
+                return
+            note = f"\n\n_Hosted model unavailable ({e}); offline summary shown._"
+        else:
+            put_response(key, "".join(parts).strip(), kind="explain", model=mdl)
+            return
+
+    # Offline summary, through the same chunked interface
+    for line in (_offline_summary(rows, kpis, drivers) + note).splitlines(keepends=True):
+        yield line
+
+@timed()
 def explain(
     rows: List[Dict],
     kpis: Dict,
@@ -63,38 +113,12 @@ def explain(
     df_prev: Optional[pd.DataFrame] = None,
     model: Optional[str] = None,
     temperature: float = 0.2,
+    agg: Optional[SegmentAgg] = None,
 ) -> str:
-    """Return an executive summary. Uses OpenAI if enabled, else an offline fallback."""
-    cur_df = df_current if df_current is not None else pd.DataFrame(columns=["revenue"])
-    prev_df = df_prev if df_prev is not None else None
-    drivers = _drivers(cur_df, prev_df)
+    """Return an executive summary. Uses the hosted model if enabled, else an offline fallback."""
+    return "".join(explain_stream(rows, kpis, df_current, df_prev, model, temperature, agg)).strip()
 
-    # Hosted model (optional)
-    if os.getenv("USE_OPENAI") == "1" and os.getenv("OPENAI_API_KEY"):
-        try:
-            from openai import OpenAI
-            client = OpenAI()
-            sys_msg = (
-                "You are a senior BI analyst. Write a crisp executive summary with four sections: "
-                "1) Key movements, 2) Drivers, 3) Risks/Watchouts, 4) Next actions. "
-                "Use ONLY provided numbers (kpis, verified claims, drivers). Keep under ~120 words."
-            )
-            payload = {"kpis": kpis, "claims": rows, "drivers": drivers}
-            mdl = model or os.getenv("MODEL_NAME", "gpt-4o-mini")
-            resp = client.chat.completions.create(
-                model=mdl,
-                messages=[
-                    {"role": "system", "content": sys_msg},
-                    {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
-                ],
-                temperature=temperature,
-                max_tokens=350,
-            )
-            return resp.choices[0].message.content.strip()
-        except Exception as e:
-            return f"_Explanation unavailable (model error: {e})._"
-
-    # Offline summary
+def _offline_summary(rows: List[Dict], kpis: Dict, drivers: list) -> str:
     bullets = []
     if kpis.get("revenue") is not None and kpis.get("orders") is not None:
         aov = kpis.get("aov")
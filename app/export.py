@@ -0,0 +1,85 @@
+from __future__ import annotations
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterator
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.disk_cache import DiskCache
+
+EXPORT_COLUMNS = ["order_date", "category", "store", "product", "quantity", "unit_price", "revenue"]
+CHUNK_ROWS = 100_000
+PREVIEW_ROWS = 1_000
+# label -> (file extension, MIME type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "CSV (zstd)": ("csv.zst", "application/zstd"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": ("arrow", "application/vnd.apache.arrow.file"),
+}
+_CODECS = {"CSV (gzip)": "gzip", "CSV (zstd)": "zstd"}
+CACHE_DIR = Path(os.getenv("EXPORT_CACHE_DIR", Path(__file__).resolve().parent.parent / "data" / "cache" / "exports"))
+EXPORT_CACHE = DiskCache(CACHE_DIR, int(float(os.getenv("EXPORT_CACHE_MAX_MB", "512")) * 1e6), suffix=".export")
+
+def _columns(df: pd.DataFrame) -> list:
+    return [c for c in EXPORT_COLUMNS if c in df.columns] or list(df.columns)
+
+def _in_date_order(df: pd.DataFrame) -> pd.DataFrame:
+    # dashboard slices are already date-sorted, so this is normally a no-op (no copy)
+    if "order_date" in df.columns and not df["order_date"].is_monotonic_increasing:
+        return df.sort_values("order_date", kind="stable")
+    return df
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Export rows (columns selected, date order) in chunks of `chunk_rows`."""
+    cols, view = _columns(df), _in_date_order(df)
+    for i in range(0, len(view), chunk_rows):
+        yield view.iloc[i:i + chunk_rows][cols]
+
+def preview_csv(df: pd.DataFrame, n: int = PREVIEW_ROWS) -> str:
+    """CSV text of the first `n` export rows only."""
+    if "order_date" in df.columns and not df["order_date"].is_monotonic_increasing:
+        df = df.nsmallest(n, "order_date", keep="first")
+    return df.head(n)[_columns(df)].to_csv(index=False)
+
+def write_export(df: pd.DataFrame, fmt: str, path: Path, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Stream the export to `path` chunk by chunk, so only one encoded chunk is held at a time.
+
+    CSV output matches `DataFrame.to_csv(index=False)` of the whole view. Returns the file size.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    if fmt.startswith("CSV"):
+        codec = _CODECS.get(fmt)
+        with pa.OSFile(str(path), "wb") as raw:
+            sink = pa.CompressedOutputStream(raw, codec) if codec else raw
+            try:
+                sink.write(df.iloc[0:0][_columns(df)].to_csv(index=False).encode("utf-8"))
+                for chunk in iter_chunks(df, chunk_rows):
+                    sink.write(chunk.to_csv(index=False, header=False).encode("utf-8"))
+            finally:
+                if codec:
+                    sink.close()
+    else:
+        schema = pa.Schema.from_pandas(df.iloc[0:0][_columns(df)], preserve_index=False)
+        if fmt == "Parquet":
+            writer = pq.ParquetWriter(str(path), schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(str(path), schema)
+        with writer:
+            for chunk in iter_chunks(df, chunk_rows):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    return os.path.getsize(path)
+
+def export_key(fingerprint: str, fmt: str) -> str:
+    """Cache key of one view (its frame fingerprint) in one format."""
+    return hashlib.blake2b(f"{fingerprint}|{fmt}".encode("utf-8"), digest_size=20).hexdigest()
+
+def prepare_export(df: pd.DataFrame, fmt: str, key: str, cache: DiskCache = EXPORT_CACHE,
+                   chunk_rows: int = CHUNK_ROWS) -> Path:
+    """Path of the export under `key` in the size-capped cache, written only if it is not there yet."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    return cache.get(key) or cache.put(key, lambda tmp: write_export(df, fmt, tmp, chunk_rows))
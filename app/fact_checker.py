@@ -1,8 +1,15 @@
 from __future__ import annotations
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
-from .kpis import FilterCtx, revenue, orders, aov
+from .kpis import FilterCtx, KPI_METRICS, compute_kpis
+from .cube import KpiCube
+from .analytics import previous_period, yoy_period
+from .perf import timed
+
+VERIFIED, APPROX, MISMATCH, ERROR = "✅ VERIFIED", "⚠️ APPROX", "❌ MISMATCH", "❌ ERROR"
+_KEY = ["start", "end", "category", "store"]
 
 @dataclass
 class CheckedInsight:
@@ -18,14 +25,12 @@ class CheckedInsight:
 def _parse_filter(d: dict) -> FilterCtx:
     return FilterCtx(category=d.get("category"), store=d.get("store"))
 
-def _compute_metric(df: pd.DataFrame, metric: str, start, end, f: FilterCtx) -> float:
-    if metric == "revenue":
-        return revenue(df, start, end, f)
-    if metric == "orders":
-        return float(orders(df, start, end, f))
-    if metric == "aov":
-        return aov(df, start, end, f)
-    return 0.0
+def _comparison_window(vs: Optional[str], start: pd.Timestamp, end: pd.Timestamp):
+    if vs == "previous_period":
+        return previous_period(start, end)
+    if vs == "previous_year":
+        return yoy_period(start, end)
+    return (pd.NaT, pd.NaT)
 
 def _as_dict(comp) -> Dict[str, float]:
     if comp is None:
@@ -42,55 +47,137 @@ def _as_dict(comp) -> Dict[str, float]:
                 out[k] = getattr(comp, k)
         return out
 
-def check_insights(insights: List[Any], df: pd.DataFrame, tolerance_pct: float = 0.5) -> List[CheckedInsight]:
-    out: List[CheckedInsight] = []
-    for ins in insights:
+def _claim_table(insights: List[Any]):
+    """One row per parseable claim (current and comparison windows); parse errors by position."""
+    rows, errors = [], {}
+    for i, ins in enumerate(insights):
         try:
             start = pd.to_datetime(ins.period.start)
             end = pd.to_datetime(ins.period.end)
             fctx = _parse_filter(getattr(ins, "filter", {}) or {})
-            computed = _compute_metric(df, ins.metric, start, end, fctx)
-            reported = float(getattr(ins, "value_reported", 0.0))
-            err_pct = 0.0 if computed == 0 else abs((reported - computed) / computed) * 100.0
-
-            status = "✅ VERIFIED" if err_pct <= tolerance_pct else "❌ MISMATCH"
-            reason = f"abs error {err_pct:.2f}% (≤ {tolerance_pct}?)"
-
             comp = _as_dict(getattr(ins, "comparison", None))
-            if comp.get("vs") == "previous_period":
-                period_len = (end - start).days + 1
-                prev_start = start - pd.Timedelta(days=period_len)
-                prev_end = start - pd.Timedelta(days=1)
-                prev_val = _compute_metric(df, ins.metric, prev_start, prev_end, fctx)
-                delta = computed - prev_val
-                delta_pct = (delta / prev_val * 100.0) if prev_val != 0 else 0.0
-                if status == "✅ VERIFIED":
-                    d_err = abs(delta - float(comp.get("delta", 0.0)))
-                    dp_err = abs(delta_pct - float(comp.get("delta_pct", 0.0)))
-                    if d_err > max(0.01, 0.005 * abs(computed)) or dp_err > 0.5:
-                        status = "⚠️ APPROX"
-                        reason = f"delta/percent slightly off (Δ={d_err:.2f}, Δ%={dp_err:.2f})"
-
-            out.append(CheckedInsight(
-                claim_id=getattr(ins, "claim_id", "unknown"),
-                statement=getattr(ins, "statement", ""),
-                status=status,
-                reason=reason,
-                value_reported=reported,
-                value_computed=float(computed),
-                comparison=comp,
-                metric=getattr(ins, "metric", "other"),
-            ))
+            prev_start, prev_end = _comparison_window(comp.get("vs"), start, end)
+            rows.append({
+                "pos": i, "metric": ins.metric, "start": start, "end": end,
+                "category": fctx.category or "", "store": fctx.store or "",
+                "prev_start": prev_start, "prev_end": prev_end,
+                "reported": float(getattr(ins, "value_reported", 0.0)),
+                "delta_reported": float(comp.get("delta", 0.0)),
+                "delta_pct_reported": float(comp.get("delta_pct", 0.0)),
+            })
         except Exception as e:
-            out.append(CheckedInsight(
-                claim_id=getattr(ins, "claim_id", "unknown"),
-                statement=getattr(ins, "statement", ""),
-                status="❌ ERROR",
-                reason=str(e),
-                value_reported=float(getattr(ins, "value_reported", 0.0)),
-                value_computed=0.0,
-                comparison=_as_dict(getattr(ins, "comparison", None)),
-                metric=getattr(ins, "metric", "other"),
-            ))
-    return out
+            errors[i] = str(e)
+    return pd.DataFrame(rows), errors
+
+def _lookup(df: pd.DataFrame, claims: pd.DataFrame, cube: Optional[KpiCube]):
+    """Compute every distinct (window, filter) once; return current and comparison values per claim,
+    plus the relative error bound of each current value (non-zero only for approximate counts)."""
+    cur = claims[_KEY]
+    prev = claims[["prev_start", "prev_end", "category", "store"]].dropna()
+    prev.columns = _KEY
+    keys = pd.concat([cur, prev]).drop_duplicates().reset_index(drop=True)
+    windows = [(r.start, r.end, FilterCtx(category=r.category or None, store=r.store or None))
+               for r in keys.itertuples(index=False)]
+    kf = compute_kpis(df, windows, KPI_METRICS, cube)
+    table = kf.pivot(index="window", columns="metric", values="value").reindex(
+        index=range(len(keys)), columns=list(KPI_METRICS)).fillna(0.0)
+    bounds = kf.pivot(index="window", columns="metric", values="rel_error").reindex(
+        index=range(len(keys)), columns=list(KPI_METRICS)).fillna(0.0)
+    table = pd.concat([keys, table.reset_index(drop=True)], axis=1)
+    bounds = pd.concat([keys, bounds.reset_index(drop=True)], axis=1)
+
+    metric_col = claims["metric"].map({m: j for j, m in enumerate(KPI_METRICS)})
+    known = metric_col.notna().to_numpy()
+    col = metric_col.fillna(0).astype(int).to_numpy()
+    rows = np.arange(len(claims))
+
+    def values(key_cols, t=table):
+        lookup = claims[key_cols].set_axis(_KEY, axis=1).merge(t, on=_KEY, how="left")
+        vals = lookup[list(KPI_METRICS)].to_numpy(dtype=float)[rows, col]
+        return np.where(known, vals, 0.0)
+
+    return values(_KEY), values(["prev_start", "prev_end", "category", "store"]), values(_KEY, bounds)
+
+def _evaluate(df: pd.DataFrame, claims: pd.DataFrame, cube: Optional[KpiCube], tolerance_pct: float):
+    """(status, reason, computed) arrays for a batch of parsed claims."""
+    computed, prev, rel = _lookup(df, claims, cube)
+    reported = claims["reported"].to_numpy()
+    safe = np.where(computed == 0, 1.0, computed)
+    err_pct = np.where(computed == 0, 0.0, np.abs((reported - computed) / safe) * 100.0)
+    bound_pct = np.where(computed == 0, 0.0, rel * 100.0)
+    ok = err_pct <= tolerance_pct + bound_pct
+    sketchy = ok & (err_pct > tolerance_pct)  # off the estimate, but within its error bound
+
+    has_cmp = claims["prev_start"].notna().to_numpy()
+    delta = computed - prev
+    delta_pct = np.where(prev != 0, delta / np.where(prev == 0, 1.0, prev) * 100.0, 0.0)
+    d_err = np.abs(delta - claims["delta_reported"].to_numpy())
+    dp_err = np.abs(delta_pct - claims["delta_pct_reported"].to_numpy())
+    delta_off = ok & has_cmp & ((d_err > np.maximum(0.01, 0.005 * np.abs(computed))) | (dp_err > 0.5))
+    approx = delta_off | sketchy
+
+    status = np.where(approx, APPROX, np.where(ok, VERIFIED, MISMATCH))
+    reason = [
+        f"delta/percent slightly off (Δ={de:.2f}, Δ%={pe:.2f})" if a
+        else f"abs error {e:.2f}% within sketch error ±{b:.1f}%" if sk
+        else f"abs error {e:.2f}% (≤ {tolerance_pct}?)"
+        for a, sk, e, b, de, pe in zip(delta_off, sketchy, err_pct, bound_pct, d_err, dp_err)
+    ]
+    return status, reason, computed
+
+@timed()
+def check_insights(insights: List[Any], df: pd.DataFrame, tolerance_pct: float = 0.5,
+                   cube: Optional[KpiCube] = None) -> List[CheckedInsight]:
+    """Verify claims in batch: distinct (metric, window, filter) keys are computed once and
+    statuses are assigned with array operations. `previous_period` and `previous_year`
+    comparisons also check the reported delta and delta %.
+
+    Values from approximate counts carry an error bound: a claim within tolerance of the
+    estimate is VERIFIED, one outside it but within tolerance plus the bound is APPROX, and
+    anything further off is a MISMATCH. If the batch fails, claims are re-checked one by one
+    so only the failing ones are reported as ERROR."""
+    claims, errors = _claim_table(insights)
+    status = reason = computed = None
+    if len(claims):
+        try:
+            status, reason, computed = _evaluate(df, claims, cube, tolerance_pct)
+        except Exception:
+            status, reason, computed, keep = [], [], [], []
+            for j in range(len(claims)):
+                try:
+                    one = _evaluate(df, claims.iloc[[j]], cube, tolerance_pct)
+                except Exception as e:
+                    errors[int(claims["pos"].iat[j])] = str(e)
+                    continue
+                keep.append(j)
+                status.append(one[0][0])
+                reason.append(one[1][0])
+                computed.append(one[2][0])
+            claims = claims.iloc[keep]
 
+    checked = {}
+    for j, pos in enumerate(claims["pos"] if len(claims) else []):
+        ins = insights[pos]
+        checked[pos] = CheckedInsight(
+            claim_id=getattr(ins, "claim_id", "unknown"),
+            statement=getattr(ins, "statement", ""),
+            status=str(status[j]),
+            reason=reason[j],
+            value_reported=float(claims["reported"].iat[j]),
+            value_computed=float(computed[j]),
+            comparison=_as_dict(getattr(ins, "comparison", None)),
+            metric=getattr(ins, "metric", "other"),
+        )
+    for pos, err in errors.items():
+        ins = insights[pos]
+        checked[pos] = CheckedInsight(
+            claim_id=getattr(ins, "claim_id", "unknown"),
+            statement=getattr(ins, "statement", ""),
+            status=ERROR,
+            reason=err,
+            value_reported=float(getattr(ins, "value_reported", 0.0)),
+            value_computed=0.0,
+            comparison=_as_dict(getattr(ins, "comparison", None)),
+            metric=getattr(ins, "metric", "other"),
+        )
+    return [checked[i] for i in sorted(checked)]
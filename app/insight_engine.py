@@ -1,10 +1,11 @@
 from __future__ import annotations
 import json
-import os
 import uuid
 import pandas as pd
 from pydantic import BaseModel, Field, ValidationError
-from typing import List, Literal
+from typing import List, Literal, Optional
+from app.llm_client import LLMError, get_client, hosted_enabled
+from app.llm_cache import cached_response
 
 class Comparison(BaseModel):
     vs: Literal["previous_period","previous_year","none"] = "none"
@@ -25,16 +26,43 @@ class Insight(BaseModel):
     value_reported: float
     comparison: Comparison = Comparison()
 
-def call_llm(prompt: str) -> str:
+SYSTEM_PROMPT = (
+    "You are a BI analyst. From the KPI payload, return ONLY a JSON array of insight objects with keys "
+    "metric (revenue|orders|aov|return_rate|other), time_granularity (day|week|month|quarter), "
+    "period {start,end}, filter, statement, value_reported and comparison "
+    "{vs: previous_period|previous_year|none, delta, delta_pct}. Use only numbers from the payload."
+)
+
+def call_llm(prompt: str, model: Optional[str] = None) -> str:
+    """
+    Returns a JSON list of Insight objects for a JSON KPI payload.
+    With USE_OPENAI=1 and OPENAI_API_KEY set, asks the hosted `model` (default: the client's,
+    see app.llm_client); any failure or non-list answer falls back to the offline heuristic.
+    """
+    if hosted_enabled():
+        client = get_client()
+        mdl = model or client.config.model
+
+        def ask() -> str:
+            raw = client.complete([{"role": "system", "content": SYSTEM_PROMPT},
+                                   {"role": "user", "content": prompt}],
+                                  model=mdl, temperature=0.0, max_tokens=600)
+            raw = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+            if not isinstance(json.loads(raw), list):
+                raise ValueError("model did not return a JSON list")
+            return raw  # only valid answers reach the response cache
+
+        try:
+            return cached_response("insights", json.loads(prompt), mdl, 0.0, ask)[0]
+        except (LLMError, ValueError):
+            pass
+    return heuristic_insights(prompt)
+
+def heuristic_insights(prompt: str) -> str:
     """
     Offline-friendly heuristic 'LLM':
     Expects a JSON payload with summarized KPI values; returns a small JSON list of Insight objects.
-    For real models, set USE_OPENAI=1 and provide OPENAI_API_KEY (adapter stub included).
     """
-    if os.getenv("USE_OPENAI") == "1" and os.getenv("OPENAI_API_KEY"):
-        # Stub for real API call (intentionally left unimplemented for offline demo)
-        pass
-
     data = json.loads(prompt)
     current = data["current"]
     previous = data.get("previous", {})
@@ -82,8 +110,8 @@ def call_llm(prompt: str) -> str:
 
     return json.dumps(insights, ensure_ascii=False)
 
-def generate_insights(kpi_summary: dict) -> List[Insight]:
-    raw = call_llm(json.dumps(kpi_summary))
+def generate_insights(kpi_summary: dict, model: Optional[str] = None) -> List[Insight]:
+    raw = call_llm(json.dumps(kpi_summary), model)
     try:
         items = json.loads(raw)
         return [Insight(**it) for it in items]
@@ -1,6 +1,13 @@
 from __future__ import annotations
 import pandas as pd
 from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from app.cube import KpiCube, build_cube
+from app.dataset import OrdersDataset
+from app.perf import timed
+
+KPI_METRICS = ("revenue", "orders", "aov")
+KPI_COLUMNS = ["window", "start", "end", "category", "store", "metric", "value", "rel_error"]
 
 @dataclass(frozen=True)
 class FilterCtx:
@@ -15,24 +22,100 @@ def _apply_filters(df: pd.DataFrame, f: FilterCtx) -> pd.DataFrame:
         out = out[out["store"] == f.store]
     return out
 
-def revenue(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx) -> float:
+def _in_memory(df) -> bool:
+    """True for a frame or dataset; anything else is an `app.backends.Backend` to query."""
+    return isinstance(df, (pd.DataFrame, OrdersDataset))
+
+def select_window(df: pd.DataFrame | OrdersDataset, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx) -> pd.DataFrame:
+    """Rows of one date window and filter (fetched through `filter` from a backend)."""
+    if isinstance(df, OrdersDataset):
+        return df.window(start, end, f)
+    if not _in_memory(df):
+        return df.filter(start, end, f)
     d = df[(df["order_date"] >= start) & (df["order_date"] <= end)]
-    d = _apply_filters(d, f)
+    return _apply_filters(d, f)
+
+def _use_cube(cube: Optional[KpiCube], f: FilterCtx) -> bool:
+    return cube is not None and cube.supports(f)
+
+def revenue(df: pd.DataFrame | OrdersDataset, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx,
+            cube: Optional[KpiCube] = None) -> float:
+    if _use_cube(cube, f):
+        return cube.revenue(start, end, f)
+    if not _in_memory(df):
+        return float(df.group_sum(start, end, f, "store").sum())
+    d = select_window(df, start, end, f)
     return float(d["revenue"].sum())
 
-def orders(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx) -> int:
-    d = df[(df["order_date"] >= start) & (df["order_date"] <= end)]
-    d = _apply_filters(d, f)
+def orders(df: pd.DataFrame | OrdersDataset, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx,
+           cube: Optional[KpiCube] = None) -> int:
+    if _use_cube(cube, f):
+        return cube.orders(start, end, f)
+    if not _in_memory(df):
+        return df.distinct_count(start, end, f, "order_id")
+    d = select_window(df, start, end, f)
     return int(d["order_id"].nunique())
 
-def aov(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx) -> float:
-    o = orders(df, start, end, f)
-    rev = revenue(df, start, end, f)
-    return float(rev / o) if o > 0 else 0.0
+def aov(df: pd.DataFrame | OrdersDataset, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx,
+        cube: Optional[KpiCube] = None) -> float:
+    rev, ords, _ = _window_values(df, pd.Timestamp(start), pd.Timestamp(end), f, cube)
+    return float(rev / ords) if ords > 0 else 0.0
 
-def top_products(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx, n: int = 10) -> pd.DataFrame:
-    d = df[(df["order_date"] >= start) & (df["order_date"] <= end)]
-    d = _apply_filters(d, f)
-    g = d.groupby("product", as_index=False).agg(revenue=("revenue","sum"), orders=("order_id","nunique"))
+def _window_values(df: pd.DataFrame | OrdersDataset, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx,
+                   cube: Optional[KpiCube], need_orders: bool = True) -> Tuple[float, int, float]:
+    """(revenue, distinct orders, orders relative error bound) of one window."""
+    if _use_cube(cube, f):
+        return cube.revenue(start, end, f), cube.orders(start, end, f) if need_orders else 0, cube.orders_rel_error
+    if not _in_memory(df):  # backend: one grouped sum and one distinct count, no rows fetched
+        return revenue(df, start, end, f), orders(df, start, end, f) if need_orders else 0, 0.0
+    d = select_window(df, start, end, f)
+    return float(d["revenue"].sum()), int(d["order_id"].nunique()) if need_orders else 0, 0.0
+
+def _span_cube(df: pd.DataFrame, windows: list) -> KpiCube:
+    """Exact cube over the rows any of `windows` can touch: one scan answers them all."""
+    lo, hi = min(w[0] for w in windows), max(w[1] for w in windows)
+    return build_cube(df[(df["order_date"] >= lo) & (df["order_date"] <= hi)], approx_orders=False)
+
+@timed()
+def top_products(df: pd.DataFrame | OrdersDataset, start: pd.Timestamp, end: pd.Timestamp, f: FilterCtx, n: int = 10) -> pd.DataFrame:
+    if not _in_memory(df):
+        d = df.filter(start, end, f, ["product", "revenue", "order_id"])
+    else:
+        d = select_window(df, start, end, f)
+    g = d.groupby("product", as_index=False, observed=True).agg(revenue=("revenue","sum"), orders=("order_id","nunique"))
     g = g.sort_values(["revenue","orders"], ascending=[False, False]).head(n).reset_index(drop=True)
     return g
+
+@timed()
+def compute_kpis(df: pd.DataFrame | OrdersDataset,
+                 windows: Iterable[Tuple[pd.Timestamp, pd.Timestamp, FilterCtx]],
+                 metrics: Sequence[str] = KPI_METRICS,
+                 cube: Optional[KpiCube] = None) -> pd.DataFrame:
+    """Evaluate `metrics` for every (start, end, FilterCtx) window; one tidy row per window × metric.
+
+    Windows are answered from the cube; without one, several windows over a raw frame share
+    a single scan (an exact cube over their combined span) instead of one mask per window.
+    `df` may also be a Backend, queried per window.
+    Every metric is derived from the same window values, so AOV never re-runs the scans. `rel_error` is the
+    relative error bound of the value: 0 unless orders (and so AOV) come from a cube's
+    approximate distinct counts.
+    """
+    metrics = list(metrics)
+    need_orders = "orders" in metrics or "aov" in metrics
+    windows = [(pd.Timestamp(s), pd.Timestamp(e), f) for s, e, f in windows]
+    if cube is None and isinstance(df, pd.DataFrame) and len(windows) > 1:
+        cube = _span_cube(df, windows)
+    rows = []
+    for i, (start, end, f) in enumerate(windows):
+        rev, ords, bound = _window_values(df, start, end, f, cube, need_orders)
+        vals = {"revenue": rev, "orders": float(ords), "aov": float(rev / ords) if ords > 0 else 0.0}
+        for m in metrics:
+            rows.append({"window": i, "start": start, "end": end, "category": f.category,
+                         "store": f.store, "metric": m, "value": vals.get(m, 0.0),
+                         "rel_error": bound if m in ("orders", "aov") else 0.0})
+    return pd.DataFrame(rows, columns=KPI_COLUMNS)
+
+def kpi_dict(kf: pd.DataFrame, window: int = 0) -> Dict[str, float]:
+    """{metric: value} for one window of a `compute_kpis` result."""
+    sub = kf[kf["window"] == window]
+    return dict(zip(sub["metric"], sub["value"].astype(float)))
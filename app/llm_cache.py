@@ -0,0 +1,73 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+from app.disk_cache import DiskCache
+
+CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", Path(__file__).resolve().parent.parent / "data" / "cache" / "llm"))
+TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+LLM_CACHE = DiskCache(CACHE_DIR, int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1e6), suffix=".json")
+VOLATILE = {"claim_id"}  # regenerated on every rerun; must not split the cache
+
+def _canonical(v: Any) -> Any:
+    if isinstance(v, dict):
+        return {str(k): _canonical(x) for k, x in v.items() if k not in VOLATILE}
+    if isinstance(v, (list, tuple)):
+        return [_canonical(x) for x in v]
+    if isinstance(v, float):
+        return round(v, 6)
+    return v
+
+def response_key(kind: str, payload: Any, model: str, temperature: float) -> str:
+    """Hash of the canonical payload (sorted keys, volatile ids dropped, floats rounded), model and temperature."""
+    doc = {"kind": kind, "payload": _canonical(payload), "model": model, "temperature": round(float(temperature), 3)}
+    blob = json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=20).hexdigest()
+
+def get_response(key: str, ttl_s: float = TTL_S) -> Optional[str]:
+    p = LLM_CACHE.get(key)
+    if p is None:
+        return None
+    try:
+        entry = json.loads(p.read_text())
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("created", 0) > ttl_s:
+        p.unlink(missing_ok=True)
+        return None
+    return entry["response"]
+
+def put_response(key: str, response: str, **meta) -> None:
+    doc = json.dumps({"created": time.time(), "response": response, **meta}, ensure_ascii=False)
+    LLM_CACHE.put(key, lambda tmp: tmp.write_text(doc))
+
+_events: ContextVar[Optional[List[dict]]] = ContextVar("llm_cache_events", default=None)
+
+def begin_run() -> None:
+    """Start collecting cache hits/misses for the current rerun (see run_summary)."""
+    _events.set([])
+
+def run_summary() -> dict:
+    ev = _events.get() or []
+    return {"hits": sum(e["hit"] for e in ev), "misses": sum(not e["hit"] for e in ev), "calls": ev}
+
+def record(kind: str, key: str, hit: bool) -> None:
+    ev = _events.get()
+    if ev is not None:
+        ev.append({"kind": kind, "hit": hit, "key": key[:12]})
+
+def cached_response(kind: str, payload: Any, model: str, temperature: float,
+                    compute: Callable[[], str]) -> Tuple[str, bool]:
+    """(response, hit): the cached response for this payload, else `compute()` stored on success."""
+    key = response_key(kind, payload, model, temperature)
+    text = get_response(key)
+    hit = text is not None
+    if not hit:
+        text = compute()
+        put_response(key, text, kind=kind, model=model)
+    record(kind, key, hit)
+    return text, hit
@@ -0,0 +1,201 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+_DONE = object()
+
+class LLMError(RuntimeError):
+    """The hosted model could not produce a completion (after retries)."""
+
+def hosted_enabled() -> bool:
+    return os.getenv("USE_OPENAI") == "1" and bool(os.getenv("OPENAI_API_KEY"))
+
+@dataclass
+class LLMConfig:
+    """OpenAI-compatible chat endpoint settings (env overridable)."""
+    base_url: str = field(default_factory=lambda: os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"))
+    api_key: str = field(default_factory=lambda: os.getenv("OPENAI_API_KEY", ""))
+    model: str = field(default_factory=lambda: os.getenv("MODEL_NAME", "gpt-4o-mini"))
+    timeout_s: float = field(default_factory=lambda: float(os.getenv("LLM_TIMEOUT_S", "20")))
+    max_retries: int = field(default_factory=lambda: int(os.getenv("LLM_MAX_RETRIES", "2")))
+    backoff_s: float = 0.5
+    max_concurrency: int = field(default_factory=lambda: int(os.getenv("LLM_MAX_CONCURRENCY", "4")))
+
+class AsyncLLMClient:
+    """Chat-completions client running on one background event loop shared by all sessions.
+
+    Every call gets a timeout and bounded retries (timeouts, connection errors, 429/5xx),
+    at most `max_concurrency` requests are in flight, and concurrent calls with an identical
+    request body share one HTTP request. `complete()` is the blocking entry point for the
+    Streamlit script thread; `acomplete()` can be awaited on the client's loop.
+    """
+
+    def __init__(self, config: Optional[LLMConfig] = None):
+        self.config = config or LLMConfig()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+        self._sem = asyncio.Semaphore(self.config.max_concurrency)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"requests": 0, "coalesced": 0, "retries": 0, "errors": 0}
+
+    def body(self, messages: List[dict], model: Optional[str] = None, temperature: float = 0.2,
+             max_tokens: int = 350, **extra) -> dict:
+        return {"model": model or self.config.model, "messages": messages, "temperature": float(temperature),
+                "max_tokens": int(max_tokens), **extra}
+
+    @staticmethod
+    def key(body: dict) -> str:
+        return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    def _post(self, body: dict) -> dict:
+        req = urllib.request.Request(
+            self.config.base_url.rstrip("/") + "/chat/completions",
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.config.api_key}"},
+        )
+        with urllib.request.urlopen(req, timeout=self.config.timeout_s) as resp:
+            return json.loads(resp.read())
+
+    def _post_stream(self, body: dict, emit: Callable[[str], None]) -> None:
+        """Server-sent events of a `stream: true` completion; the timeout applies to each read."""
+        req = urllib.request.Request(
+            self.config.base_url.rstrip("/") + "/chat/completions",
+            data=json.dumps(dict(body, stream=True)).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Accept": "text/event-stream",
+                     "Authorization": f"Bearer {self.config.api_key}"},
+        )
+        with urllib.request.urlopen(req, timeout=self.config.timeout_s) as resp:
+            for raw in resp:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    emit(delta)
+
+    async def _stream(self, body: dict, out: queue.Queue) -> None:
+        cfg, last, sent = self.config, None, False
+
+        def emit(text: str) -> None:
+            nonlocal sent
+            sent = True
+            out.put(text)
+
+        for attempt in range(cfg.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(cfg.backoff_s * 2 ** (attempt - 1))
+            retry = False
+            try:
+                async with self._sem:
+                    self.stats["requests"] += 1
+                    await asyncio.to_thread(self._post_stream, body, emit)
+                out.put(_DONE)
+                return
+            except urllib.error.HTTPError as e:
+                last, retry = e, e.code in RETRY_STATUS
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                last, retry = e, True
+            except Exception as e:  # malformed events and the like: not retryable
+                last = e
+            if sent or not retry:  # tokens already shown cannot be taken back
+                break
+        self.stats["errors"] += 1
+        out.put(LLMError(f"{type(last).__name__}: {last}"))
+
+    def stream(self, messages: List[dict], **kw) -> Iterator[str]:
+        """Blocking generator of completion text deltas (not coalesced: each caller renders its own).
+
+        Retries happen only before the first delta; raises LLMError on failure.
+        """
+        out: queue.Queue = queue.Queue()
+        asyncio.run_coroutine_threadsafe(self._stream(self.body(messages, **kw), out), self._loop)
+        cfg = self.config
+        wait = (cfg.max_retries + 1) * cfg.timeout_s + cfg.backoff_s * 2 ** cfg.max_retries + 1
+        while True:
+            try:
+                item = out.get(timeout=wait)
+            except queue.Empty:
+                raise LLMError("timed out") from None
+            if item is _DONE:
+                return
+            if isinstance(item, LLMError):
+                raise item
+            yield item
+
+    async def _request(self, body: dict) -> str:
+        cfg, last = self.config, None
+        for attempt in range(cfg.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(cfg.backoff_s * 2 ** (attempt - 1))
+            try:
+                async with self._sem:
+                    self.stats["requests"] += 1
+                    # the timeout is urllib's: cancelling the await would free the slot while the
+                    # thread still holds the connection, so the slot is released only when it ends
+                    data = await asyncio.to_thread(self._post, body)
+                return data["choices"][0]["message"]["content"]
+            except urllib.error.HTTPError as e:
+                last = e
+                if e.code not in RETRY_STATUS:
+                    break
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                last = e
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                last = e
+                break
+        self.stats["errors"] += 1
+        raise LLMError(f"{type(last).__name__}: {last}")
+
+    async def acomplete(self, messages: List[dict], **kw) -> str:
+        body = self.body(messages, **kw)
+        k = self.key(body)
+        fut = self._inflight.get(k)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(fut)
+        fut = asyncio.ensure_future(self._request(body))
+        self._inflight[k] = fut
+        fut.add_done_callback(lambda _: self._inflight.pop(k, None))
+        return await asyncio.shield(fut)
+
+    def complete(self, messages: List[dict], **kw) -> str:
+        """Blocking call from any thread; raises LLMError when the model is unavailable."""
+        cf = asyncio.run_coroutine_threadsafe(self.acomplete(messages, **kw), self._loop)
+        cfg = self.config
+        # hard stop for the caller: every attempt plus backoff, with a little slack
+        budget = (cfg.max_retries + 1) * cfg.timeout_s + cfg.backoff_s * 2 ** cfg.max_retries + 1
+        try:
+            return cf.result(timeout=budget)
+        except TimeoutError as e:
+            cf.cancel()
+            raise LLMError("timed out") from e
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1)
+
+_client: Optional[AsyncLLMClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> AsyncLLMClient:
+    """Process-wide client, so limits and request coalescing span all sessions."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncLLMClient()
+        return _client
@@ -1,25 +1,22 @@
 from __future__ import annotations
 import json, time, hashlib
-from pathlib import Path
-import pandas as pd
+from app.run_store import RUN_STORE, RunStore
 
-ART = Path(__file__).resolve().parent.parent / "artifacts" / "runs"
+ART = RUN_STORE.root
 
 def _run_id(payload, settings) -> str:
-    key = json.dumps({"payload": payload, "settings": settings}, sort_keys=True).encode()
+    key = json.dumps({"payload": payload, "settings": settings}, sort_keys=True, default=str).encode()
     h = hashlib.sha1(key).hexdigest()[:8]
     return time.strftime("%Y%m%d_%H%M%S") + "_" + h
 
-def save_run(payload: dict, insights, checked_rows: list[dict], settings: dict) -> str:
-    rid = _run_id(payload, settings)
-    out = ART / rid
-    out.mkdir(parents=True, exist_ok=True)
-    (out / "meta.json").write_text(json.dumps(settings, indent=2))
-    (out / "payload.json").write_text(json.dumps(payload, indent=2))
+def save_run(payload: dict, insights, checked_rows: list[dict], settings: dict, timings: list[dict] | None = None,
+             store: RunStore | None = None) -> str:
+    """Queue the run for the run store (written in the background) and return its run id."""
     try:
         serial = [i.model_dump() if hasattr(i, "model_dump") else i for i in insights]
     except Exception:
         serial = [getattr(i, "__dict__", str(i)) for i in insights]
-    (out / "insights_raw.json").write_text(json.dumps(serial, indent=2))
-    pd.DataFrame(checked_rows).to_csv(out / "checked.csv", index=False)
-    return str(out)
+    rid = _run_id(payload, settings)
+    (store or RUN_STORE).put({"run_id": rid, "ts": time.time(), "settings": settings, "payload": payload,
+                              "insights": serial, "checked": list(checked_rows), "timings": timings})
+    return rid
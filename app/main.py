@@ -9,68 +9,216 @@ if str(ROOT) not in sys.path:
 # -----------------------------------
 
 import os, calendar
+from typing import Optional
 import streamlit as st
 import pandas as pd
-from app.kpis import revenue, orders, aov, top_products, FilterCtx
+from app.kpis import top_products, compute_kpis, kpi_dict, FilterCtx
+from app.cube import KpiCube, build_cube
+from app.dataset import OrdersDataset
+from app.compact import compact_orders, memory_report, uncompacted_bytes
+from app.data_loader import PART, load_orders, dataset_meta, dataset_version
+from app.backends import DuckDBBackend
 from app.insight_engine import generate_insights
 from app.fact_checker import check_insights
 from app.components import kpi_tiles, trend_chart, top_products_bar
 from app.logger import save_run
+from app import perf, llm_cache
 from app.upload import upload_data_widget
-from app.explainer import explain
+from app.explainer import explain_stream
+from app.anomalies import METHODS as ANOMALY_METHODS, detect_anomalies, rank_segments, segment_daily
 from app.analytics import (
-    apply_filters, daily_revenue, yoy_period, mix_table, price_volume_bridge, zscore_last_day,
-    quarterly_report
+    apply_filters, daily_revenue, previous_period, yoy_period, segment_agg, segment_agg_windows, mix_from_agg, DRILL,
+    price_volume_bridge, pvm_bridge, pvm_summary, pvm_rollup, pvm_top, PVM_EFFECTS, zscore_last_day,
+    quarterly_report, QuarterlyCache
 )
+from app.memo import MEMO, memoized
+from app.export import EXPORT_CACHE, FORMATS, export_key, prepare_export, preview_csv
 
 BASE = Path(__file__).resolve().parent.parent
 PROC = BASE / "data" / "processed" / "orders.parquet"
 SAMP = BASE / "data" / "samples" / "sample_orders.parquet"
-
-@st.cache_data
-def load_sample_or_processed() -> pd.DataFrame:
-    path = PROC if PROC.exists() else SAMP
-    df = pd.read_parquet(path)
+ANOMALY_COLS = ("order_date", "category", "store", "revenue")
+META_COLS = ("order_date", "category", "store")
+VIEW_COLS = ("order_id", "order_date", "product", "category", "store", "quantity", "unit_price", "revenue")
+
+# Reruns triggered by widgets that don't change a result (currency, temperature, ...) reuse it.
+# Memoized results (the filtered frame included) are shared across reruns and sessions: read-only.
+apply_filters = memoized(apply_filters)
+segment_agg = memoized(segment_agg)
+segment_agg_windows = memoized(segment_agg_windows)
+pvm_bridge = memoized(pvm_bridge)
+price_volume_bridge = memoized(price_volume_bridge)
+daily_revenue = memoized(daily_revenue)
+top_products = memoized(top_products)
+detect_anomalies = memoized(detect_anomalies)
+segment_daily = memoized(segment_daily)
+
+def _read_processed(start=None, end=None, store=None, columns=None) -> pd.DataFrame:
+    # Partitioned dataset: read only the partitions/columns the view needs.
+    if PART.exists():
+        df = load_orders(PART, start, end, store, columns)
+    else:
+        filters = [f for f in [("order_date", ">=", start) if start is not None else None,
+                               ("order_date", "<=", end) if end is not None else None,
+                               ("store", "==", store) if store else None] if f]
+        df = pd.read_parquet(PROC if PROC.exists() else SAMP, columns=list(columns) if columns else None,
+                             filters=filters or None)
     df["order_date"] = pd.to_datetime(df["order_date"])
     return df
 
-def date_bounds(df: pd.DataFrame):
-    return df["order_date"].min().date(), df["order_date"].max().date()
+def view_span(start, end, compare_prev: bool, compare_yoy: bool) -> tuple:
+    """First and last day any of the view's KPI windows (current, previous, YoY) can touch."""
+    starts = [start] + ([previous_period(start, end)[0]] if compare_prev else []) + \
+             ([yoy_period(start, end)[0]] if compare_yoy else [])
+    return min(starts), end
+
+# A view reads only the (year, month, store) partitions of its date span and the columns the
+# dashboard uses; whole-history views (quarterly report) ask for `load_history` instead.
+# `version` (see dataset_version) only keys the caches, so appended data shows up on the next rerun;
+# it also tags the frames for MEMO, so memoized calls on them never hash their content.
+@st.cache_resource(max_entries=8)
+def load_view(lo, hi, store=None, version=0) -> OrdersDataset:
+    ds = OrdersDataset(compact_orders(_read_processed(lo, hi, store, VIEW_COLS)))
+    MEMO.tag(ds, f"view:{lo}:{hi}:{store}:{version}")
+    return ds
+
+@st.cache_resource(max_entries=8)
+def load_view_cube(lo, hi, store=None, version=0) -> KpiCube:
+    return build_cube(load_view(lo, hi, store, version).df)
+
+@st.cache_data(max_entries=8)
+def load_memory_report(lo, hi, store=None, version=0) -> pd.DataFrame:
+    df = load_view(lo, hi, store, version).df
+    return memory_report(uncompacted_bytes(df), df)
+
+@st.cache_resource(max_entries=2)
+def load_history(store=None, version=0) -> OrdersDataset:
+    """Every partition of the store scope, for whole-history views only."""
+    ds = OrdersDataset(compact_orders(_read_processed(store=store, columns=VIEW_COLS)))
+    MEMO.tag(ds, f"history:{store}:{version}")
+    return ds
+
+@st.cache_data(max_entries=4)
+def load_segment_daily(version=0) -> pd.DataFrame:
+    """Whole-history day × category × store revenue; only the aggregate is cached, not the rows."""
+    backend = load_sql_backend(version)
+    if backend is not None:  # summed in DuckDB; only timestamp × category × store sums come back
+        cells = backend.group_sum(None, None, FilterCtx(), by=list(ANOMALY_COLS[:3])).reset_index()
+        return segment_daily.uncached(cells)
+    return segment_daily.uncached(_read_processed(columns=ANOMALY_COLS))
+
+@st.cache_resource(max_entries=2)
+def load_sql_backend(version=0):
+    """DuckDB over the on-disk Parquet when ANALYTICS_BACKEND=duckdb, else None (pandas in memory).
+
+    One backend object per dataset version, so memoized results keyed by it follow appends.
+    """
+    if os.getenv("ANALYTICS_BACKEND", "pandas").lower() != "duckdb":
+        return None
+    return DuckDBBackend(PART if PART.exists() else PROC if PROC.exists() else SAMP)
+
+@st.cache_resource(max_entries=8)
+def quarterly_cache(scope: str) -> QuarterlyCache:
+    """Incremental quarter partials, shared across reruns for one history scope."""
+    return QuarterlyCache()
+
+def frame_meta(df: pd.DataFrame) -> dict:
+    return {"min_date": df["order_date"].min(), "max_date": df["order_date"].max(),
+            "categories": sorted(df["category"].astype(str).unique().tolist()),
+            "stores": sorted(df["store"].astype(str).unique().tolist())}
 
-def kpi_block(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp, fctx: FilterCtx):
-    rev = revenue(df, start, end, fctx)
-    ords = orders(df, start, end, fctx)
-    avg = aov(df, start, end, fctx)
-    kpi_tiles(rev, ords, avg)
-    return {"revenue": rev, "orders": float(ords), "aov": avg}
+@st.cache_data
+def load_source_meta(version=0) -> dict:
+    return dataset_meta(PART) if PART.exists() else frame_meta(_read_processed(columns=META_COLS))
 
-def build_prompt_payload(df: pd.DataFrame, start, end, fctx: FilterCtx, compare_prev: bool):
+def kpi_windows(start, end, fctx: FilterCtx, compare_prev: bool, compare_yoy: bool) -> dict:
+    wins = {"current": (start, end, fctx)}
+    if compare_prev:
+        wins["previous"] = (*previous_period(start, end), fctx)
+    if compare_yoy:
+        wins["yoy"] = (*yoy_period(start, end), fctx)
+    return wins
+
+@memoized
+def window_kpis(df: pd.DataFrame, wins: dict, cube=None) -> dict:
+    kf = compute_kpis(df, list(wins.values()), cube=cube)
+    return {name: kpi_dict(kf, i) for i, name in enumerate(wins)}
+
+@memoized
+def quarterly_view(history, fctx: FilterCtx, fiscal_start_month: int, backend=None, cache=None,
+                   version: int = 0) -> pd.DataFrame:
+    # `version` keys the memo for backends, whose results change on append without new arguments,
+    # and lets the cache skip re-hashing the history while the data is unchanged
+    return quarterly_report(history, fctx, n_quarters=8, fiscal_start_month=fiscal_start_month,
+                            backend=backend, cache=cache, version=version)
+
+def kpi_block(k: dict):
+    kpi_tiles(k["revenue"], int(k["orders"]), k["aov"])
+    return {"revenue": k["revenue"], "orders": float(k["orders"]), "aov": k["aov"]}
+
+def build_prompt_payload(df: pd.DataFrame, start, end, fctx: FilterCtx, kvals: dict):
     tp_df = top_products(df, start, end, fctx, n=1)
     tp = {"product": tp_df.iloc[0]["product"], "revenue": float(tp_df.iloc[0]["revenue"])} if len(tp_df) else None
     payload = {
         "period": {"start": str(start.date()), "end": str(end.date())},
         "filter": {"category": fctx.category, "store": fctx.store},
-        "current": {
-            "revenue": float(revenue(df, start, end, fctx)),
-            "orders": float(orders(df, start, end, fctx)),
-            "aov": float(aov(df, start, end, fctx)),
-        },
+        "current": dict(kvals["current"]),
         "top_product": tp
     }
-    if compare_prev:
-        period_len = (end - start).days + 1
-        prev_start = start - pd.Timedelta(days=period_len)
-        prev_end = start - pd.Timedelta(days=1)
-        payload["previous"] = {
-            "revenue": float(revenue(df, prev_start, prev_end, fctx)),
-            "orders": float(orders(df, prev_start, prev_end, fctx)),
-            "aov": float(aov(df, prev_start, prev_end, fctx)),
-        }
+    if "previous" in kvals:
+        payload["previous"] = dict(kvals["previous"])
     return payload
 
-def render_insights(df: pd.DataFrame, payload: dict):
-    insights = generate_insights(payload)
-    checked = check_insights(insights, df, tolerance_pct=0.5)
+def render_mix(mt: pd.DataFrame):
+    if mt.empty:
+        st.info("Not enough data for mix table.")
+        return
+    mt_disp = mt.copy()
+    for col in ["share_cur","share_prev","delta_share"]:
+        mt_disp[col] = mt_disp[col].apply(fmt_pct)
+    st.dataframe(mt_disp, use_container_width=True, height=320)
+
+def render_pvm(agg):
+    """Product-level price / volume / mix bridge with category/store roll-ups and top items per effect."""
+    items = pvm_bridge(agg)
+    if items.empty:
+        return
+    st.markdown("**Price / volume / mix by product**")
+    st.caption("Mix = shift in quantity share between products (and stores) at last period's prices; "
+               "price = change in each product's own unit price.")
+    st.dataframe(pvm_summary(items, agg), use_container_width=True, height=320)
+    c1, c2 = st.columns(2)
+    with c1:
+        by = st.radio("Roll up by", ["category", "store", "product"], horizontal=True)
+        st.dataframe(pvm_rollup(items, by).head(50), use_container_width=True, height=280)
+    with c2:
+        effect = st.selectbox("Top products for effect", PVM_EFFECTS, index=PVM_EFFECTS.index("price"))
+        st.dataframe(pvm_top(items, effect, n=10), use_container_width=True, height=280)
+
+def render_segment_anomalies(df: Optional[pd.DataFrame], start, end, version: int = 0):
+    """Ranked anomalies over every category × store series (whole history, flagged within the view)."""
+    st.subheader("Segment anomalies (all categories × stores)")
+    c1, c2, c3 = st.columns(3)
+    method = c1.selectbox("Method", list(ANOMALY_METHODS), format_func=lambda m: f"{m}: {ANOMALY_METHODS[m]}")
+    window = c2.slider("Baseline window (days)", 14, 91, 28, 7, disabled=method == "seasonal",
+                       help="Seasonal compares with the same weekday over the previous 8 weeks.")
+    threshold = c3.slider("Flag at |score| ≥", 2.0, 6.0, 3.5, 0.5)
+    cells = segment_daily(df) if df is not None else load_segment_daily(version)
+    flags = detect_anomalies(cells, method, window, threshold, start, end)
+    if flags.empty:
+        st.caption(f"No segment-days with |score| ≥ {threshold:g} in the selected dates.")
+        return
+    ranked = rank_segments(flags)
+    st.caption(f"{len(flags):,} flagged segment-days in {len(ranked):,} segments "
+               f"({cells.groupby(['category', 'store'], observed=True).ngroups:,} series scored).")
+    st.dataframe(ranked.head(50).round({"max_abs_score": 1}), use_container_width=True, height=280)
+    with st.expander("Flagged days", expanded=False):
+        st.dataframe(flags.head(500).round({"revenue": 2, "expected": 2, "score": 2}),
+                     use_container_width=True, height=320)
+
+def render_insights(df: pd.DataFrame, payload: dict, cube=None, model: Optional[str] = None):
+    insights = generate_insights(payload, model=model)
+    checked = check_insights(insights, df, tolerance_pct=0.5, cube=cube)
     st.subheader("AI Insights (Fact-Checked)")
     rows = []
     for c in checked:
@@ -86,12 +234,46 @@ def render_insights(df: pd.DataFrame, payload: dict):
                            file_name="insight_audit_log.csv", mime="text/csv")
     return insights, checked, rows
 
+def render_perf_panel(tracer: perf.Tracer):
+    with st.sidebar.expander("Performance", expanded=True):
+        tf = tracer.to_frame()
+        tf["section"] = ["\u2003" * d + n for d, n in zip(tf["depth"], tf["name"])]
+        m = MEMO.stats()
+        st.caption(f"Rerun: {tracer.total_seconds * 1e3:,.0f} ms • Memo: {m['hits']:,} hits / {m['misses']:,} misses, "
+                   f"{m['entries']} entries, {m['mb']:,.1f} of {m['budget_mb']:,.0f} MB")
+        cols = ["section", "ms", "rows"] + (["peak_mb_delta"] if tracer.trace_memory else [])
+        st.dataframe(tf[cols], use_container_width=True,
+                     hide_index=True, height=360)
+
+def render_export(filtered: pd.DataFrame):
+    """Build the file only when asked (streamed into the export cache); the preview reads only the first rows."""
+    st.subheader("Export")
+    c1, c2 = st.columns([3, 1])
+    fmt = c1.selectbox("Format", list(FORMATS), key="export_fmt")
+    key = export_key(MEMO.fingerprint(filtered), fmt)
+    if c2.button("Prepare download", use_container_width=True):
+        with st.spinner(f"Writing {len(filtered):,} rows…"):
+            prepare_export(filtered, fmt, key)
+    path = EXPORT_CACHE.get(key)
+    if path is not None:
+        ext, mime = FORMATS[fmt]
+        # the bytes are read only when the button is clicked, not on every rerun
+        st.download_button(f"Download current view ({fmt}, {path.stat().st_size / 1e6:,.1f} MB)",
+                           data=path.read_bytes, file_name=f"current_view.{ext}", mime=mime,
+                           on_click="ignore", use_container_width=True)
+    with st.expander("Preview CSV / quick copy"):
+        # st.code shows a copy-to-clipboard icon in the UI
+        st.code(preview_csv(filtered), language="text")
+
 def fmt_pct(x):
     return f"{x*100:,.1f}%" if pd.notna(x) else "-"
 
 def main():
     st.set_page_config(page_title="AI KPI Dashboard (with Fact Checker)", layout="wide")
     st.title("AI KPI Dashboard (with Fact Checker)")
+    tracer = perf.start_trace()
+    llm_cache.begin_run()
+    tracer.section("source")
 
     # Data source
     with st.sidebar:
@@ -102,16 +284,23 @@ def main():
         if df is None or df.empty:
             st.info("Upload a file and click **Use this data** in the sidebar to begin.")
             st.stop()
+        cube = st.session_state.get("uploaded_cube")
+        ds = st.session_state.get("uploaded_ds")
+        if ds is None:
+            ds = OrdersDataset(df)
+        mem = st.session_state.get("uploaded_mem")
+        meta = frame_meta(df)
     else:
-        df = load_sample_or_processed()
+        version = dataset_version(PART)
+        meta = load_source_meta(version)
 
     # Filters & options
-    min_d, max_d = date_bounds(df)
+    min_d, max_d = meta["min_date"].date(), meta["max_date"].date()
     with st.sidebar:
         st.header("Filters")
         sd, ed = st.date_input("Date range", value=(min_d, max_d), min_value=min_d, max_value=max_d)
-        category = st.selectbox("Category", ["(All)"] + sorted(df["category"].astype(str).unique().tolist()))
-        store = st.selectbox("Store", ["(All)"] + sorted(df["store"].astype(str).unique().tolist()))
+        category = st.selectbox("Category", ["(All)"] + meta["categories"])
+        store = st.selectbox("Store", ["(All)"] + meta["stores"])
         compare_prev = st.checkbox("Compare with previous period", value=True)
         compare_yoy = st.checkbox("Compare YoY (same dates last year)", value=True)
 
@@ -119,7 +308,7 @@ def main():
         show_mix = st.checkbox("Show mix-shift tables", value=True)
         mix_dim = st.selectbox("Mix dimension", ["category","store"])
         show_bridge = st.checkbox("Show price vs volume bridge", value=True)
-        show_outliers = st.checkbox("Show outlier badge (z-score)", value=True)
+        show_outliers = st.checkbox("Show outliers (z-score badge + segment anomalies)", value=True)
         show_quarterly = st.checkbox("Show quarterly report", value=True)
 
         st.header("Conventions")
@@ -134,106 +323,108 @@ def main():
         temperature = st.slider("Temperature", 0.0, 1.0, float(os.getenv("TEMPERATURE", "0.2")), 0.05)
         want_explain = st.checkbox("Explain insights (Executive summary)", value=True)
         log_run = st.checkbox("Log runs to artifacts/", value=True)
+        show_perf = st.checkbox("Show performance panel", value=False)
 
     # Context
     start = pd.to_datetime(sd); end = pd.to_datetime(ed)
     fctx = FilterCtx(category=None if category == "(All)" else category,
                      store=None if store == "(All)" else store)
 
-    # KPIs
-    kpis = kpi_block(df, start, end, fctx)
+    # Built-in data: with DuckDB nothing is loaded up front (KPIs, drivers and slices are queried);
+    # in pandas, only the partitions the view's windows span, for its store
+    tracer.section("load")
+    backend = load_sql_backend(version) if src != "Upload CSV/XLSX" else None
+    if backend is not None:
+        ds, df, cube, mem = backend, None, None, None
+    elif src != "Upload CSV/XLSX":
+        lo, hi = view_span(start, end, compare_prev, compare_yoy)
+        ds = load_view(lo, hi, fctx.store, version)
+        df = ds.df
+        cube = load_view_cube(lo, hi, fctx.store, version)
+        mem = load_memory_report(lo, hi, fctx.store, version)
+    n_rows = len(ds) if backend is None else None
+    if mem is not None:
+        with st.sidebar.expander("Memory footprint", expanded=False):
+            st.dataframe(mem, use_container_width=True, height=240)
+
+    # KPIs (current, previous and YoY windows in one batch)
+    tracer.section("kpis", rows=n_rows)
+    kvals = window_kpis(ds, kpi_windows(start, end, fctx, compare_prev, compare_yoy), cube)
+    kpis = kpi_block(kvals["current"])
+    if cube is not None and cube.orders_rel_error:
+        st.caption(f"Orders and AOV are HyperLogLog estimates (±{100 * cube.orders_rel_error:.1f}%).")
 
     # “Last updated” + conventions
-    last_dt = pd.to_datetime(df["order_date"].max()).date() if not df.empty else None
+    last_dt = pd.to_datetime(meta["max_date"]).date() if pd.notna(meta["max_date"]) else None
     st.caption(f"Data last updated: {last_dt} • Currency: {currency_symbol} • Fiscal start: {calendar.month_name[fiscal_start_month]}")
 
     # Slices
-    filtered = apply_filters(df, start, end, fctx)
+    tracer.section("slices", rows=n_rows)
+    filtered = apply_filters(ds, start, end, fctx)
 
     prev_filtered = None
     if compare_prev:
-        period_len = (end - start).days + 1
-        prev_start = start - pd.Timedelta(days=period_len)
-        prev_end = start - pd.Timedelta(days=1)
-        prev_filtered = apply_filters(df, prev_start, prev_end, fctx)
+        prev_start, prev_end = previous_period(start, end)
+        prev_filtered = apply_filters(ds, prev_start, prev_end, fctx)
 
     yoy_filtered = None
     if compare_yoy:
         y_start, y_end = yoy_period(start, end)
-        yoy_filtered = apply_filters(df, y_start, y_end, fctx)
+        yoy_filtered = apply_filters(ds, y_start, y_end, fctx)
 
     # Charts
+    tracer.section("charts", rows=len(filtered))
     st.divider()
     trend_chart(filtered, freq="M")
     top_products_bar(filtered, n=10)
     st.divider()
 
-    # NEW — Export current view (CSV)
-    st.subheader("Export")
-    export_cols_pref = ["order_date","category","store","product","quantity","unit_price","revenue"]
-    export_cols = [c for c in export_cols_pref if c in filtered.columns]
-    try:
-        csv_bytes = (
-            filtered[export_cols]
-            .sort_values("order_date" if "order_date" in export_cols else export_cols[0])
-            .to_csv(index=False)
-            .encode("utf-8")
-        )
-    except Exception:
-        csv_bytes = filtered.to_csv(index=False).encode("utf-8")
-
-    st.download_button(
-        "Download current view (CSV)",
-        data=csv_bytes,
-        file_name="current_view.csv",
-        mime="text/csv",
-        use_container_width=True,
-    )
-    with st.expander("Preview CSV / quick copy"):
-        # st.code shows a copy-to-clipboard icon in the UI
-        st.code(csv_bytes.decode("utf-8")[:80_000], language="text")
+    # Export current view (built on request)
+    tracer.section("export", rows=len(filtered))
+    render_export(filtered)
 
     # Comparisons
+    tracer.section("comparisons")
     if compare_prev or compare_yoy:
         st.subheader("Comparisons")
     if compare_prev and prev_filtered is not None and not prev_filtered.empty:
-        cur_rev, prev_rev = float(filtered["revenue"].sum()), float(prev_filtered["revenue"].sum())
+        cur_rev, prev_rev = kvals["current"]["revenue"], kvals["previous"]["revenue"]
         delta = cur_rev - prev_rev
         pct = (delta / prev_rev) if prev_rev else 0.0
         st.markdown(f"**Vs previous period:** Revenue Δ {currency_symbol}{delta:,.0f}  ({pct*100:,.1f}%)")
     if compare_yoy and yoy_filtered is not None and not yoy_filtered.empty:
-        cur_rev, yoy_rev = float(filtered["revenue"].sum()), float(yoy_filtered["revenue"].sum())
+        cur_rev, yoy_rev = kvals["current"]["revenue"], kvals["yoy"]["revenue"]
         delta = cur_rev - yoy_rev
         pct = (delta / yoy_rev) if yoy_rev else 0.0
         st.markdown(f"**YoY:** Revenue Δ {currency_symbol}{delta:,.0f}  ({pct*100:,.1f}%)")
 
-    # Mix-shift
+    # Mix-shift: one aggregation of both slices serves both tables, the drill-down and the summary drivers
+    tracer.section("mix", rows=len(filtered))
+    agg = None
+    if show_mix or show_bridge or want_explain:
+        if backend is not None:
+            prev_win = (*previous_period(start, end), fctx) if compare_prev else None
+            agg = segment_agg_windows(backend, (start, end, fctx), prev_win)
+        else:
+            agg = segment_agg(filtered, prev_filtered)
     if show_mix:
         st.subheader("Mix shift")
-        c1, c2 = st.columns(2)
-        with c1:
-            st.caption(f"Top {mix_dim} by share (current vs prior)")
-            mt = mix_table(filtered, prev_filtered, by=mix_dim, top_n=10)
-            if mt.empty:
-                st.info("Not enough data for mix table.")
-            else:
-                mt_disp = mt.copy()
-                for col in ["share_cur","share_prev","delta_share"]:
-                    mt_disp[col] = mt_disp[col].apply(fmt_pct)
-                st.dataframe(mt_disp, use_container_width=True, height=320)
-        with c2:
-            alt_dim = "store" if mix_dim == "category" else "category"
-            st.caption(f"Top {alt_dim} by share (current vs prior)")
-            mt2 = mix_table(filtered, prev_filtered, by=alt_dim, top_n=10)
-            if mt2.empty:
-                st.info("Not enough data for mix table.")
-            else:
-                mt2_disp = mt2.copy()
-                for col in ["share_cur","share_prev","delta_share"]:
-                    mt2_disp[col] = mt2_disp[col].apply(fmt_pct)
-                st.dataframe(mt2_disp, use_container_width=True, height=320)
+        alt_dim = "store" if mix_dim == "category" else "category"
+        for col, dim in zip(st.columns(2), (mix_dim, alt_dim)):
+            with col:
+                st.caption(f"Top {dim} by share (current vs prior)")
+                render_mix(mix_from_agg(agg, by=dim, top_n=10))
+        child = DRILL.get(mix_dim)
+        if child in agg.dims and mix_dim in agg.dims and not agg.leaf.empty:
+            segments = agg.rollup(mix_dim).sort_values("revenue_cur", ascending=False).index.tolist()
+            seg = st.selectbox(f"Drill into {mix_dim}", [None] + segments,
+                               format_func=lambda v: "(none)" if v is None else str(v))
+            if seg is not None:
+                st.caption(f"{child.title()} mix within {mix_dim} {seg} (current vs prior)")
+                render_mix(mix_from_agg(agg, by=child, top_n=15, where={mix_dim: seg}))
 
     # Price vs volume bridge
+    tracer.section("bridge", rows=len(filtered))
     if show_bridge:
         st.subheader("Revenue bridge (price vs volume)")
         bridge = price_volume_bridge(filtered, prev_filtered)
@@ -242,8 +433,10 @@ def main():
         else:
             st.dataframe(bridge, use_container_width=True, height=240)
             st.bar_chart(bridge.set_index("component")["value"])
+            render_pvm(agg)
 
     # Outlier badge
+    tracer.section("outliers", rows=len(filtered))
     if show_outliers:
         s = daily_revenue(filtered)
         z = zscore_last_day(s)
@@ -252,11 +445,22 @@ def main():
             st.warning(f"Outlier: last day is {arrow} {abs(z):.1f}σ from mean (daily revenue).")
         else:
             st.caption("No daily revenue outliers (|z| < 2).")
+        render_segment_anomalies(df if src == "Upload CSV/XLSX" else None, start, end,
+                                 0 if src == "Upload CSV/XLSX" else version)
 
     # Quarterly report (fiscal-aware)
+    tracer.section("quarterly")
     if show_quarterly:
         st.subheader("Quarterly report (last 8 quarters)")
-        qr = quarterly_report(df, fctx, n_quarters=8, fiscal_start_month=int(fiscal_start_month))
+        # whole-history view: aggregated in DuckDB when enabled, else from the in-memory dataset
+        # (the whole history of the store scope) through the incremental quarter cache
+        history, qcache = None, None
+        if backend is None:
+            history = ds if src == "Upload CSV/XLSX" else load_history(fctx.store, version)
+            qcache = (st.session_state.setdefault("uploaded_qcache", QuarterlyCache())  # reset per upload
+                      if src == "Upload CSV/XLSX" else quarterly_cache(f"builtin:{fctx.store or '*'}"))
+        qr = quarterly_view(history, fctx, int(fiscal_start_month), backend=backend, cache=qcache,
+                            version=0 if src == "Upload CSV/XLSX" else version)
         if qr.empty:
             st.info("Not enough data for a quarterly report.")
         else:
@@ -264,18 +468,31 @@ def main():
             for col in ["qoq_pct","yoy_pct"]:
                 qrf[col] = qrf[col].apply(fmt_pct)
             st.dataframe(qrf, use_container_width=True, height=320)
+            if qcache is not None and qcache.orders_rel_error:
+                st.caption(f"Quarterly orders and AOV are HyperLogLog estimates (±{100 * qcache.orders_rel_error:.1f}%).")
             st.download_button("Download quarterly report (CSV)",
                                data=qr.to_csv(index=False).encode("utf-8"),
                                file_name="quarterly_report.csv", mime="text/csv")
 
     # Insights + summary
-    payload = build_prompt_payload(df, start, end, fctx, compare_prev=compare_prev)
-    insights, checked, rows = render_insights(df, payload)
+    tracer.section("insights", rows=n_rows)
+    payload = build_prompt_payload(ds, start, end, fctx, kvals)
+    insights, checked, rows = render_insights(ds, payload, cube, model=model_name)
 
+    # Executive summary: reserve its place now, stream it after everything else is on the page
+    summary_slot = st.empty() if want_explain else None
+    log_slot = st.empty()
+    st.caption("Offline by default; set USE_OPENAI=1 + OPENAI_API_KEY to enable a hosted model.")
+    st.caption("Upload CSV/XLSX in the sidebar to analyze your own data.")
+
+    stream_stats = {}
     if want_explain:
-        txt = explain(rows, kpis, df_current=filtered, df_prev=prev_filtered,
-                      model=model_name, temperature=float(temperature))
-        st.markdown(txt)
+        tracer.section("explain", rows=len(filtered))
+        chunks = explain_stream(rows, kpis, df_current=filtered, df_prev=prev_filtered,
+                                model=model_name, temperature=float(temperature), agg=agg)
+        with summary_slot.container():
+            st.write_stream(perf.measure_stream(chunks, "explain", stream_stats))
+    tracer.finish()
 
     if log_run:
         settings = {"model": model_name, "temperature": float(temperature),
@@ -283,11 +500,13 @@ def main():
                     "mix_dim": mix_dim, "show_quarterly": show_quarterly,
                     "fiscal_start_month": int(fiscal_start_month),
                     "currency_symbol": currency_symbol,
-                    "source": src}
-        path = save_run(payload, insights, rows, settings)
-        st.caption(f"Run logged to: {path}")
-
-    st.caption("Offline by default; set USE_OPENAI=1 + OPENAI_API_KEY to enable a hosted model.")
-    st.caption("Upload CSV/XLSX in the sidebar to analyze your own data.")
+                    "source": src,
+                    "llm_cache": llm_cache.run_summary(),
+                    "explain_stream": stream_stats}
+        rid = save_run(payload, insights, rows, settings, timings=tracer.to_records())
+        log_slot.caption(f"Run logged as {rid} (run store: artifacts/runs)")
+
+    if show_perf:
+        render_perf_panel(tracer)
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import dataclasses
+import functools
+import hashlib
+import itertools
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.dataset import OrdersDataset
+
+SAMPLE_ROWS = 4096
+
+def _frame_fingerprint(df: pd.DataFrame) -> str:
+    """Shape, schema, category labels and an evenly spaced sample of at most SAMPLE_ROWS rows.
+
+    O(SAMPLE_ROWS), not O(rows): an edit that touches only unsampled rows of a large frame
+    keeps its fingerprint and would hit a stale result. Frames the dashboard builds itself never
+    rely on the sample - loaders `tag` theirs with the dataset version / upload key, and results
+    of memoized calls inherit a fingerprint of the call - so it only keys ad-hoc frames.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((df.shape, list(df.columns), [str(t) for t in df.dtypes])).encode())
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            h.update(pd.util.hash_pandas_object(df[c].cat.categories.to_series(), index=False).to_numpy())
+    if len(df):
+        rows = np.unique(np.linspace(0, len(df) - 1, min(len(df), SAMPLE_ROWS)).astype(np.intp))
+        h.update(pd.util.hash_pandas_object(df.iloc[rows], index=False).to_numpy())
+    return h.hexdigest()
+
+class _Unkeyable(Exception):
+    """An argument that can be neither hashed nor weak-referenced: the call is not memoized."""
+
+class Memo:
+    """Process-wide LRU memo for dashboard computations, bounded by an estimated memory budget.
+
+    Keys are the function name plus its arguments, with DataFrames / OrdersDatasets replaced
+    by a fingerprint (cached per live object): the loader's `tag`, the key of the memoized call
+    that produced the frame, or else a sampled content hash. The same view over the same data
+    therefore hits regardless of which rerun produced the frame. Other unhashable arguments (cubes,
+    caches, ...) key by a per-object token that is never reused. Results are shared between
+    callers and sessions and must be treated as read-only: copy before modifying.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.RLock()  # re-entered by weakref callbacks run during a locked section
+        self._data: "OrderedDict[tuple, Tuple[Any, int]]" = OrderedDict()
+        self._fps: Dict[int, Tuple[weakref.ref, str]] = {}
+        self._tokens: Dict[int, Tuple[weakref.ref, int]] = {}
+        self._next_token = itertools.count()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def _remember(self, table: dict, obj: Any, value):
+        """Map live `obj` to `value` in `table` until `obj` is collected."""
+        oid = id(obj)
+        def forget(ref):
+            with self._lock:
+                if oid in table and table[oid][0] is ref:
+                    del table[oid]
+        table[oid] = (weakref.ref(obj, forget), value)
+        return value
+
+    def _lookup(self, table: dict, obj: Any):
+        hit = table.get(id(obj))
+        return hit[1] if hit is not None and hit[0]() is obj else None
+
+    def tag(self, df: pd.DataFrame | OrdersDataset, fingerprint: str) -> None:
+        """Key `df` by `fingerprint` (e.g. the dataset version it was loaded at) instead of its content."""
+        frame = df.df if isinstance(df, OrdersDataset) else df
+        with self._lock:
+            self._remember(self._fps, frame, fingerprint)
+
+    def fingerprint(self, df: pd.DataFrame | OrdersDataset) -> str:
+        frame = df.df if isinstance(df, OrdersDataset) else df
+        with self._lock:
+            fp = self._lookup(self._fps, frame)
+        if fp is not None:
+            return fp
+        fp = _frame_fingerprint(frame)
+        with self._lock:
+            return self._remember(self._fps, frame, fp)
+
+    def _token(self, v: Any) -> int:
+        with self._lock:
+            tok = self._lookup(self._tokens, v)
+            if tok is not None:
+                return tok
+            try:
+                return self._remember(self._tokens, v, next(self._next_token))
+            except TypeError:
+                raise _Unkeyable(type(v).__name__) from None
+
+    def _key_part(self, v: Any):
+        if isinstance(v, (pd.DataFrame, OrdersDataset)):
+            return ("frame", self.fingerprint(v))
+        if isinstance(v, (list, tuple)):
+            return (type(v).__name__, tuple(self._key_part(x) for x in v))
+        if isinstance(v, dict):
+            return ("dict", tuple(sorted((k, self._key_part(x)) for k, x in v.items())))
+        try:
+            hash(v)
+            return v
+        except TypeError:
+            return ("obj", self._token(v))  # e.g. cubes and caches: the same live object means the same source
+
+    def key(self, fn: Callable, args: tuple, kwargs: dict) -> tuple:
+        return (fn.__module__, fn.__qualname__, self._key_part(args), self._key_part(kwargs))
+
+    @staticmethod
+    def _size(v: Any) -> int:
+        """Estimated bytes held by `v`, recursing into dicts, lists, tuples and dataclasses."""
+        if isinstance(v, (pd.DataFrame, pd.Series, pd.Index)):
+            mem = v.memory_usage(deep=True)
+            return int(mem.sum() if hasattr(mem, "sum") else mem)
+        if isinstance(v, np.ndarray):
+            return v.nbytes
+        if isinstance(v, (bytes, str)):
+            return len(v)
+        if isinstance(v, dict):
+            return sys.getsizeof(v) + sum(Memo._size(x) for x in v.values())
+        if isinstance(v, (list, tuple)):
+            return sys.getsizeof(v) + sum(Memo._size(x) for x in v)
+        if dataclasses.is_dataclass(v) and not isinstance(v, type):
+            return sys.getsizeof(v) + sum(Memo._size(getattr(v, f.name)) for f in dataclasses.fields(v))
+        return sys.getsizeof(v)
+
+    def get_or_compute(self, fn: Callable, args: tuple, kwargs: dict):
+        try:
+            key = self.key(fn, args, kwargs)
+        except _Unkeyable:
+            return fn(*args, **kwargs)
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+        value = fn(*args, **kwargs)
+        frame = value.df if isinstance(value, OrdersDataset) else value
+        if isinstance(frame, pd.DataFrame):
+            # same call on the same inputs -> same frame: key its consumers without hashing it
+            # (a frame passed through unchanged keeps the fingerprint it already has)
+            with self._lock:
+                if self._lookup(self._fps, frame) is None:
+                    self._remember(self._fps, frame, hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest())
+        size = self._size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = (value, size)
+                self.nbytes += size
+            while self.nbytes > self.max_bytes and self._data:
+                _, (_, s) = self._data.popitem(last=False)
+                self.nbytes -= s
+                self.evictions += 1
+        return value
+
+    def wrap(self, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            return self.get_or_compute(fn, args, kwargs)
+        inner.uncached = fn
+        return inner
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._data), "mb": self.nbytes / 1e6, "budget_mb": self.max_bytes / 1e6,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0}
+
+MEMO = Memo(int(float(os.getenv("MEMO_MAX_MB", "256")) * 1e6))
+
+def memoized(fn: Callable, memo: Optional[Memo] = None) -> Callable:
+    """`fn` served from `memo` (the shared MEMO by default); its results are shared, so read-only."""
+    return (memo or MEMO).wrap(fn)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import functools
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator, List, Optional
+import pandas as pd
+
+# tracemalloc slows allocation-heavy code, so per-span peak memory is opt-in
+TRACE_MEMORY = os.getenv("PERF_TRACE_MEMORY", "0") == "1"
+
+@dataclass
+class Span:
+    name: str
+    depth: int
+    start: float
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    peak_mb_delta: Optional[float] = None
+
+class Tracer:
+    """Wall time (and, with `trace_memory`, peak traced allocation) of named sections of one rerun.
+
+    `section(name)` starts the next top-level section and closes the previous one; `span`
+    and `@timed` calls made meanwhile nest under it. Memory comes from tracemalloc: a span's
+    `peak_mb_delta` is its allocation high-water mark above what was allocated when it opened.
+    """
+
+    def __init__(self, trace_memory: bool = TRACE_MEMORY):
+        self.spans: List[Span] = []
+        self._stack: List[list] = []
+        self._section: Optional[list] = None
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.t0 = time.perf_counter()
+
+    def _fold_peak(self) -> int:
+        """Global peak since the last reset, credited to the innermost open span; returns current size."""
+        cur, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1][3] = max(self._stack[-1][3], peak)
+        return cur
+
+    def _open(self, name: str, rows: Optional[int]) -> list:
+        s = Span(name, len(self._stack), time.perf_counter() - self.t0, rows=rows)
+        self.spans.append(s)
+        entry = [s, time.perf_counter(), 0, 0]  # span, start time, base and peak traced bytes
+        if self.trace_memory and tracemalloc.is_tracing():
+            entry[2] = entry[3] = self._fold_peak()
+            tracemalloc.reset_peak()
+        self._stack.append(entry)
+        return entry
+
+    def _close(self, entry: list) -> None:
+        s = entry[0]
+        s.seconds = time.perf_counter() - entry[1]
+        for i, e in enumerate(self._stack):
+            if e is entry:
+                if self.trace_memory and tracemalloc.is_tracing():
+                    self._fold_peak()
+                    for inner in reversed(self._stack[i + 1:]):  # unclosed children count towards it
+                        entry[3] = max(entry[3], inner[3])
+                    s.peak_mb_delta = (entry[3] - entry[2]) / 1e6
+                    if i:
+                        self._stack[i - 1][3] = max(self._stack[i - 1][3], entry[3])
+                del self._stack[i:]
+                break
+
+    def add(self, name: str, seconds: float, rows: Optional[int] = None) -> Span:
+        """Record an already-measured duration (e.g. time to first token) under the open span."""
+        s = Span(name, len(self._stack), time.perf_counter() - self.t0 - seconds, seconds, rows)
+        self.spans.append(s)
+        return s
+
+    def section(self, name: str, rows: Optional[int] = None) -> None:
+        if self._section is not None:
+            self._close(self._section)
+        self._section = self._open(name, rows)
+
+    def finish(self) -> "Tracer":
+        if self._section is not None:
+            self._close(self._section)
+            self._section = None
+        return self
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(s.seconds for s in self.spans if s.depth == 0)
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame([asdict(s) for s in self.spans],
+                          columns=["name", "depth", "start", "seconds", "rows", "peak_mb_delta"])
+        df["ms"] = (df["seconds"] * 1e3).round(1)
+        return df
+
+    def to_records(self) -> list:
+        return [asdict(s) for s in self.spans]
+
+_tracer: ContextVar[Optional[Tracer]] = ContextVar("perf_tracer", default=None)
+
+def start_trace() -> Tracer:
+    """New tracer for the current thread/context (one per Streamlit rerun)."""
+    tr = Tracer()
+    _tracer.set(tr)
+    return tr
+
+def current() -> Optional[Tracer]:
+    return _tracer.get()
+
+def section(name: str, rows: Optional[int] = None) -> None:
+    tr = _tracer.get()
+    if tr is not None:
+        tr.section(name, rows)
+
+@contextmanager
+def span(name: str, rows: Optional[int] = None) -> Iterator[Optional[Span]]:
+    """Time a block under the current section; a no-op when no trace is active."""
+    tr = _tracer.get()
+    if tr is None:
+        yield None
+        return
+    entry = tr._open(name, rows)
+    try:
+        yield entry[0]
+    finally:
+        tr._close(entry)
+
+def timed(name: Optional[str] = None):
+    """Decorator: run the function inside `span`, recording the length of a sized result as rows."""
+    def wrap(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _tracer.get() is None:
+                return fn(*args, **kwargs)
+            with span(label) as s:
+                out = fn(*args, **kwargs)
+                if isinstance(out, (pd.DataFrame, pd.Series, list)):
+                    s.rows = len(out)
+                return out
+        return inner
+    return wrap
+
+def measure_stream(chunks: Iterable[str], label: str = "stream", out: Optional[dict] = None) -> Iterator[str]:
+    """Pass chunks through, recording time to first chunk and total time (as spans and into `out`)."""
+    tr, t0, first, n = _tracer.get(), time.perf_counter(), None, 0
+    for c in chunks:
+        if first is None:
+            first = time.perf_counter() - t0
+            if tr is not None:
+                tr.add(f"{label}.first_token", first)
+        n += 1
+        yield c
+    total = time.perf_counter() - t0
+    if tr is not None:
+        tr.add(f"{label}.total", total, rows=n)
+    if out is not None:
+        out.update(ttft_s=first, total_s=total, chunks=n)
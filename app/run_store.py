@@ -0,0 +1,312 @@
+from __future__ import annotations
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+import pandas as pd
+
+ROOT = Path(os.getenv("RUN_STORE_DIR", Path(__file__).resolve().parent.parent / "artifacts" / "runs"))
+INDEX = "index.jsonl"          # single index written by older versions; read until retention drops it
+INDEX_DAY = "index-%Y%m%d.jsonl"  # one index file per UTC day of run time
+SEGMENT_MB = float(os.getenv("RUN_SEGMENT_MB", "16"))
+SEGMENT_MAX_AGE_S = 24 * 3600
+RETENTION_DAYS = float(os.getenv("RUN_RETENTION_DAYS", "30"))
+FLUSH_TIMEOUT_S = float(os.getenv("RUN_FLUSH_TIMEOUT_S", "60"))
+STATUSES = ("VERIFIED", "APPROX", "MISMATCH", "ERROR")
+log = logging.getLogger(__name__)
+
+def _status_counts(checked: Sequence[dict]) -> dict:
+    counts = {s.lower(): 0 for s in STATUSES}
+    for row in checked:
+        st = str(row.get("status") or "")
+        for s in STATUSES:
+            if s in st:
+                counts[s.lower()] += 1
+    status = "error" if counts["error"] else "mismatch" if counts["mismatch"] else "ok"
+    return {"status": status, "total": len(checked), **counts}
+
+def index_row(rec: dict) -> dict:
+    """What the index keeps about a run: enough to filter and summarize without opening segments."""
+    settings = rec.get("settings") or {}
+    cache = settings.get("llm_cache") or {}
+    return {"run_id": rec["run_id"], "ts": rec["ts"], "model": settings.get("model"),
+            **_status_counts(rec.get("checked") or []),
+            "llm_cache_hits": cache.get("hits", 0), "llm_cache_misses": cache.get("misses", 0)}
+
+def _utc(t) -> pd.Timestamp:
+    t = pd.Timestamp(t)
+    return t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC")
+
+def _index_name(ts: float) -> str:
+    return time.strftime(INDEX_DAY, time.gmtime(float(ts)))
+
+def _legacy_record(d: Path) -> dict:
+    def load(name, default=None):
+        fp = d / name
+        return json.loads(fp.read_text()) if fp.exists() else default
+    checked = d / "checked.csv"
+    return {"run_id": d.name, "ts": (d / "meta.json").stat().st_mtime,
+            "settings": load("meta.json", {}), "payload": load("payload.json", {}),
+            "insights": load("insights_raw.json", []), "timings": load("timings.json"),
+            "checked": (pd.read_csv(checked).to_dict("records")
+                        if checked.exists() and checked.stat().st_size else [])}
+
+def read_member(path: Path, offset: int) -> List[dict]:
+    """Records of the single gzip member (one write batch) starting at `offset`."""
+    d = zlib.decompressobj(wbits=31)
+    out = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while not d.eof:
+            buf = f.read(1 << 16)
+            if not buf:
+                break  # truncated tail of a segment that is still being written
+            out.append(d.decompress(buf))
+    return [json.loads(line) for line in b"".join(out).splitlines() if line.strip()]
+
+class RunStore:
+    """Append-only store of logged dashboard runs.
+
+    `put` only enqueues; a background thread writes records in batches, each batch as one
+    gzip member appended to the current JSONL segment (`runs-<time>-<pid>-<n>.jsonl.gz`).
+    Segments rotate by size and age, and segments older than the retention window are
+    deleted whole. `index-<YYYYMMDD>.jsonl` gets one small row per run (time, model, status
+    counts, segment and member offset) in the file of the run's UTC day, so queries open only
+    the days of their time range, filter those rows and then decompress only the batches
+    holding the selected runs. Index files are only ever appended to (other processes may be
+    appending too) and are deleted by retention with the segments of their day; rows of
+    segments deleted before their day are dropped when read.
+    """
+
+    def __init__(self, root: Path = ROOT, segment_bytes: int = int(SEGMENT_MB * 1e6),
+                 retention_days: float = RETENTION_DAYS, flush_s: float = 1.0, batch: int = 64):
+        self.root = Path(root)
+        self.segment_bytes = int(segment_bytes)
+        self.retention_s = retention_days * 86400
+        self.flush_s = flush_s
+        self.batch = batch
+        self._q: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._segment: Optional[Path] = None
+        self._opened = 0.0
+        self._seq = 0
+        self.stats = {"runs": 0, "batches": 0, "segments_dropped": 0, "write_errors": 0}
+
+    # -- writing ---------------------------------------------------------------------------
+    def put(self, record: dict) -> None:
+        """Queue a run record (needs `run_id`; `ts` defaults to now). Returns immediately."""
+        record.setdefault("ts", time.time())
+        self._ensure_writer()
+        self._q.put(record)
+
+    def flush(self, timeout: Optional[float] = FLUSH_TIMEOUT_S) -> bool:
+        """Wait until everything queued so far is written; False on timeout or if a batch failed meanwhile."""
+        if self._thread is None:
+            return True
+        errors = self.stats["write_errors"]
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout) and self.stats["write_errors"] == errors
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="run-store", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self.apply_retention()
+        except OSError:
+            log.exception("run store retention failed")
+        pending: list = []
+        while True:
+            try:
+                item = self._q.get(timeout=self.flush_s if pending else None)
+            except queue.Empty:
+                item = ()
+            if isinstance(item, dict):
+                pending.append(item)
+                if len(pending) < self.batch:
+                    continue
+            if pending:
+                try:
+                    self._write(pending)
+                except Exception:  # keep the writer alive; the batch is lost but flush() reports it
+                    self.stats["write_errors"] += 1
+                    log.exception("run store dropped a batch of %d runs", len(pending))
+                pending = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _current_segment(self) -> Path:
+        now = time.time()
+        seg = self._segment
+        if (seg is None or not seg.exists() or seg.stat().st_size >= self.segment_bytes
+                or now - self._opened >= SEGMENT_MAX_AGE_S):
+            if seg is not None:
+                self.apply_retention(now)
+            self._seq += 1
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+            self._segment, self._opened = self.root / f"runs-{stamp}-{os.getpid()}-{self._seq}.jsonl.gz", now
+        return self._segment
+
+    def _write(self, records: List[dict]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        seg = self._current_segment()
+        blob = b"".join(json.dumps(r, default=str, ensure_ascii=False).encode("utf-8") + b"\n" for r in records)
+        with open(seg, "ab") as f:
+            offset = f.tell()
+            f.write(gzip.compress(blob, compresslevel=6, mtime=0))
+        # index rows only after their batch is written, so the index never points at missing data
+        days: dict = {}
+        for r in records:
+            days.setdefault(_index_name(r["ts"]), []).append(dict(index_row(r), segment=seg.name, offset=offset))
+        for name, rows in days.items():
+            with open(self.root / name, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, default=str) + "\n" for r in rows))
+        self.stats["runs"] += len(records)
+        self.stats["batches"] += 1
+
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        """Delete segments whose newest run, and index days that end, before the retention window.
+
+        Returns how many segments went. Index files are deleted whole, never rewritten (that
+        would race with appends from other processes); rows of a kept day that point at a
+        deleted segment are skipped on read.
+        """
+        if not self.root.exists():
+            return 0
+        cutoff = (now or time.time()) - self.retention_s
+        old = [p for p in self.root.glob("runs-*.jsonl.gz")
+               if p != self._segment and p.stat().st_mtime < cutoff]
+        for p in old:
+            p.unlink(missing_ok=True)
+        first_day = _index_name(cutoff)
+        for p in self.root.glob("index-*.jsonl"):
+            if p.name < first_day:
+                p.unlink(missing_ok=True)
+        legacy = self.root / INDEX
+        if legacy.exists() and legacy.stat().st_mtime < cutoff:
+            legacy.unlink(missing_ok=True)
+        self.stats["segments_dropped"] += len(old)
+        return len(old)
+
+    # -- querying --------------------------------------------------------------------------
+    def index_files(self, start=None, end=None) -> List[Path]:
+        """Index files that can hold runs in [start, end], by their day, without opening any."""
+        lo = _index_name(_utc(start).timestamp()) if start is not None else ""
+        hi = _index_name(_utc(end).timestamp()) if end is not None else "~"
+        files = sorted(p for p in self.root.glob("index-*.jsonl") if lo <= p.name <= hi)
+        legacy = self.root / INDEX
+        return [legacy] + files if legacy.exists() else files
+
+    def _index_rows(self, start=None, end=None) -> List[dict]:
+        lines = []
+        for p in self.index_files(start, end):
+            try:
+                lines += p.read_text(encoding="utf-8").splitlines()
+            except FileNotFoundError:
+                continue  # dropped by retention meanwhile
+        live = {s.name for s in self.root.glob("runs-*.jsonl.gz")}  # after the read: new rows' segments exist
+        rows = []
+        for line in lines:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if row.get("segment") in live:  # else dropped by retention
+                rows.append(row)
+        return rows
+
+    def index(self, start=None, end=None, model: Optional[str] = None,
+              status: Optional[str | Iterable[str]] = None) -> pd.DataFrame:
+        """Index rows (one per run, with a UTC `time` column) filtered by time range, model and status."""
+        df = pd.DataFrame(self._index_rows(start, end))
+        if df.empty:
+            return df
+        df["time"] = pd.to_datetime(df["ts"], unit="s", utc=True)
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df["time"] >= _utc(start)
+        if end is not None:
+            mask &= df["time"] <= _utc(end)
+        if model is not None:
+            mask &= df["model"] == model
+        if status is not None:
+            mask &= df["status"].isin([status] if isinstance(status, str) else list(status))
+        return df[mask].sort_values("ts", kind="stable").reset_index(drop=True)
+
+    def read(self, rows: Optional[pd.DataFrame] = None, **query) -> Iterator[dict]:
+        """Full records for the given index rows (or for `index(**query)`), in time order."""
+        rows = self.index(**query) if rows is None else rows
+        if rows.empty:
+            return
+        wanted = set(rows["run_id"])
+        for (seg, off), _ in rows.groupby(["segment", "offset"], sort=False):
+            path = self.root / seg
+            if not path.exists():
+                continue  # dropped by retention meanwhile
+            for rec in read_member(path, int(off)):
+                if rec.get("run_id") in wanted:
+                    yield rec
+
+    def get(self, run_id: str) -> Optional[dict]:
+        rows = self.index()
+        rows = rows[rows["run_id"] == run_id] if not rows.empty else rows
+        return next(self.read(rows), None)
+
+    def import_legacy(self, remove: bool = False) -> int:
+        """Move old per-run directories (meta.json, payload.json, ...) into the store."""
+        n = 0
+        if not self.root.exists():
+            return 0
+        for d in sorted(p for p in self.root.iterdir() if p.is_dir() and (p / "meta.json").exists()):
+            rec = _legacy_record(d)
+            self.put(rec)
+            n += 1
+            if remove:
+                if not self.flush():
+                    raise RuntimeError(f"run {d.name} was not written to the store; kept {d}")
+                shutil.rmtree(d)
+        if not self.flush():
+            raise RuntimeError(f"not all {n} imported runs were written to the store")
+        return n
+
+RUN_STORE = RunStore()
+atexit.register(RUN_STORE.close)
+
+def main():
+    ap = argparse.ArgumentParser(description="Maintain the run store (artifacts/runs)")
+    ap.add_argument("--import-legacy", action="store_true", help="import per-run directories from older versions")
+    ap.add_argument("--remove", action="store_true", help="with --import-legacy: delete directories once imported")
+    ap.add_argument("--retention", action="store_true", help="drop segments past RUN_RETENTION_DAYS now")
+    args = ap.parse_args()
+    if args.import_legacy:
+        print(f"Imported {RUN_STORE.import_legacy(remove=args.remove)} runs into {RUN_STORE.root}")
+    if args.retention:
+        print(f"Dropped {RUN_STORE.apply_retention()} segments")
+    idx = RUN_STORE.index()
+    print(f"{len(idx)} runs indexed in {RUN_STORE.root}")
+    RUN_STORE.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Optional
+import numpy as np
+import pandas as pd
+from app.data_loader import SYNTH, _merge_summary, _summary, _write_manifest, write_partitioned
+
+PRICES = np.array([4.99, 9.99, 14.99, 19.99, 24.99, 29.99, 49.99, 79.99, 149.99, 199.99, 499.99])
+
+@dataclass(frozen=True)
+class SynthConfig:
+    """Shape of a synthetic orders dataset for scale testing.
+
+    Rows are produced in fixed-size chunks, each from its own RNG stream seeded with
+    (seed, chunk index), so the output depends only on the config, never on the number
+    of worker processes.
+    """
+    rows: int = 1_000_000
+    start: str = "2022-01-01"
+    days: int = 730
+    n_skus: int = 500
+    n_categories: int = 12
+    n_stores: int = 8
+    mean_lines: float = 2.0      # average order lines per order (>= 1)
+    trend: float = 0.3           # relative growth in volume from first to last day
+    seasonality: float = 0.25    # amplitude of the yearly cycle (peak in Q4)
+    weekend: float = 1.2         # weekend volume relative to weekdays
+    seed: int = 7
+    chunk_rows: int = 1_000_000
+
+    @property
+    def n_chunks(self) -> int:
+        return max(1, -(-self.rows // self.chunk_rows))
+
+def _zipf_weights(n: int, a: float = 1.1) -> np.ndarray:
+    w = 1.0 / np.arange(1, n + 1) ** a
+    return w / w.sum()
+
+def _catalog(cfg: SynthConfig) -> dict:
+    """SKU, store and calendar tables shared by every chunk (derived from the seed alone)."""
+    rng = np.random.default_rng([cfg.seed, 0xC0FFEE])
+    skus = np.char.add("SKU", np.char.zfill(np.arange(cfg.n_skus).astype(str), 6))
+    cats = np.char.add("Category ", np.char.zfill(np.arange(cfg.n_categories).astype(str), 2))
+    stores = np.char.add("Store ", np.char.zfill(np.arange(cfg.n_stores).astype(str), 3))
+    days = pd.Timestamp(cfg.start) + pd.to_timedelta(np.arange(cfg.days), unit="D")
+    doy = days.dayofyear.to_numpy()
+    w = (1 + cfg.trend * np.arange(cfg.days) / max(cfg.days - 1, 1))
+    w = w * (1 + cfg.seasonality * np.cos(2 * np.pi * (doy - 335) / 365.25))
+    w = w * np.where(days.dayofweek.to_numpy() >= 5, cfg.weekend, 1.0)
+    return {
+        "sku": pd.Categorical(skus),
+        "sku_category": rng.integers(0, cfg.n_categories, size=cfg.n_skus),
+        "sku_price": rng.choice(PRICES, size=cfg.n_skus),
+        "sku_p": rng.permutation(_zipf_weights(cfg.n_skus)),
+        "category": pd.Categorical(cats),
+        "store": pd.Categorical(stores),
+        "store_p": _zipf_weights(cfg.n_stores, 0.6),
+        "days": days.to_numpy(),
+        "day_p": w / w.sum(),
+    }
+
+def generate_chunk(cfg: SynthConfig, chunk: int) -> pd.DataFrame:
+    """Rows [chunk * chunk_rows, ...) of the dataset; lines of one order share date and store."""
+    cat = _catalog(cfg)
+    rng = np.random.default_rng([cfg.seed, chunk])
+    n = min(cfg.chunk_rows, cfg.rows - chunk * cfg.chunk_rows)
+    # order sizes until the chunk is full; the last order is truncated at the chunk edge
+    sizes = 1 + rng.poisson(max(cfg.mean_lines - 1, 0), size=n)
+    n_orders = int(np.searchsorted(np.cumsum(sizes), n) + 1)
+    sizes = sizes[:n_orders]
+    sizes[-1] -= sizes.sum() - n
+    order = np.repeat(np.arange(n_orders), sizes)
+
+    day = rng.choice(len(cat["days"]), size=n_orders, p=cat["day_p"])[order]
+    store = rng.choice(len(cat["store_p"]), size=n_orders, p=cat["store_p"])[order]
+    sku = rng.choice(cfg.n_skus, size=n, p=cat["sku_p"])
+    quantity = rng.geometric(0.6, size=n).astype(np.int64)
+    unit_price = cat["sku_price"][sku]
+    first = chunk * cfg.chunk_rows          # lines >= orders, so these ids never collide across chunks
+    order_id = np.char.add("O", (first + order).astype(str))
+    df = pd.DataFrame({
+        "order_id": order_id.astype(object),
+        "order_date": cat["days"][day],
+        "product": pd.Categorical.from_codes(sku, dtype=cat["sku"].dtype),
+        "category": pd.Categorical.from_codes(cat["sku_category"][sku], dtype=cat["category"].dtype),
+        "store": pd.Categorical.from_codes(store, dtype=cat["store"].dtype),
+        "quantity": quantity,
+        "unit_price": unit_price,
+    })
+    df["revenue"] = df["quantity"] * df["unit_price"]
+    return df
+
+def _write_chunk(args) -> dict:
+    cfg, chunk, root = args
+    df = generate_chunk(cfg, chunk)
+    write_partitioned(df, root, basename_template=f"synth-{chunk:05d}-{{i}}.parquet",
+                      existing_data_behavior="overwrite_or_ignore")
+    return _summary(df)
+
+def generate_dataset(cfg: SynthConfig, root: Path = SYNTH, workers: Optional[int] = None,
+                     force: bool = False) -> dict:
+    """Write the whole dataset as partitioned Parquet, chunks spread over processes.
+
+    A non-empty `root` is only replaced with `force`, so a scale test can't wipe real data.
+    """
+    root = Path(root)
+    if root.exists() and any(root.iterdir()):
+        if not force:
+            raise FileExistsError(f"{root} is not empty; pass --force to replace it.")
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+    jobs = [(cfg, i, root) for i in range(cfg.n_chunks)]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    summary: dict = {}
+    if workers == 1:
+        for s in map(_write_chunk, jobs):
+            summary = _merge_summary(summary, s)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            for s in ex.map(_write_chunk, jobs):
+                summary = _merge_summary(summary, s)
+    return _write_manifest(root, summary)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a large synthetic orders dataset (partitioned Parquet).")
+    ap.add_argument("--rows", type=int, default=SynthConfig.rows)
+    ap.add_argument("--start", default=SynthConfig.start)
+    ap.add_argument("--days", type=int, default=SynthConfig.days)
+    ap.add_argument("--skus", type=int, default=SynthConfig.n_skus)
+    ap.add_argument("--categories", type=int, default=SynthConfig.n_categories)
+    ap.add_argument("--stores", type=int, default=SynthConfig.n_stores)
+    ap.add_argument("--mean-lines", type=float, default=SynthConfig.mean_lines)
+    ap.add_argument("--trend", type=float, default=SynthConfig.trend)
+    ap.add_argument("--seasonality", type=float, default=SynthConfig.seasonality)
+    ap.add_argument("--seed", type=int, default=SynthConfig.seed)
+    ap.add_argument("--chunk-rows", type=int, default=SynthConfig.chunk_rows)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--out", type=Path, default=SYNTH)
+    ap.add_argument("--force", action="store_true", help="replace a non-empty --out directory")
+    a = ap.parse_args(argv)
+    cfg = replace(SynthConfig(), rows=a.rows, start=a.start, days=a.days, n_skus=a.skus,
+                  n_categories=a.categories, n_stores=a.stores, mean_lines=a.mean_lines, trend=a.trend,
+                  seasonality=a.seasonality, seed=a.seed, chunk_rows=a.chunk_rows)
+    t0 = time.perf_counter()
+    try:
+        m = generate_dataset(cfg, a.out, a.workers, force=a.force)
+    except FileExistsError as e:
+        raise SystemExit(str(e))
+    secs = time.perf_counter() - t0
+    print(f"✔ {m['rows']:,} rows in {cfg.n_chunks} chunk(s) written to {a.out} in {secs:.1f}s "
+          f"({m['rows'] / max(secs, 1e-9):,.0f} rows/s). Point the dashboard at it with ORDERS_DIR={a.out}.")
+
+if __name__ == "__main__":
+    main()
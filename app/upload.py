@@ -1,7 +1,17 @@
 from __future__ import annotations
+import time, os, json, hashlib, warnings
+from pathlib import Path
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from pandas.tseries.api import guess_datetime_format
+from app.cube import build_cube
+from app.dataset import OrdersDataset
+from app.compact import compact_orders, memory_report
+from app.disk_cache import DiskCache
+from app.memo import MEMO
 
 REQUIRED = ["order_id","order_date","product","quantity","unit_price"]
 OPTIONAL = ["store","category"]
@@ -19,26 +29,105 @@ def _guess(cols,target):
     for a in ALIASES.get(target,[]):
         if a in low: return cols[low.index(a)]
     return None
-def _clean(df: pd.DataFrame) -> pd.DataFrame:
-    df=df.copy()
-    df["order_date"]=pd.to_datetime(df["order_date"],errors="coerce",infer_datetime_format=True)
+CLEAN_COLS=["order_id","order_date","product","category","store","quantity","unit_price","revenue"]
+CHUNK_BYTES=16<<20
+_DICT=pa.dictionary(pa.int32(),pa.string())
+CHUNK_SCHEMA=pa.schema([("order_id",_DICT),("order_date",pa.timestamp("ns")),("product",_DICT),("category",_DICT),
+                        ("store",_DICT),("quantity",pa.float64()),("unit_price",pa.float64()),("revenue",pa.float64())])
+def _date_format(dates: pd.Series):
+    """strptime format guessed from the first string date it can be guessed from, or None."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore",UserWarning)  # day-first guesses warn without dayfirst=True
+        for v in dates.dropna():
+            fmt=guess_datetime_format(v) if isinstance(v,str) else None
+            if fmt: return fmt
+    return None
+def _coerce(df: pd.DataFrame, date_format=None) -> pd.DataFrame:
+    """Type coercion, row filtering and revenue derivation; safe to run chunk by chunk
+    when every chunk gets the same `date_format`."""
+    df["order_date"]=pd.to_datetime(df["order_date"],format=date_format,errors="coerce")
     df["quantity"]=pd.to_numeric(df["quantity"],errors="coerce")
     df["unit_price"]=pd.to_numeric(df["unit_price"],errors="coerce")
     df=df.dropna(subset=["order_id","order_date","product","quantity","unit_price"])
-    df=df[(df["quantity"]>0)&(df["unit_price"]>0)]
+    df=df[(df["quantity"]>0)&(df["unit_price"]>0)].copy()
     if "store" not in df.columns: df["store"]="All"
     if "category" not in df.columns:
         df["category"]=df["product"].astype(str).str.split().str[0].fillna("General")
     df["revenue"]=df["quantity"]*df["unit_price"]
-    cols=["order_id","order_date","product","category","store","quantity","unit_price","revenue"]
-    return df[cols].sort_values("order_date").reset_index(drop=True)
+    return df[CLEAN_COLS]
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    return _coerce(df.copy()).sort_values("order_date").reset_index(drop=True)
+def stream_clean_csv(source, mapping: dict, block_size: int = CHUNK_BYTES, progress=None):
+    """Clean a CSV block by block with pyarrow's streaming reader.
+
+    `mapping` is {target column: source column}. Each block is mapped, coerced and filtered
+    on its own and kept dictionary-encoded, so the raw CSV is never held whole: peak memory is
+    set by the cleaned upload itself, about the Arrow blocks plus the final sorted frame (which
+    the dashboard holds anyway), and the blocks are released while that frame is built. The
+    date format is guessed once, from the first date it can be guessed from, and then fixed
+    for the rest of the upload, so ambiguous dates (03/04) parse the same way in every block. `progress(rows, seconds, nbytes)` is
+    called after every block, where `nbytes` approximates the CSV bytes consumed so far.
+    Returns the cleaned frame and the per-column bytes it would take as plain pandas columns.
+    """
+    src_cols=list(dict.fromkeys(mapping.values()))
+    reader=pacsv.open_csv(source,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(include_columns=src_cols,column_types={c:pa.string() for c in src_cols}))
+    tables,raw_bytes,rows,nbytes,t0=[],pd.Series(0,index=CLEAN_COLS,dtype="int64"),0,0,time.perf_counter()
+    fmt=None
+    for batch in reader:
+        block=batch.to_pandas()
+        chunk=pd.DataFrame({tgt:block[src] for tgt,src in mapping.items()})
+        if fmt is None: fmt=_date_format(chunk["order_date"])
+        chunk=_coerce(chunk,fmt)
+        raw_bytes+=chunk.memory_usage(deep=True,index=False).reindex(CLEAN_COLS,fill_value=0)
+        chunk=chunk.astype({"quantity":"float64","unit_price":"float64","revenue":"float64"})
+        chunk["order_date"]=chunk["order_date"].astype("datetime64[ns]")
+        tables.append(pa.Table.from_pandas(chunk,schema=CHUNK_SCHEMA,preserve_index=False))
+        rows+=batch.num_rows
+        nbytes+=batch.nbytes
+        if progress: progress(rows,time.perf_counter()-t0,nbytes)
+    table=pa.concat_tables(tables).unify_dictionaries() if tables else CHUNK_SCHEMA.empty_table()
+    tables=None
+    table=table.sort_by("order_date")  # stable; frees the unsorted blocks once it is replaced
+    df=table.to_pandas(split_blocks=True,self_destruct=True)
+    del table
+    if "quantity" in df and np.array_equal(df["quantity"],np.round(df["quantity"])):
+        df["quantity"]=df["quantity"].astype("int64")
+    return df,raw_bytes
+CLEAN_VERSION=1
+CACHE_DIR=Path(os.getenv("UPLOAD_CACHE_DIR", Path(__file__).resolve().parent.parent/"data"/"cache"/"uploads"))
+UPLOAD_CACHE=DiskCache(CACHE_DIR, int(float(os.getenv("UPLOAD_CACHE_MAX_MB","1024"))*1e6), suffix=".parquet")
+def upload_key(f, mapping: dict) -> str:
+    """Content hash of the uploaded bytes plus the column mapping (and cleaning version)."""
+    h=hashlib.blake2b(digest_size=20)
+    f.seek(0)
+    for block in iter(lambda: f.read(1<<20), b""): h.update(block)
+    f.seek(0)
+    h.update(json.dumps({"mapping":mapping,"v":CLEAN_VERSION},sort_keys=True).encode())
+    return h.hexdigest()
+def load_cached_upload(key: str):
+    p=UPLOAD_CACHE.get(key)
+    return pd.read_parquet(p) if p is not None else None
+def store_cached_upload(key: str, df: pd.DataFrame) -> None:
+    UPLOAD_CACHE.put(key, lambda tmp: df.to_parquet(tmp, index=False, compression="zstd"))
+def _csv_columns(f) -> list:
+    cols=pacsv.open_csv(f,read_options=pacsv.ReadOptions(block_size=1<<20)).schema.names
+    f.seek(0)
+    return cols
 def upload_data_widget(key="uploader"):
     with st.sidebar.expander("Upload data (CSV or Excel)", expanded=False):
         f=st.file_uploader("Choose a CSV/XLSX", type=["csv","xlsx","xls"], key=key)
         if not f: return st.session_state.get("uploaded_df")
-        raw = pd.read_csv(f) if f.name.lower().endswith(".csv") else pd.read_excel(f)
-        st.caption(f"Loaded shape: {raw.shape[0]:,} × {raw.shape[1]}")
-        cols=list(raw.columns)
+        is_csv=f.name.lower().endswith(".csv")
+        if is_csv:
+            raw=None
+            cols=_csv_columns(f)
+            st.caption(f"File: {f.size/1e6:,.1f} MB × {len(cols)} columns (streamed on load)")
+        else:
+            raw=pd.read_excel(f)
+            cols=list(raw.columns)
+            st.caption(f"Loaded shape: {raw.shape[0]:,} × {raw.shape[1]}")
         st.write("Map your columns:")
         sel={}
         for tgt in REQUIRED+OPTIONAL:
@@ -48,13 +137,31 @@ def upload_data_widget(key="uploader"):
             missing=[t for t in REQUIRED if sel.get(t) in [None,"(none)"]]
             if missing: st.error("Missing: "+", ".join(missing))
             else:
-                out={}
-                for tgt in REQUIRED+OPTIONAL:
-                    s=sel.get(tgt)
-                    if s and s!="(none)": out[tgt]=raw[s]
-                df=pd.DataFrame(out)
-                df=_clean(df)
+                mapping={tgt:s for tgt,s in sel.items() if s and s!="(none)"}
+                key=upload_key(f,mapping)
+                df=load_cached_upload(key)
+                if df is not None:
+                    before=None
+                    st.caption("Loaded from upload cache")
+                elif is_csv:
+                    bar,note=st.progress(0.0),st.empty()
+                    def progress(rows,secs,nbytes):
+                        bar.progress(min(nbytes/max(f.size,1),1.0))
+                        note.caption(f"{rows:,} rows read · {rows/max(secs,1e-9):,.0f} rows/s")
+                    f.seek(0)
+                    cleaned,before=stream_clean_csv(f,mapping,progress=progress)
+                else:
+                    cleaned=_clean(pd.DataFrame({tgt:raw[s] for tgt,s in mapping.items()}))
+                    before=cleaned
+                if before is not None:
+                    df=compact_orders(cleaned)
+                    store_cached_upload(key,df)
                 st.session_state["uploaded_df"]=df
+                st.session_state["uploaded_mem"]=memory_report(before, df) if before is not None else None
+                st.session_state["uploaded_cube"]=build_cube(df)
+                st.session_state["uploaded_ds"]=ds=OrdersDataset(df)
+                MEMO.tag(ds,f"upload:{key}")
+                st.session_state.pop("uploaded_qcache",None)
                 st.success(f"Data ready: {len(df):,} rows")
         prev=st.session_state.get("uploaded_df")
         if prev is not None: st.dataframe(prev.head(10), use_container_width=True, height=200)
@@ -0,0 +1,202 @@
+"""Time and peak-memory benchmarks for the analytics, KPI and fact-checking hot paths.
+
+    python -m benchmarks.run --sizes 10k,1m,10m                 # writes artifacts/benchmarks.json
+    python -m benchmarks.run --sizes 10k,1m --save-baseline     # store benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10k,1m --threshold 1.25    # exit 1 on a >25% slowdown vs baseline
+"""
+from __future__ import annotations
+import argparse
+import functools
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import pandas as pd
+from types import SimpleNamespace
+from app.anomalies import detect_anomalies, segment_daily
+from app.analytics import (
+    apply_filters, mix_table, previous_period, price_volume_bridge, pvm_bridge, quarterly_report, segment_agg
+)
+from app.compact import compact_orders
+from app.cube import build_cube
+from app.data_loader import generate_sample
+from app.explainer import _drivers
+from app.fact_checker import check_insights
+from app.kpis import FilterCtx, aov, orders, revenue
+from app.upload import _clean
+
+BASE = Path(__file__).resolve().parent.parent
+OUT = BASE / "artifacts" / "benchmarks.json"
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+MIN_SECONDS = 0.005  # timings below this are noise; never flagged as regressions
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s.rstrip("km")) * mult)
+
+def _insights(start: pd.Timestamp, end: pd.Timestamp, kp: dict) -> list:
+    period = SimpleNamespace(start=str(start.date()), end=str(end.date()))
+    none = SimpleNamespace(vs="none", delta=0.0, delta_pct=0.0)
+    prev = SimpleNamespace(vs="previous_period", delta=0.0, delta_pct=5.0)
+    out = []
+    for store in (None, "East", "West", "Central"):
+        for metric, comp in (("revenue", none), ("orders", none), ("aov", none), ("revenue", prev)):
+            out.append(SimpleNamespace(metric=metric, period=period, filter={"store": store} if store else {},
+                                       statement=f"{metric} check", value_reported=kp[metric], comparison=comp))
+    return out
+
+class Fixtures:
+    """Inputs shared by the cases of one dataset, each built on first use (in a case's untimed
+    warm-up), so `--only` builds just what the selected cases need."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.end = df["order_date"].max().normalize()
+        self.start = self.end - pd.Timedelta(days=89)
+        self.ps, self.pe = previous_period(self.start, self.end)
+
+    @functools.cached_property
+    def cur(self) -> pd.DataFrame:
+        return apply_filters(self.df, self.start, self.end, FilterCtx())
+
+    @functools.cached_property
+    def prev(self) -> pd.DataFrame:
+        return apply_filters(self.df, self.ps, self.pe, FilterCtx())
+
+    @functools.cached_property
+    def insights(self) -> list:
+        df, start, end, f = self.df, self.start, self.end, FilterCtx()
+        kp = {"revenue": revenue(df, start, end, f), "orders": orders(df, start, end, f), "aov": aov(df, start, end, f)}
+        return _insights(start, end, kp)
+
+    @functools.cached_property
+    def raw(self) -> pd.DataFrame:
+        raw = self.df.drop(columns=["revenue"]).astype({c: object for c in ("order_id", "product", "category", "store")})
+        raw["order_date"] = raw["order_date"].dt.strftime("%Y-%m-%d")
+        return raw
+
+    @functools.cached_property
+    def cells(self) -> pd.DataFrame:
+        return segment_daily(self.df)
+
+    @functools.cached_property
+    def agg(self):
+        return segment_agg(self.cur, self.prev)
+
+    @functools.cached_property
+    def approx(self):
+        return build_cube(self.df, approx_orders=True)
+
+def cases(df: pd.DataFrame) -> Dict[str, Callable[[], object]]:
+    """Benchmarked calls over one dataset; the view is the last 90 days, as on the dashboard."""
+    fx = Fixtures(df)
+    start, end = fx.start, fx.end
+    f, east = FilterCtx(), FilterCtx(store="East")
+    return {
+        "apply_filters": lambda: apply_filters(df, start, end, east),
+        "revenue": lambda: revenue(df, start, end, east),
+        "orders": lambda: orders(df, start, end, east),
+        "build_cube.approx_orders": lambda: build_cube(df, approx_orders=True),
+        "orders.approx_cube": lambda: orders(df, start, end, east, fx.approx),
+        "aov": lambda: aov(df, start, end, east),
+        "mix_table": lambda: mix_table(fx.cur, fx.prev, by="category"),
+        "segment_agg": lambda: segment_agg(fx.cur, fx.prev),
+        "pvm_bridge": lambda: pvm_bridge(fx.agg),
+        "price_volume_bridge": lambda: price_volume_bridge(fx.cur, fx.prev),
+        "quarterly_report": lambda: quarterly_report(df, f),
+        "explainer._drivers": lambda: _drivers(fx.cur, fx.prev),
+        "check_insights": lambda: check_insights(fx.insights, df),
+        "segment_daily": lambda: segment_daily(df),
+        "detect_anomalies.robust": lambda: detect_anomalies(fx.cells, "robust", start=start, end=end),
+        "upload._clean": lambda: _clean(fx.raw),
+    }
+
+def measure(fn: Callable[[], object], repeat: int) -> dict:
+    """Median/min wall time over `repeat` runs, then one traced run for peak Python-heap memory."""
+    fn()  # warm-up (imports, lazy caches, the case's fixtures)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"median_s": statistics.median(times), "min_s": min(times), "peak_mb": peak / 1e6, "repeat": repeat}
+
+def run(sizes: List[int], repeat: int = 3, only: Optional[List[str]] = None, log=print) -> dict:
+    results: Dict[str, dict] = {}
+    for n in sizes:
+        df = compact_orders(generate_sample(n_orders=n))
+        reps = repeat if n < 5_000_000 else 1
+        for name, fn in cases(df).items():
+            if only and name not in only:
+                continue
+            r = measure(fn, reps)
+            results[f"{name}@{n}"] = dict(r, case=name, rows=n)
+            log(f"{name:>22} @ {n:>11,}  {r['median_s'] * 1e3:10.1f} ms  {r['peak_mb']:9.1f} MB")
+        del df
+        gc.collect()
+    return {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0], "pandas": pd.__version__, "machine": platform.machine(),
+            "results": results}
+
+def compare(report: dict, baseline: dict, threshold: float, mem_threshold: Optional[float] = None) -> List[str]:
+    """Regressions of `report` vs `baseline`: time ratio above `threshold` (and memory, if given)."""
+    out = []
+    for key, r in report["results"].items():
+        b = baseline.get("results", {}).get(key)
+        if b is None:
+            continue
+        if r["median_s"] > MIN_SECONDS and r["median_s"] > threshold * b["median_s"]:
+            out.append(f"{key}: {r['median_s'] * 1e3:.1f} ms vs {b['median_s'] * 1e3:.1f} ms baseline "
+                       f"(x{r['median_s'] / b['median_s']:.2f})")
+        if mem_threshold and r["peak_mb"] > 1 and r["peak_mb"] > mem_threshold * b["peak_mb"]:
+            out.append(f"{key}: peak {r['peak_mb']:.1f} MB vs {b['peak_mb']:.1f} MB baseline")
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10k,1m,10m", help="comma-separated row counts, e.g. 10k,1m,10m")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--only", default="", help="comma-separated case names")
+    ap.add_argument("--out", type=Path, default=OUT)
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=None, help="fail when median time > threshold x baseline")
+    ap.add_argument("--mem-threshold", type=float, default=None, help="fail when peak memory > x baseline")
+    a = ap.parse_args(argv)
+
+    sizes = [parse_size(s) for s in a.sizes.split(",") if s.strip()]
+    report = run(sizes, a.repeat, [s for s in a.only.split(",") if s] or None)
+    a.out.parent.mkdir(parents=True, exist_ok=True)
+    a.out.write_text(json.dumps(report, indent=2))
+    print(f"Saved {a.out}")
+    if a.save_baseline:
+        a.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Saved baseline {a.baseline}")
+        return 0
+    if a.threshold is None and a.mem_threshold is None:
+        return 0
+    if not a.baseline.exists():
+        print(f"No baseline at {a.baseline}; run with --save-baseline first.")
+        return 1
+    regressions = compare(report, json.loads(a.baseline.read_text()), a.threshold or float("inf"), a.mem_threshold)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
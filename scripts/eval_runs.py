@@ -1,28 +1,175 @@
-import pandas as pd
+import sys
 from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from app.run_store import RUN_STORE, RunStore, read_member
+
+OUT = ROOT / "artifacts"
+MANIFEST = "eval_manifest.json"
+SUMMARY = "eval_summary.csv"
+TIMINGS = "eval_timings.parquet"
+STATUS_COLS = ["verified", "approx", "mismatch", "error"]
+INDEX_COLS = ["run", "time", "model", "status", "total"] + STATUS_COLS + ["llm_cache_hits", "llm_cache_misses"]
+SUMMARY_COLS = INDEX_COLS + ["rerun_ms", "ttft_ms", "verified_pct"]
+LATE_S = 3600  # how long after its timestamp a run may still reach the index (queued, other processes)
+
+def load_manifest(out: Path) -> dict:
+    """{"members": {segment: [offsets]}, "high_water": ts}: the segment batches already summarized
+    and the newest run time among them."""
+    p = out / MANIFEST
+    return json.loads(p.read_text()) if p.exists() else {"members": {}}
+
+def _summarize_member(path: str, offset: int, run_ids: list) -> tuple:
+    """(latency rows, timing rows) for the wanted runs of one batch; runs in a worker process.
+
+    Status counts, model and cache stats are already in the index, so only timings are read here.
+    """
+    rows, timings = [], []
+    wanted = set(run_ids)
+    for rec in read_member(Path(path), offset):
+        rid = rec.get("run_id")
+        if rid not in wanted:
+            continue
+        settings = rec.get("settings") or {}
+        stream = settings.get("explain_stream") or {}
+        t = rec.get("timings") or []
+        rows.append({"run": rid,
+                     "rerun_ms": 1e3 * sum(s["seconds"] for s in t if s.get("depth") == 0) if t else None,
+                     "ttft_ms": 1e3 * stream["ttft_s"] if stream.get("ttft_s") is not None else None})
+        timings += [{"run": rid, "model": settings.get("model"), "depth": s["depth"], "name": s["name"],
+                     "seconds": s["seconds"]} for s in t]
+    return rows, timings
+
+def _index_summary(idx: pd.DataFrame) -> pd.DataFrame:
+    """Summary columns the run index already holds, one row per run."""
+    base = idx.drop_duplicates("run_id", keep="last").rename(columns={"run_id": "run"})
+    base = base.assign(time=[t.isoformat() for t in base["time"]])
+    return base.reindex(columns=INDEX_COLS)
+
+def update(store: RunStore = RUN_STORE, out: Path = OUT, workers: int | None = None,
+           full: bool = False) -> tuple:
+    """Summarize runs not in the manifest and merge them into the saved summary/timings.
+
+    Returns (summary, timings, new run count). Only index rows from LATE_S before the
+    manifest's high-water mark on are read (the run index is split by day, so older days are
+    not opened); runs logged with older timestamps later, e.g. by `--import-legacy`, need
+    `full`. Each index batch (segment, offset) is immutable once indexed, so the manifest
+    only records which batches were read. The manifest is written last; if that write is
+    lost, the batches are read again and their runs replace, rather than add to, the saved
+    rows and timings.
+    """
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = {"members": {}} if full else load_manifest(out)
+    old = pd.read_csv(out / SUMMARY) if (out / SUMMARY).exists() and not full else pd.DataFrame()
+    old_t = pd.read_parquet(out / TIMINGS) if (out / TIMINGS).exists() and not full else pd.DataFrame()
+    hwm = manifest.get("high_water")
+    idx = store.index(start=pd.Timestamp(hwm - LATE_S, unit="s") if hwm is not None else None)
+    done = {(seg, off) for seg, offs in manifest["members"].items() for off in offs}
+    if not idx.empty:
+        idx = idx[[(s, o) not in done for s, o in zip(idx["segment"], idx["offset"])]]
+    jobs = [(str(store.root / seg), int(off), list(g["run_id"]))
+            for (seg, off), g in idx.groupby(["segment", "offset"], sort=False)] if not idx.empty else []
+    rows, timings = [], []
+    if jobs:
+        n = workers or min(len(jobs), os.cpu_count() or 1)
+        if n > 1:
+            with ProcessPoolExecutor(n) as pool:
+                results = list(pool.map(_summarize_member, *zip(*jobs), chunksize=max(1, len(jobs) // (4 * n))))
+        else:
+            results = [_summarize_member(*j) for j in jobs]
+        for r, t in results:
+            rows += r
+            timings += t
+    new = pd.DataFrame(rows)
+    if not new.empty:
+        new = _index_summary(idx).merge(new, on="run", how="right")
+        new["verified_pct"] = (100 * new["verified"] / new["total"]).round(1)
+        if not old_t.empty:
+            old_t = old_t[~old_t["run"].isin(new["run"])]  # re-read after a crash: replace, don't double
+    frames = [f for f in (old, new) if not f.empty]
+    summary = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not summary.empty:
+        summary = summary.reindex(columns=list(dict.fromkeys(list(summary.columns) + SUMMARY_COLS)))
+        summary = summary.drop_duplicates("run", keep="last").sort_values("run", kind="stable").reset_index(drop=True)
+    frames = [f for f in (old_t, pd.DataFrame(timings)) if not f.empty]
+    timing = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if jobs:
+        summary.to_csv(out / SUMMARY, index=False)
+        if not timing.empty:
+            timing.to_parquet(out / TIMINGS, index=False)
+        live = {p.name for p in store.root.glob("runs-*.jsonl.gz")}
+        members = {s: offs for s, offs in manifest["members"].items() if s in live}  # forget retired segments
+        for seg, off, _ in jobs:
+            members.setdefault(Path(seg).name, []).append(off)
+        hwm = max([float(idx["ts"].max())] + ([hwm] if hwm is not None else []))
+        (out / MANIFEST).write_text(json.dumps({"members": members, "high_water": hwm}))
+    return summary, timing, len(rows)
+
+def latency_summary(t: pd.DataFrame, by: list | None = None) -> pd.DataFrame:
+    """p50/p90/p99 wall time (ms) per section (plus a rerun total) from per-run timing rows."""
+    if t.empty:
+        return pd.DataFrame()
+    by = list(by or [])
+    top = t[t["depth"] == 0].groupby(["run"] + by, dropna=False)["seconds"].sum().reset_index()
+    t = pd.concat([top.assign(name="(rerun total)", depth=-1), t[["run", "depth", "name", "seconds"] + by]],
+                  ignore_index=True)
+    keys = [t[k] for k in by + ["depth", "name"]]
+    g = (t["seconds"] * 1e3).groupby(keys, dropna=False)
+    out = pd.DataFrame({"runs": t.groupby(keys, dropna=False)["run"].nunique(),
+                        "p50_ms": g.quantile(0.5), "p90_ms": g.quantile(0.9), "p99_ms": g.quantile(0.99),
+                        "max_ms": g.max()})
+    return out.round(1).sort_values("p50_ms", ascending=False).reset_index()
+
+def model_breakdown(summary: pd.DataFrame) -> pd.DataFrame:
+    g = summary.groupby(summary["model"].fillna("(unknown)"))
+    out = pd.DataFrame({"runs": g.size(), "claims": g["total"].sum(), "verified": g["verified"].sum(),
+                        "mismatch": g["mismatch"].sum(), "error": g["error"].sum(),
+                        "p50_rerun_ms": g["rerun_ms"].median(), "p90_rerun_ms": g["rerun_ms"].quantile(0.9),
+                        "p50_ttft_ms": g["ttft_ms"].median()})
+    out["verified_pct"] = (100 * out["verified"] / out["claims"].where(out["claims"] > 0)).round(1)
+    return out.round(1).reset_index()
+
+def status_breakdown(summary: pd.DataFrame) -> pd.DataFrame:
+    out = summary["status"].fillna("(unknown)").value_counts().rename_axis("status").reset_index(name="runs")
+    out["share_pct"] = (100 * out["runs"] / out["runs"].sum()).round(1)
+    return out
 
 def main():
-    base = Path("artifacts/runs")
-    rows = []
-    for fp in sorted(base.glob("*/checked.csv")):
-        df = pd.read_csv(fp)
-        total = len(df)
-        status = df["status"].fillna("")
-        rows.append({
-            "run": fp.parent.name,
-            "total": total,
-            "verified": int(status.str.contains("VERIFIED").sum()),
-            "approx": int(status.str.contains("APPROX").sum()),
-            "mismatch": int(status.str.contains("MISMATCH").sum()),
-            "error": int(status.str.contains("ERROR").sum())
-        })
-    if not rows:
-        print("No runs found in artifacts/runs")
+    ap = argparse.ArgumentParser(description="Summarize logged runs (incrementally)")
+    ap.add_argument("--workers", type=int, default=None, help="processes reading new segments (default: CPUs)")
+    ap.add_argument("--full", action="store_true", help="ignore the manifest and rebuild from the run store")
+    args = ap.parse_args()
+    summary, timing, n_new = update(RUN_STORE, OUT, workers=args.workers, full=args.full)
+    if summary.empty:
+        print(f"No runs found in {RUN_STORE.root}")
         return
-    out = pd.DataFrame(rows)
-    out["verified_pct"] = (100 * out["verified"] / out["total"]).round(1)
-    print(out.sort_values("run").to_string(index=False))
-    out.to_csv("artifacts/eval_summary.csv", index=False)
-    print("\nSaved artifacts/eval_summary.csv")
+    print(f"{n_new} new runs summarized ({len(summary)} total)\n")
+    summary[["llm_cache_hits", "llm_cache_misses"]] = summary[["llm_cache_hits", "llm_cache_misses"]].fillna(0)
+    cols = ["run", "model", "status", "total"] + STATUS_COLS + ["verified_pct"]
+    print(summary[cols].tail(20).to_string(index=False))
+    lookups = summary["llm_cache_hits"].sum() + summary["llm_cache_misses"].sum()
+    if lookups:
+        print(f"\nLLM response cache hit rate: {100 * summary['llm_cache_hits'].sum() / lookups:.1f}% of {lookups:.0f} lookups")
+    print(f"\nSaved artifacts/{SUMMARY}")
+    reports = {"eval_by_model.csv": ("By model", model_breakdown(summary)),
+               "eval_by_status.csv": ("By status", status_breakdown(summary)),
+               "latency_summary.csv": ("Latency by section (ms)", latency_summary(timing)),
+               "latency_by_model.csv": ("Rerun latency by model (ms)",
+                                        latency_summary(timing, by=["model"]).query("depth == -1")
+                                        if not timing.empty else pd.DataFrame())}
+    for name, (title, df) in reports.items():
+        if df.empty:
+            continue
+        print(f"\n{title}:")
+        print(df.to_string(index=False))
+        df.to_csv(OUT / name, index=False)
+        print(f"\nSaved artifacts/{name}")
 if __name__ == "__main__":
     main()
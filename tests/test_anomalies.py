@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.anomalies import detect_anomalies, rank_segments, score_matrix, segment_daily
+
+def _orders(spike_day="2024-03-20"):
+    rng = np.random.default_rng(3)
+    days = pd.date_range("2024-01-01", "2024-03-31", freq="D")
+    rows = [(d, c, s, rng.normal(1000, 50)) for d in days for c in ("Audio", "Displays") for s in ("East", "West")]
+    df = pd.DataFrame(rows, columns=["order_date", "category", "store", "revenue"])
+    df.loc[(df["order_date"] == spike_day) & (df["category"] == "Displays") & (df["store"] == "West"), "revenue"] = 5000
+    return df
+
+def test_rolling_scores_match_pandas():
+    x = np.random.default_rng(0).gamma(2.0, 100.0, size=(3, 60))
+    expected, score = score_matrix(x, "rolling", window=14, min_periods=5)
+    s = pd.Series(x[1]).shift(1).rolling(14, min_periods=5)
+    assert np.allclose(expected[1], s.mean(), equal_nan=True)
+    assert np.allclose(score[1], (x[1] - s.mean()) / s.std(), equal_nan=True)
+
+@pytest.mark.parametrize("method", ["rolling", "seasonal", "robust"])
+def test_spike_in_one_segment_ranks_first(method):
+    cells = segment_daily(_orders())
+    flags = detect_anomalies(cells, method, window=28, threshold=4.0, start=pd.Timestamp("2024-03-01"))
+    top = flags.iloc[0]
+    assert (top["category"], top["store"], top["day"]) == ("Displays", "West", pd.Timestamp("2024-03-20"))
+    assert top["direction"] == "spike" and flags["day"].min() >= pd.Timestamp("2024-03-01")
+    ranked = rank_segments(flags)
+    assert tuple(ranked.loc[0, ["category", "store", "worst_day"]]) == ("Displays", "West", pd.Timestamp("2024-03-20"))
+
+def test_view_dates_limit_flags_not_baselines():
+    cells = segment_daily(_orders())
+    assert detect_anomalies(cells, "rolling", threshold=4.0, start=pd.Timestamp("2024-02-15"),
+                            end=pd.Timestamp("2024-03-19")).empty
+    assert len(detect_anomalies(cells, "rolling", threshold=4.0, start=pd.Timestamp("2024-03-20"),
+                                end=pd.Timestamp("2024-03-20"))) == 1
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+from app.backends import DuckDBBackend, PandasBackend
+from app.compact import compact_orders
+from app.data_loader import generate_sample, write_partitioned
+from app.analytics import SEGMENT_DIMS, apply_filters, segment_agg, segment_agg_windows
+from app.explainer import _drivers
+from app.kpis import FilterCtx, compute_kpis, top_products
+
+duckdb = pytest.importorskip("duckdb")
+
+FILTERS = [FilterCtx(), FilterCtx(category="Audio"), FilterCtx(store="East"),
+           FilterCtx(category="Peripherals", store="West")]
+WINDOWS = [(pd.Timestamp("2023-01-01"), pd.Timestamp("2024-12-31")),
+           (pd.Timestamp("2023-04-10"), pd.Timestamp("2023-06-05"))]
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    df = generate_sample(n_orders=1500)
+    root = tmp_path_factory.mktemp("data") / "orders"
+    write_partitioned(df, root)
+    return PandasBackend(compact_orders(df)), [DuckDBBackend(root), DuckDBBackend(df)]
+
+def test_duckdb_conforms_to_pandas(backends):
+    ref, others = backends
+    for other in others:
+        for f in FILTERS:
+            for start, end in WINDOWS:
+                assert other.distinct_count(start, end, f) == ref.distinct_count(start, end, f)
+                got, exp = other.group_sum(start, end, f, "product"), ref.group_sum(start, end, f, "product")
+                assert dict(zip(got.index.astype(str), got.round(6))) == \
+                    dict(zip(exp.index.astype(str), exp.round(6)))
+                rows_ref = ref.filter(start, end, f, ["order_id", "revenue"])
+                rows = other.filter(start, end, f, ["order_id", "revenue"])
+                assert sorted(rows["order_id"].astype(str)) == sorted(rows_ref["order_id"].astype(str))
+            for freq in ["M", "Q-DEC", "Q-MAR", "Q-JUN"]:
+                got, exp = other.period_agg(f, freq), ref.period_agg(f, freq)
+                assert list(got.index) == list(exp.index)
+                assert got["orders"].tolist() == exp["orders"].tolist()
+                assert got["revenue"].tolist() == pytest.approx(exp["revenue"].tolist())
+
+def _rounded(drivers):
+    return [{k: [{c: round(v, 6) if isinstance(v, float) else str(v) for c, v in r.items()} for r in d[k]]
+             for k in ("top", "movers")} for d in drivers]
+
+def test_kpis_and_drivers_run_through_a_backend(backends):
+    ref, others = backends
+    df = ref.df
+    cur = (pd.Timestamp("2023-04-10"), pd.Timestamp("2023-06-05"))
+    prev = (pd.Timestamp("2023-02-12"), pd.Timestamp("2023-04-09"))
+    key = lambda t: t.astype({d: str for d in SEGMENT_DIMS}).sort_values(list(SEGMENT_DIMS)).reset_index(drop=True)
+    for other in others:
+        for f in FILTERS:
+            wins = [(*cur, f), (*prev, f)]
+            assert compute_kpis(other, wins)["value"].tolist() == pytest.approx(compute_kpis(df, wins)["value"].tolist())
+            got, exp = top_products(other, *cur, f), top_products(df, *cur, f)
+            assert got["revenue"].tolist() == pytest.approx(exp["revenue"].tolist())
+            assert len(apply_filters(other, *cur, f)) == len(apply_filters(df, *cur, f))
+            leaf = segment_agg_windows(other, (*cur, f), (*prev, f)).leaf
+            exp_leaf = segment_agg(apply_filters(df, *cur, f), apply_filters(df, *prev, f)).leaf
+            pd.testing.assert_frame_equal(key(leaf), key(exp_leaf), check_dtype=False)
+        everything = FilterCtx()
+        assert _rounded(_drivers((*cur, everything), (*prev, everything), backend=other)) == \
+            _rounded(_drivers(apply_filters(df, *cur, everything), apply_filters(df, *prev, everything)))
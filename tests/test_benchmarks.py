@@ -0,0 +1,23 @@
+from benchmarks.run import compare, parse_size, run
+
+def test_suite_runs_and_flags_regressions():
+    report = run([2_000], repeat=1, only=["apply_filters", "check_insights"], log=lambda *_: None)
+    assert set(report["results"]) == {"apply_filters@2000", "check_insights@2000"}
+    assert all(r["median_s"] > 0 and r["peak_mb"] >= 0 for r in report["results"].values())
+    assert parse_size("10k") == 10_000 and parse_size("1m") == 1_000_000
+
+    fast = {"results": {k: dict(r, median_s=r["median_s"] / 10) for k, r in report["results"].items()}}
+    slow = {"results": {k: dict(r, median_s=1.0, peak_mb=1e9) for k, r in report["results"].items()}}
+    assert compare(report, slow, threshold=1.25, mem_threshold=1.5) == []
+    flagged = compare({"results": {k: dict(r, median_s=1.0) for k, r in report["results"].items()}},
+                      fast, threshold=1.25)
+    assert len(flagged) == 2
+
+def test_only_builds_the_fixtures_of_selected_cases(monkeypatch):
+    import benchmarks.run as bench
+    def unused(*_, **__):
+        raise AssertionError("fixture of an unselected case was built")
+    for name in ("segment_daily", "segment_agg", "build_cube", "_clean"):
+        monkeypatch.setattr(bench, name, unused)
+    report = run([2_000], repeat=1, only=["mix_table"], log=lambda *_: None)
+    assert set(report["results"]) == {"mix_table@2000"}
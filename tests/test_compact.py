@@ -0,0 +1,48 @@
+import pathlib
+import pandas as pd
+import pytest
+from app.analytics import apply_filters, mix_table, quarterly_report
+from app.compact import compact_orders, memory_report, uncompacted_bytes
+from app.explainer import _drivers
+from app.kpis import FilterCtx, aov, orders, revenue, top_products
+
+def load_sample():
+    return pd.read_csv(pathlib.Path("data/samples/sample_orders.csv"), parse_dates=["order_date"])
+
+def test_compact_frame_gives_same_answers():
+    raw = load_sample()
+    small = compact_orders(raw)
+    assert isinstance(small["category"].dtype, pd.CategoricalDtype)
+    start, end = pd.Timestamp("2023-06-01"), pd.Timestamp("2023-12-31")
+    for f in [FilterCtx(), FilterCtx(category="Audio", store="East")]:
+        assert revenue(small, start, end, f) == pytest.approx(revenue(raw, start, end, f))
+        assert orders(small, start, end, f) == orders(raw, start, end, f)
+        assert aov(small, start, end, f) == pytest.approx(aov(raw, start, end, f))
+    assert top_products(small, start, end, FilterCtx())["product"].astype(str).tolist() == \
+        top_products(raw, start, end, FilterCtx())["product"].tolist()
+
+    cur_r, cur_s = apply_filters(raw, start, end, FilterCtx()), apply_filters(small, start, end, FilterCtx())
+    prev_r = apply_filters(raw, pd.Timestamp("2023-01-01"), pd.Timestamp("2023-05-31"), FilterCtx())
+    prev_s = apply_filters(small, pd.Timestamp("2023-01-01"), pd.Timestamp("2023-05-31"), FilterCtx())
+    mr, ms = mix_table(cur_r, prev_r, by="store"), mix_table(cur_s, prev_s, by="store")
+    assert ms["segment"].astype(str).tolist() == mr["segment"].tolist()
+    assert ms["delta_share"].tolist() == pytest.approx(mr["delta_share"].tolist())
+    assert len(_drivers(cur_s, prev_s)[0]["movers"]) == len(_drivers(cur_r, prev_r)[0]["movers"])
+    pd.testing.assert_frame_equal(quarterly_report(small, FilterCtx()), quarterly_report(raw, FilterCtx()))
+
+def test_memory_report_shows_savings():
+    raw = load_sample()
+    rep = memory_report(raw, compact_orders(raw)).set_index("column")
+    assert rep.loc["(total)", "after_mb"] < rep.loc["(total)", "before_mb"]
+    assert rep.loc["store", "saved_pct"] > 0
+
+def test_compact_keeps_prices_exact_and_estimates_before_size():
+    raw = load_sample()
+    small = compact_orders(raw)
+    assert small["unit_price"].dtype == "float64"
+    assert (small["unit_price"] == raw["unit_price"]).all()
+    obj = raw.astype({c: object for c in ("order_id", "product", "category", "store")})
+    before = uncompacted_bytes(small)
+    expected = obj.memory_usage(deep=True, index=False)
+    for c in ("product", "category", "store"):
+        assert before[c] == pytest.approx(expected[c], rel=0.01)
@@ -0,0 +1,63 @@
+import pathlib
+import pandas as pd
+import pytest
+from app.cube import build_cube
+from app.kpis import revenue, orders, aov, FilterCtx
+
+def load_sample():
+    return pd.read_csv(pathlib.Path("data/samples/sample_orders.csv"), parse_dates=["order_date"])
+
+def test_cube_matches_raw_scan():
+    df = load_sample()
+    cube = build_cube(df)
+    windows = [("2023-01-01", "2024-06-30"), ("2023-03-15", "2023-04-14"), ("2025-01-01", "2025-02-01")]
+    filters = [FilterCtx(), FilterCtx(category="Audio"), FilterCtx(store="East"),
+               FilterCtx(category="Accessories", store="West"), FilterCtx(category="Nope")]
+    for s, e in windows:
+        start, end = pd.Timestamp(s), pd.Timestamp(e)
+        for f in filters:
+            assert revenue(df, start, end, f, cube) == pytest.approx(revenue(df, start, end, f))
+            assert orders(df, start, end, f, cube) == orders(df, start, end, f)
+            assert aov(df, start, end, f, cube) == pytest.approx(aov(df, start, end, f))
+
+def test_cube_merges_orders_spanning_cells():
+    df = pd.DataFrame({
+        "order_id": ["A","A","B","C"],
+        "order_date": pd.to_datetime(["2024-01-01","2024-01-01","2024-01-02","2024-01-02"]),
+        "category": ["Cat","Dog","Cat","Cat"],
+        "store": ["East","East","West","East"],
+        "revenue": [10.0, 5.0, 7.0, 3.0],
+    })
+    cube = build_cube(df)
+    assert not cube.single_cell_orders
+    start, end = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02")
+    assert orders(df, start, end, FilterCtx(), cube) == 3
+    assert orders(df, start, end, FilterCtx(store="East"), cube) == 2
+    assert orders(df, start, end, FilterCtx(category="Cat"), cube) == 3
+
+def test_cube_falls_back_on_intraday_timestamps():
+    df = pd.DataFrame({
+        "order_id": ["A","B"],
+        "order_date": pd.to_datetime(["2024-01-01 09:00","2024-01-01 18:00"]),
+        "category": ["Cat","Cat"], "store": ["East","East"], "revenue": [10.0, 5.0],
+    })
+    cube = build_cube(df)
+    assert not cube.supports(FilterCtx())
+    end = pd.Timestamp("2024-01-01 12:00")
+    assert revenue(df, pd.Timestamp("2024-01-01"), end, FilterCtx(), cube) == 10.0
+
+@pytest.mark.parametrize("dtype", [object, "category"])
+def test_missing_category_and_store_are_not_relabelled(dtype):
+    df = pd.DataFrame({
+        "order_id": ["a", "b", "c", "d"],
+        "order_date": pd.to_datetime(["2024-01-01"] * 4),
+        "category": pd.Series(["X", None, "Y", "Y"], dtype=dtype),
+        "store": pd.Series(["S", "S", None, "S"], dtype=dtype),
+        "revenue": [1.0, 2.0, 4.0, 8.0],
+    })
+    cube, day = build_cube(df), pd.Timestamp("2024-01-01")
+    for f in [FilterCtx(category="Y"), FilterCtx(category="X"), FilterCtx(store="S"),
+              FilterCtx(category="Y", store="S")]:
+        assert cube.revenue(day, day, f) == revenue(df, day, day, f)
+        assert cube.orders(day, day, f) == orders(df, day, day, f)
+    assert cube.revenue(day, day, FilterCtx()) == 15.0
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+from app.data_loader import (
+    _dataset, _month_filter, append_orders, seed_orders, dataset_meta, dataset_version, generate_sample, load_orders,
+    write_partitioned,
+)
+
+def test_partitioned_roundtrip_with_pushdown(tmp_path):
+    df = generate_sample(n_orders=500)
+    root = tmp_path / "orders"
+    write_partitioned(df, root)
+    start, end = pd.Timestamp("2023-03-10"), pd.Timestamp("2023-05-20")
+
+    got = load_orders(root, start, end, store="West")
+    m = df["order_date"].between(start, end) & (df["store"] == "West")
+    assert sorted(got["order_id"]) == sorted(df.loc[m, "order_id"])
+    assert list(got.columns) == list(df.columns)
+
+    # only the three months of the window are opened, and projection drops the other columns
+    frags = list(_dataset(root).get_fragments(filter=_month_filter(start, end)))
+    assert 0 < len(frags) <= 3 * df["store"].nunique()
+    assert list(load_orders(root, columns=["order_date", "revenue"]).columns) == ["order_date", "revenue"]
+    assert len(load_orders(root)) == len(df)
+
+    meta = dataset_meta(root)  # no manifest yet: written once, then read back
+    assert meta["stores"] == sorted(df["store"].unique())
+    assert meta["min_date"] == df["order_date"].min()
+    assert dataset_version(root) == 1 and dataset_meta(root) == meta and dataset_version(root) == 1
+
+def test_append_skips_known_orders_and_bumps_version(tmp_path):
+    df = generate_sample(n_orders=300)
+    root = tmp_path / "orders"
+    with pytest.raises(FileNotFoundError):
+        append_orders(df.iloc[:200], root)  # would shadow the existing source with only the new rows
+    first = append_orders(df.iloc[:200], root, create=True)
+    assert first == {"read": 200, "duplicates": 0, "appended": 200, "version": 1}
+    n_files = len(list(root.rglob("*.parquet")))
+
+    batch = df.iloc[150:].copy()           # 50 already stored + 100 new, one new line repeated
+    batch = pd.concat([batch, batch.tail(1)])
+    stats = append_orders(batch, root)
+    assert stats == {"read": 151, "duplicates": 51, "appended": 100, "version": 2}
+    assert len(list(root.rglob("*.parquet"))) > n_files      # existing files are left untouched
+    got = load_orders(root)
+    assert sorted(got["order_id"]) == sorted(df["order_id"])
+    assert dataset_version(root) == 2
+    assert dataset_meta(root)["max_date"] == df["order_date"].max()
+    assert append_orders(df.iloc[:10], root)["appended"] == 0
+
+def test_append_dedups_by_order_id_across_all_partitions(tmp_path):
+    df = generate_sample(n_orders=400)
+    src = tmp_path / "orders.parquet"
+    df.to_parquet(src, index=False)
+    root = tmp_path / "orders"
+    assert seed_orders(src, root)["appended"] == len(df)
+    with pytest.raises(FileExistsError):
+        seed_orders(src, root)
+    moved = df.head(5).assign(order_date=df["order_date"].max() + pd.Timedelta(days=40), store="Nowhere")
+    fresh = df.tail(3).assign(order_id=lambda d: d["order_id"] + "-new")
+    resent = fresh.assign(quantity=fresh["quantity"] + 1)        # same ids, other values, same batch
+    stats = append_orders(pd.concat([moved, fresh, resent]), root)
+    assert stats["duplicates"] == 8 and stats["appended"] == 3    # moved ids are found in other partitions
+    got = load_orders(root)
+    assert len(got) == len(df) + 3 and got["order_id"].is_unique
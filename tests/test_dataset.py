@@ -0,0 +1,37 @@
+import pathlib
+import pandas as pd
+import pytest
+from app.analytics import apply_filters
+from app.dataset import OrdersDataset
+from app.kpis import FilterCtx, orders, revenue
+
+def load_sample():
+    return pd.read_csv(pathlib.Path("data/samples/sample_orders.csv"), parse_dates=["order_date"])
+
+def test_window_matches_boolean_mask():
+    df = load_sample()
+    ds = OrdersDataset(df)
+    start, end = pd.Timestamp("2023-05-01"), pd.Timestamp("2023-08-31")
+    for f in [FilterCtx(), FilterCtx(category="Audio"), FilterCtx(store="West"),
+              FilterCtx(category="Peripherals", store="East"), FilterCtx(store="Nowhere")]:
+        expected = apply_filters(df, start, end, f).sort_values(["order_date", "order_id"])
+        got = apply_filters(ds, start, end, f).sort_values(["order_date", "order_id"])
+        assert got["order_id"].tolist() == expected["order_id"].tolist()
+        assert revenue(ds, start, end, f) == pytest.approx(revenue(df, start, end, f))
+        assert orders(ds, start, end, f) == orders(df, start, end, f)
+
+def test_unfiltered_window_is_contiguous_slice():
+    ds = OrdersDataset(load_sample())
+    lo, hi = ds.bounds(pd.Timestamp("2023-02-01"), pd.Timestamp("2023-02-28"))
+    w = ds.window(pd.Timestamp("2023-02-01"), pd.Timestamp("2023-02-28"), FilterCtx())
+    assert len(w) == hi - lo
+    assert w["order_date"].between("2023-02-01", "2023-02-28").all()
+
+def test_apply_filters_returns_independent_frame_for_both_inputs():
+    df = load_sample()
+    ds = OrdersDataset(df)
+    start, end = pd.Timestamp("2023-03-01"), pd.Timestamp("2023-03-31")
+    for src in (df, ds):
+        out = apply_filters(src, start, end, FilterCtx())
+        out["revenue"] = 0.0
+    assert ds.df["revenue"].sum() == pytest.approx(df["revenue"].sum()) and df["revenue"].sum() > 0
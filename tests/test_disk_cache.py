@@ -0,0 +1,25 @@
+import io
+import os
+import pandas as pd
+from app.disk_cache import DiskCache
+from app.upload import upload_key
+
+def test_lru_eviction_keeps_recent_entries(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=250, suffix=".bin")
+    for i, key in enumerate(["a", "b", "c"]):
+        p = cache.put(key, lambda tmp: tmp.write_bytes(b"x" * 100))
+        os.utime(p, (1000 + i, 1000 + i))
+    # cap of 250 bytes: writing "c" already evicted the oldest entry
+    assert cache.get("a") is None
+    assert cache.get("b") is not None           # touch "b" so "c" becomes the LRU entry
+    cache.put("d", lambda tmp: tmp.write_bytes(b"x" * 100))
+    assert cache.get("c") is None
+    assert cache.get("b") is not None and cache.get("d") is not None
+    assert not list(tmp_path.glob(".*.tmp"))
+
+def test_upload_key_covers_content_and_mapping(tmp_path):
+    data = pd.DataFrame({"id": [1, 2], "d": ["2024-01-01", "2024-01-02"]}).to_csv(index=False).encode()
+    m = {"order_id": "id", "order_date": "d"}
+    assert upload_key(io.BytesIO(data), m) == upload_key(io.BytesIO(data), dict(reversed(m.items())))
+    assert upload_key(io.BytesIO(data), m) != upload_key(io.BytesIO(data + b"3,2024-01-03\n"), m)
+    assert upload_key(io.BytesIO(data), m) != upload_key(io.BytesIO(data), {"order_id": "d"})
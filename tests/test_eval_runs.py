@@ -0,0 +1,64 @@
+import json
+import time
+from app.logger import save_run
+from app.run_store import RunStore
+from scripts.eval_runs import MANIFEST, latency_summary, model_breakdown, status_breakdown, update
+
+def _log(store, i, model, status="✅ VERIFIED"):
+    save_run({"i": i}, [], [{"status": "✅ VERIFIED"}, {"status": status}], {"model": model},
+             timings=[{"name": "kpis", "depth": 0, "seconds": 0.01 * (i + 1)},
+                      {"name": "kpis.inner", "depth": 1, "seconds": 0.005}], store=store)
+
+def test_incremental_summary_reads_only_new_batches(tmp_path):
+    store, out = RunStore(tmp_path / "runs", flush_s=0.05, batch=2), tmp_path / "out"
+    for i in range(4):
+        _log(store, i, "a" if i % 2 else "b", "❌ MISMATCH" if i == 3 else "✅ VERIFIED")
+    store.flush()
+    summary, timing, n = update(store, out, workers=2)
+    assert n == 4 and len(summary) == 4 and len(timing) == 8
+    assert sum(len(v) for v in json.loads((out / MANIFEST).read_text())["members"].values()) == 2
+
+    _, _, n = update(store, out)
+    assert n == 0                                   # nothing new: no segment is reopened
+    _log(store, 4, "a")
+    store.flush()
+    summary, timing, n = update(store, out, workers=1)
+    assert n == 1 and len(summary) == 5 and summary["run"].is_unique
+
+    by_model = model_breakdown(summary).set_index("model")
+    assert by_model.loc["a", "runs"] == 3 and by_model.loc["a", "mismatch"] == 1
+    assert status_breakdown(summary).set_index("status")["runs"].to_dict() == {"ok": 4, "mismatch": 1}
+    lat = latency_summary(timing).set_index("name")
+    assert lat.loc["(rerun total)", "runs"] == 5 and lat.loc["kpis.inner", "p50_ms"] == 5.0
+    assert set(latency_summary(timing, by=["model"])["model"]) == {"a", "b"}
+
+    full, _, n = update(store, out, full=True)
+    assert n == 5 and full.equals(summary)
+    store.close()
+
+def test_lost_manifest_does_not_double_count_timings(tmp_path):
+    store, out = RunStore(tmp_path / "runs", flush_s=0.05, batch=2), tmp_path / "out"
+    for i in range(3):
+        _log(store, i, "a")
+    store.flush()
+    summary, timing, _ = update(store, out, workers=1)
+    (out / MANIFEST).unlink()                       # crash after the outputs, before the manifest
+    again, timing2, n = update(store, out, workers=1)
+    assert n == 3 and len(timing2) == len(timing) == 6 and again.equals(summary)
+    store.close()
+
+def test_update_reads_only_index_days_past_the_high_water_mark(tmp_path):
+    store, out = RunStore(tmp_path / "runs", flush_s=0.05, batch=2), tmp_path / "out"
+    _log(store, 0, "a")
+    store.flush()
+    update(store, out, workers=1)
+    assert json.loads((out / MANIFEST).read_text())["high_water"] > 0
+    store.put({"run_id": "old", "ts": time.time() - 3 * 86400, "settings": {}, "checked": []})
+    _log(store, 1, "a")
+    store.flush()
+    assert len(store.index_files()) == 2
+    summary, _, n = update(store, out, workers=1)
+    assert n == 1 and "old" not in set(summary["run"])     # the older day is not opened
+    full, _, n = update(store, out, workers=1, full=True)
+    assert n == 3 and "old" in set(full["run"])
+    store.close()
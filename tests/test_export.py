@@ -0,0 +1,36 @@
+import gzip
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.compact import compact_orders
+from app.data_loader import generate_sample
+from app.disk_cache import DiskCache
+from app.export import EXPORT_COLUMNS, export_key, prepare_export, preview_csv, write_export
+
+def test_streamed_exports_match_whole_frame(tmp_path):
+    df = compact_orders(generate_sample(n_orders=700)).sample(frac=1, random_state=3)
+    expected = df.sort_values("order_date", kind="stable")[EXPORT_COLUMNS]
+    write_export(df, "CSV (gzip)", tmp_path / "v.csv.gz", chunk_rows=128)
+    assert gzip.decompress((tmp_path / "v.csv.gz").read_bytes()).decode() == expected.to_csv(index=False)
+
+    write_export(df, "Parquet", tmp_path / "v.parquet", chunk_rows=128)
+    back = pq.read_table(tmp_path / "v.parquet").to_pandas()
+    assert back["revenue"].tolist() == expected["revenue"].tolist()
+
+    cache = DiskCache(tmp_path / "exports", 10**9, suffix=".export")
+    p = prepare_export(df, "Arrow IPC", export_key("fp", "Arrow IPC"), cache=cache, chunk_rows=128)
+    assert pa.ipc.open_file(p).read_all().num_rows == len(df)
+
+    lines = preview_csv(df, n=5).splitlines()
+    assert len(lines) == 6 and lines[1].startswith(str(expected["order_date"].iloc[0].date()))
+
+def test_prepared_exports_are_reused_and_capped(tmp_path):
+    df = compact_orders(generate_sample(n_orders=300))
+    one = prepare_export(df, "CSV", export_key("a", "CSV"), cache=DiskCache(tmp_path, 10**9, suffix=".export"))
+    cache = DiskCache(tmp_path, one.stat().st_size * 2, suffix=".export")
+    size = one.stat().st_size
+    assert prepare_export(df.iloc[:0], "CSV", export_key("a", "CSV"), cache=cache) == one  # reused, not rewritten
+    assert one.stat().st_size == size
+    for fp in "bcd":
+        prepare_export(df, "CSV", export_key(fp, "CSV"), cache=cache)
+    assert len(list(tmp_path.glob("*.export"))) == 2 and not any(tmp_path.glob(".*.tmp"))
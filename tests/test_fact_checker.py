@@ -31,3 +31,53 @@ def test_fact_checker_verified():
     df = df_fake()
     res = check_insights([insight_ok()], df, tolerance_pct=0.5)
     assert res[0].status in ("✅ VERIFIED","⚠️ APPROX")
+
+def claim(claim_id, metric, start, end, value, comparison=None, flt=None):
+    return SimpleNamespace(
+        claim_id=claim_id, statement=claim_id, metric=metric,
+        period=Period(start=start, end=end), filter=flt or {},
+        value_reported=value, comparison=comparison or {"vs": "none"},
+    )
+
+def test_batch_dedupes_windows_and_checks_previous_year(monkeypatch):
+    import app.fact_checker as fc
+    df = pd.concat([df_fake(), df_fake().assign(
+        order_id=["C", "D"], order_date=pd.to_datetime(["2023-01-01", "2023-01-02"]), revenue=[5.0, 5.0])])
+    calls = []
+    real = fc.compute_kpis
+    monkeypatch.setattr(fc, "compute_kpis", lambda d, w, *a, **k: calls.append(len(w)) or real(d, w, *a, **k))
+
+    claims = [
+        claim("rev", "revenue", "2024-01-01", "2024-01-02", 20.0),
+        claim("ord", "orders", "2024-01-01", "2024-01-02", 5.0),
+        claim("aov", "aov", "2024-01-01", "2024-01-02", 10.0),
+        claim("yoy", "revenue", "2024-01-01", "2024-01-02", 20.0,
+              {"vs": "previous_year", "delta": 10.0, "delta_pct": 100.0}),
+        claim("yoy_off", "revenue", "2024-01-01", "2024-01-02", 20.0,
+              {"vs": "previous_year", "delta": 2.0, "delta_pct": 11.0}),
+        claim("bad", "revenue", "not-a-date", "2024-01-02", 1.0),
+    ]
+    res = {c.claim_id: c for c in check_insights(claims, df)}
+    assert calls == [2]
+    assert [c.claim_id for c in check_insights(claims, df)] == [c.claim_id for c in claims]
+    assert res["rev"].status == "✅ VERIFIED"
+    assert res["ord"].status == "❌ MISMATCH" and res["ord"].value_computed == 2.0
+    assert res["aov"].status == "✅ VERIFIED"
+    assert res["yoy"].status == "✅ VERIFIED"
+    assert res["yoy_off"].status == "⚠️ APPROX"
+    assert res["bad"].status == "❌ ERROR"
+
+def test_failing_claim_does_not_fail_the_batch(monkeypatch):
+    import app.fact_checker as fc
+    real = fc.compute_kpis
+    def flaky(d, windows, *a, **k):
+        if any(f.store == "Boom" for _, _, f in windows):
+            raise RuntimeError("backend down")
+        return real(d, windows, *a, **k)
+    monkeypatch.setattr(fc, "compute_kpis", flaky)
+    claims = [claim("rev", "revenue", "2024-01-01", "2024-01-02", 20.0),
+              claim("boom", "revenue", "2024-01-01", "2024-01-02", 20.0, flt={"store": "Boom"}),
+              claim("ord", "orders", "2024-01-01", "2024-01-02", 5.0)]
+    res = check_insights(claims, df_fake())
+    assert [c.status for c in res] == ["✅ VERIFIED", "❌ ERROR", "❌ MISMATCH"]
+    assert res[1].reason == "backend down"
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from app.hll import Sketches, rel_error
+from app.analytics import QuarterlyCache, quarterly_report
+from app.cube import build_cube
+from app.kpis import orders, compute_kpis, FilterCtx
+from app.fact_checker import check_insights, VERIFIED, APPROX, MISMATCH
+
+def orders_df(n=40_000, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, n // 2, n)  # ~2 lines per order, often in different cells
+    return pd.DataFrame({
+        "order_id": pd.Series(ids).map("O{}".format),
+        "order_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(ids % 60, unit="D"),
+        "category": rng.choice(["A", "B", "C"], n),
+        "store": rng.choice(["East", "West"], n),
+        "revenue": rng.uniform(1, 100, n),
+    })
+
+def test_sketch_estimates_within_bound():
+    rng = np.random.default_rng(1)
+    group = np.repeat(np.arange(4), [50, 5_000, 50_000, 200_000])
+    ids = rng.integers(0, 10**12, len(group))
+    sk = Sketches.build(group, ids)
+    for g, n in enumerate([50, 5_000, 50_000, 200_000]):
+        assert abs(sk.count([g]) - n) <= rel_error() * n
+    # merging groups counts the union, duplicates across groups once
+    dup = Sketches.build(np.r_[group, group + 4], np.r_[ids, ids])
+    assert dup.count(np.arange(8)) == sk.count(np.arange(4))
+    assert np.allclose(sk.per_group(4), [sk.count([g]) for g in range(4)])
+
+def test_sketch_ignores_missing_ids():
+    sk = Sketches.build(np.zeros(4, dtype=np.int64), pd.Series(["a", None, "b", "a"]))
+    assert round(sk.count([0])) == 2
+
+def test_approx_cube_orders_close_to_exact():
+    df = orders_df()
+    cube = build_cube(df, approx_orders=True)
+    assert cube.orders_rel_error == rel_error() and build_cube(df).orders_rel_error == 0.0
+    start, end = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-15")
+    for f in [FilterCtx(), FilterCtx(category="B"), FilterCtx(store="West", category="C")]:
+        exact = orders(df, start, end, f)
+        assert abs(cube.orders(start, end, f) - exact) <= cube.orders_rel_error * exact
+    kf = compute_kpis(df, [(start, end, FilterCtx())], cube=cube).set_index("metric")
+    assert kf.loc["revenue", "rel_error"] == 0.0 and kf.loc["orders", "rel_error"] == cube.orders_rel_error
+
+def test_quarterly_cache_merges_month_sketches():
+    df = orders_df(60_000).assign(order_date=lambda d: d["order_date"] + pd.to_timedelta(d.index % 200, unit="D"))
+    cache = QuarterlyCache(approx_orders=True)
+    for f in [FilterCtx(), FilterCtx(store="East")]:
+        exact = quarterly_report(df, f).set_index("quarter")
+        approx = quarterly_report(df, f, cache=cache).set_index("quarter")
+        assert np.allclose(approx["revenue"], exact["revenue"])
+        assert ((approx["orders"] - exact["orders"]).abs() <= cache.orders_rel_error * exact["orders"]).all()
+    assert cache.months_scanned == 9  # each month sketched once, reused across filters
+
+def claim(metric, value):
+    return SimpleNamespace(claim_id=metric, statement=metric, metric=metric, filter={},
+                           period=SimpleNamespace(start="2024-01-01", end="2024-02-15"),
+                           value_reported=value, comparison={"vs": "none"})
+
+def test_fact_checker_accounts_for_sketch_error():
+    df = orders_df()
+    cube = build_cube(df, approx_orders=True)
+    start, end = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-15")
+    est = cube.orders(start, end, FilterCtx())
+    rev = float(df.loc[df["order_date"] <= end, "revenue"].sum())
+    claims = [claim("orders", est), claim("orders", est * 1.02), claim("orders", est * 1.2), claim("revenue", rev)]
+    res = check_insights(claims, df, cube=cube)
+    assert [r.status for r in res] == [VERIFIED, APPROX, MISMATCH, VERIFIED]
+    assert "sketch error" in res[1].reason
+    exact = orders(df, start, end, FilterCtx())
+    assert check_insights([claim("orders", exact * 1.02)], df, cube=build_cube(df))[0].status == MISMATCH
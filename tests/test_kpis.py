@@ -1,5 +1,5 @@
 import pandas as pd
-from app.kpis import revenue, orders, aov, FilterCtx
+from app.kpis import revenue, orders, aov, compute_kpis, kpi_dict, FilterCtx
 
 def small_df():
     return pd.DataFrame({
@@ -21,3 +21,28 @@ def test_kpis_basic():
     assert revenue(df, start, end, f) == 40.0
     assert orders(df, start, end, f) == 3
     assert round(aov(df, start, end, f), 2) == 13.33
+
+def test_compute_kpis_batches_windows():
+    df = small_df()
+    wins = [(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-03"), FilterCtx()),
+            (pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-02"), FilterCtx(store="East")),
+            (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-02"), FilterCtx())]
+    kf = compute_kpis(df, wins)
+    assert list(kf.columns) == ["window","start","end","category","store","metric","value","rel_error"]
+    assert (kf["rel_error"] == 0).all()
+    assert len(kf) == 9
+    assert kpi_dict(kf, 0) == {"revenue": 40.0, "orders": 3.0, "aov": 40.0 / 3}
+    assert kpi_dict(kf, 1) == {"revenue": 20.0, "orders": 1.0, "aov": 20.0}
+    assert kpi_dict(kf, 2)["aov"] == 0.0
+    assert kpi_dict(compute_kpis(df, wins[:1], ["orders"]), 0) == {"orders": 3.0}
+
+def test_raw_frame_windows_share_one_scan(monkeypatch):
+    import app.kpis as kpis
+    df = small_df()
+    wins = [(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-01"), FilterCtx()),
+            (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02"), FilterCtx(category="Cat")),
+            (pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-02"), FilterCtx(store="East"))]
+    expected = [kpi_dict(compute_kpis(df, [w]), 0) for w in wins]
+    monkeypatch.setattr(kpis, "select_window", lambda *a: (_ for _ in ()).throw(AssertionError("per-window scan")))
+    kf = compute_kpis(df, wins)
+    assert [kpi_dict(kf, i) for i in range(len(wins))] == expected
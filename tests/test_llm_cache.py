@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+from app import explainer, llm_cache
+from app.disk_cache import DiskCache
+
+class FakeClient:
+    config = SimpleNamespace(model="m")
+
+    def __init__(self):
+        self.calls = 0
+
+    def stream(self, messages, **kw):
+        self.calls += 1
+        yield from ["summary ", str(self.calls)]
+
+def test_explain_reuses_cached_response_across_reruns(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE", DiskCache(tmp_path, 1_000_000, ".json"))
+    monkeypatch.setenv("USE_OPENAI", "1")
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    fake = FakeClient()
+    monkeypatch.setattr(explainer, "get_client", lambda: fake)
+    kpis = {"revenue": 100.0, "orders": 2, "aov": 50.0}
+
+    llm_cache.begin_run()
+    assert explainer.explain([{"claim_id": "a", "status": "VERIFIED"}], kpis) == "summary 1"
+    # a rerun regenerates claim ids; same numbers -> cache hit, no second model call
+    assert explainer.explain([{"claim_id": "b", "status": "VERIFIED"}], kpis) == "summary 1"
+    assert explainer.explain([], kpis, temperature=0.7) == "summary 2"
+    s = llm_cache.run_summary()
+    assert (s["hits"], s["misses"], fake.calls) == (1, 2, 2)
+
+    key = llm_cache.response_key("explain", {"x": 1}, "m", 0.2)
+    llm_cache.put_response(key, "old")
+    assert llm_cache.get_response(key) == "old"
+    assert llm_cache.get_response(key, ttl_s=-1) is None          # expired entries are dropped
+    assert llm_cache.get_response(key) is None
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app import explainer, insight_engine, llm_cache
+from app.disk_cache import DiskCache
+from app.llm_client import AsyncLLMClient, LLMConfig, LLMError
+
+class StandIn(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions; `script` holds per-request (status, delay) overrides."""
+    script, seen, active, peak = [], [], 0, 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with StandIn.lock:
+            StandIn.seen.append(body)
+            StandIn.active += 1
+            StandIn.peak = max(StandIn.peak, StandIn.active)
+        status, delay = StandIn.script.pop(0) if StandIn.script else (200, 0.0)
+        time.sleep(delay)
+        with StandIn.lock:
+            StandIn.active -= 1
+        text = f"echo:{body['messages'][-1]['content']}"
+        if body.get("stream"):
+            events = [{"choices": [{"delta": {"content": w}}]} for w in text.split(":")]
+            data = "".join(f"data: {json.dumps(e)}\n\n" for e in events).encode() + b"data: [DONE]\n\n"
+        else:
+            data = json.dumps({"choices": [{"message": {"content": text}}]}).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):  # client already gave up (timeout test)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    StandIn.script, StandIn.seen, StandIn.active, StandIn.peak = [], [], 0, 0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}/v1"
+    srv.shutdown()
+
+def client(url, **kw):
+    return AsyncLLMClient(LLMConfig(base_url=url, api_key="k", model="m", backoff_s=0.01, **kw))
+
+def test_retries_timeouts_and_coalescing(server):
+    c = client(server, timeout_s=0.3, max_retries=2)
+    StandIn.script = [(503, 0.0), (200, 1.0)]            # server error, then too slow, then ok
+    assert c.complete([{"role": "user", "content": "hi"}]) == "echo:hi"
+    assert len(StandIn.seen) == 3 and c.stats["retries"] == 2
+
+    StandIn.script, StandIn.seen = [(200, 0.15)], []
+    with ThreadPoolExecutor(4) as ex:                    # identical concurrent calls share one request
+        outs = list(ex.map(lambda _: c.complete([{"role": "user", "content": "same"}]), range(4)))
+    assert outs == ["echo:same"] * 4 and len(StandIn.seen) == 1 and c.stats["coalesced"] == 3
+
+    StandIn.script = [(400, 0.0)]                        # client errors are not retried
+    with pytest.raises(LLMError):
+        c.complete([{"role": "user", "content": "bad"}])
+    c.close()
+
+def test_concurrency_limit_holds_for_timed_out_requests(server):
+    c = client(server, timeout_s=0.2, max_retries=0, max_concurrency=1)
+    StandIn.script = [(200, 0.5), (200, 0.0), (200, 0.0)]  # the first request times out
+    with ThreadPoolExecutor(3) as ex:
+        for f in [ex.submit(c.complete, [{"role": "user", "content": str(i)}]) for i in range(3)]:
+            f.exception()
+    assert StandIn.peak == 1                             # never two HTTP requests at once
+    c.close()
+
+def test_insights_use_the_requested_model(server, monkeypatch, tmp_path):
+    monkeypatch.setenv("USE_OPENAI", "1")
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    monkeypatch.setattr(llm_cache, "LLM_CACHE", DiskCache(tmp_path, 10**6, suffix=".json"))
+    c = client(server, timeout_s=1.0, max_retries=0)
+    monkeypatch.setattr(insight_engine, "get_client", lambda: c)
+    payload = {"period": {"start": "2024-01-01", "end": "2024-01-31"}, "filter": {}, "current": {"aov": 10.0}}
+    insight_engine.generate_insights(payload, model="picked-in-ui")
+    assert StandIn.seen[-1]["model"] == "picked-in-ui"
+    c.close()
+
+def test_modules_fall_back_to_offline_heuristic(monkeypatch):
+    monkeypatch.setenv("USE_OPENAI", "1")
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    dead = client("http://127.0.0.1:9/v1", timeout_s=0.2, max_retries=0)
+    monkeypatch.setattr(explainer, "get_client", lambda: dead)
+    monkeypatch.setattr(insight_engine, "get_client", lambda: dead)
+    payload = {"period": {"start": "2024-01-01", "end": "2024-01-31"}, "filter": {}, "current": {"aov": 10.0}}
+    assert [i.metric for i in insight_engine.generate_insights(payload)] == ["aov"]
+    text = explainer.explain([], {"revenue": 10.0, "orders": 1, "aov": 10.0})
+    assert text.startswith("### Executive summary") and "offline summary shown" in text
+    dead.close()
+
+def test_stream_yields_deltas_and_retries_before_first_token(server):
+    c = client(server, timeout_s=1.0, max_retries=1)
+    StandIn.script = [(503, 0.0)]
+    assert list(c.stream([{"role": "user", "content": "go"}])) == ["echo", "go"]
+    assert StandIn.seen[-1]["stream"] is True and c.stats["retries"] == 1
+    StandIn.script = [(503, 0.0), (503, 0.0)]
+    with pytest.raises(LLMError):
+        list(c.stream([{"role": "user", "content": "go"}]))
+    c.close()
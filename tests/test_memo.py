@@ -0,0 +1,71 @@
+import gc
+import pytest
+import pandas as pd
+from app.analytics import apply_filters, mix_table
+from app.kpis import FilterCtx
+from app.memo import Memo
+
+def frame(n=50, scale=1.0):
+    return pd.DataFrame({
+        "order_id": [f"O{i}" for i in range(n)],
+        "order_date": pd.date_range("2024-01-01", periods=n, freq="D"),
+        "product": ["X", "Y"] * (n // 2), "category": ["A", "B"] * (n // 2), "store": ["East"] * n,
+        "quantity": [1] * n, "unit_price": [10.0 * scale] * n, "revenue": [10.0 * scale] * n,
+    })
+
+def test_hits_follow_content_not_identity_and_budget_evicts():
+    memo = Memo(max_bytes=10_000_000)
+    filt, mix = memo.wrap(apply_filters), memo.wrap(mix_table)
+    s, e = pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-20")
+    a = filt(frame(), s, e, FilterCtx())
+    assert filt(frame(), s, e, FilterCtx()) is a                   # equal copy of the data -> hit
+    assert filt(frame(), s, e, FilterCtx(category="A")) is not a   # different filter -> miss
+    assert filt(frame(scale=2.0), s, e, FilterCtx()) is not a      # different data -> miss
+    mix(a, None, by="category")
+    mix(a, None, by="category")
+    assert (memo.hits, memo.misses) == (2, 4)
+
+    tiny = Memo(max_bytes=memo._size(a) + 1)
+    f2 = tiny.wrap(apply_filters)
+    f2(frame(), s, e, FilterCtx())
+    f2(frame(), s, e, FilterCtx(category="B"))
+    assert tiny.stats()["entries"] == 1 and tiny.evictions == 1 and tiny.nbytes <= tiny.max_bytes
+
+def test_label_edits_and_collected_objects_do_not_hit():
+    memo = Memo(max_bytes=10_000_000)
+    base = frame()
+    edited = base.copy()
+    edited.loc[7, "category"] = "C"          # a label change with identical totals
+    assert memo.fingerprint(base) != memo.fingerprint(edited)
+
+    class Source:                             # unhashable, like a cube or cache
+        __eq__ = lambda self, other: self is other
+        __hash__ = None
+    seen = []
+    tag = memo.wrap(lambda src: seen.append(1) or len(seen))
+    a = Source()
+    assert tag(a) == tag(a) == 1
+    del a
+    gc.collect()
+    assert tag(Source()) == 2                 # a new object never reuses the old key, even at the same id
+    assert memo._tokens.keys() <= {id(o) for o in gc.get_objects() if isinstance(o, Source)}
+
+def test_derived_and_tagged_frames_skip_hashing_and_nested_results_count_toward_budget(monkeypatch):
+    import app.memo as memo_mod
+    from app.analytics import segment_agg
+    memo = Memo(max_bytes=10_000_000)
+    filt = memo.wrap(apply_filters)
+    base = frame()
+    memo.tag(base, "v1")
+    a = filt(base, pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-20"), FilterCtx())
+    monkeypatch.setattr(memo_mod, "_frame_fingerprint", lambda df: pytest.fail("content hashed"))
+    assert memo.fingerprint(base) == "v1" and len(memo.fingerprint(a)) == 32
+    assert memo.wrap(mix_table)(a, None, by="category") is memo.wrap(mix_table)(a, None, by="category")
+
+    big = segment_agg(frame(n=2000), None, dims=("order_id",))
+    assert Memo._size(big) >= Memo._size(big.leaf)
+    tiny = Memo(max_bytes=Memo._size(big) * 3 // 2)
+    agg = tiny.wrap(lambda n: segment_agg(frame(n=2000, scale=n), None, dims=("order_id",)))
+    agg(1.0)
+    agg(2.0)
+    assert tiny.stats()["entries"] == 1 and tiny.evictions == 1
@@ -0,0 +1,38 @@
+import pandas as pd
+from app.analytics import mix_from_agg, mix_table, segment_agg
+from app.explainer import _drivers, drivers_from
+
+def _slices():
+    cur = pd.DataFrame({"category": ["A", "A", "B", "B", "C"], "store": ["E", "W", "E", "E", "W"],
+                        "product": ["a1", "a2", "b1", "b1", "c1"], "revenue": [10.0, 30.0, 20.0, 25.0, 20.0]})
+    prev = pd.DataFrame({"category": ["A", "B", "D"], "store": ["E", "W", "W"],
+                         "product": ["a1", "b1", "d1"], "revenue": [50.0, 30.0, 20.0]})
+    return cur, prev
+
+def test_one_aggregation_serves_every_dimension():
+    cur, prev = _slices()
+    agg = segment_agg(cur, prev)
+    assert len(agg.leaf) == 6   # category × store × product combinations seen in either slice
+    for by in ("category", "store", "product"):
+        expected = mix_table(cur, prev, by=by)
+        pd.testing.assert_frame_equal(mix_from_agg(agg, by=by).reset_index(drop=True),
+                                      expected.reset_index(drop=True))
+    mix = mix_from_agg(agg, by="category").set_index("segment")
+    assert mix.loc["D", "share_cur"] == 0.0 and mix.loc["D", "share_prev"] == 0.2
+    no_prev = mix_from_agg(segment_agg(cur, None), by="category")
+    assert set(no_prev["segment"]) == {"A", "B", "C"} and (no_prev["share_prev"] == 0).all()
+
+def test_drill_down_shares_are_within_the_parent():
+    cur, prev = _slices()
+    drill = mix_from_agg(segment_agg(cur, prev), by="product", where={"category": "A"}).set_index("segment")
+    assert set(drill.index) == {"a1", "a2"}
+    assert drill.loc["a2", "share_cur"] == 0.75 and drill.loc["a1", "share_prev"] == 1.0
+
+def test_drivers_read_the_shared_aggregation():
+    cur, prev = _slices()
+    drivers = drivers_from(segment_agg(cur, prev))
+    assert drivers == _drivers(cur, prev)
+    by_cat = drivers[0]
+    assert by_cat["top"][0] == {"category": "B", "revenue": 45.0}
+    assert [m["category"] for m in by_cat["movers"]][:2] == ["C", "B"]
+    assert all(m["category"] != "D" for m in by_cat["top"])   # only segments sold in the current slice
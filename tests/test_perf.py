@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+import tracemalloc
+from app import perf
+
+@perf.timed("double")
+def double(df):
+    return pd.concat([df, df])
+
+@pytest.fixture(autouse=True)
+def no_trace():
+    """Each test starts without a trace and leaves none behind for later tests."""
+    token = perf._tracer.set(None)
+    yield
+    perf._tracer.reset(token)
+
+def test_sections_nest_timed_calls_and_noop_without_trace():
+    df = pd.DataFrame({"x": range(5)})
+    assert len(double(df)) == 10                 # no active trace: plain call
+    tr = perf.start_trace()
+    tr.section("a", rows=5)
+    double(df)
+    with perf.span("inner") as s:
+        s.rows = 3
+    tr.section("b")
+    tr.finish()
+    rec = [(r["name"], r["depth"], r["rows"]) for r in tr.to_records()]
+    assert rec == [("a", 0, 5), ("double", 1, 10), ("inner", 1, 3), ("b", 0, None)]
+    tf = tr.to_frame()
+    assert (tf["seconds"] >= 0).all() and tr.total_seconds >= tf.loc[tf["depth"] == 1, "seconds"].sum()
+
+def test_peak_memory_is_per_span_and_reaches_the_parent():
+    tr = perf.Tracer(trace_memory=True)
+    perf._tracer.set(tr)
+    tr.section("a")
+    with perf.span("big"):
+        np.ones(4_000_000).sum()                 # 32 MB allocated and freed inside the span
+    with perf.span("small"):
+        np.ones(10).sum()
+    tr.finish()
+    tracemalloc.stop()
+    mb = {s.name: s.peak_mb_delta for s in tr.spans}
+    assert mb["big"] >= 30 and mb["small"] < 1 and mb["a"] >= mb["big"]
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+from app.analytics import PVM_EFFECTS, pvm_bridge, pvm_rollup, pvm_summary, pvm_top, segment_agg
+
+def _lines(rows):
+    df = pd.DataFrame(rows, columns=["category", "store", "product", "quantity", "unit_price"])
+    return df.assign(revenue=df["quantity"] * df["unit_price"])
+
+def test_shift_to_pricier_products_is_mix_not_price():
+    prev = _lines([("A", "E", "cheap", 10, 1.0), ("A", "E", "dear", 10, 5.0)])
+    cur = _lines([("A", "E", "cheap", 5, 1.0), ("A", "E", "dear", 15, 5.0)])
+    agg = segment_agg(cur, prev)
+    items = pvm_bridge(agg)
+    total = items[PVM_EFFECTS].sum()
+    assert total["volume"] == 0 and total["price"] == 0 and total["mix"] == 20.0
+    summary = pvm_summary(items, agg).set_index("component")["value"]
+    assert summary["Δ Revenue"] == 20.0 and summary["Mix effect"] == 20.0
+
+def test_effects_reconcile_per_item_with_new_and_lost():
+    prev = _lines([("A", "E", "p1", 4, 2.0), ("A", "W", "p1", 2, 2.0), ("B", "E", "p2", 3, 10.0),
+                   ("B", "E", "gone", 1, 7.0)])
+    cur = _lines([("A", "E", "p1", 6, 3.0), ("B", "E", "p2", 3, 9.0), ("B", "W", "fresh", 2, 4.0)])
+    items = pvm_bridge(segment_agg(cur, prev))
+    assert np.allclose(items[PVM_EFFECTS].sum(axis=1), items["delta"])
+    by_product = pvm_rollup(items, "product").set_index("product")
+    assert by_product.loc["fresh", "new"] == 8.0 and by_product.loc["gone", "lost"] == -7.0
+    assert by_product.loc["p2", "price"] == -3.0
+    assert list(pvm_top(items, "price", n=5)["product"]) == ["p1", "p2"]
+    assert set(pvm_rollup(items, "store")["store"]) == {"E", "W"}
+
+def test_no_previous_slice_means_no_bridge():
+    cur = _lines([("A", "E", "p1", 1, 1.0)])
+    assert pvm_bridge(segment_agg(cur, None)).empty
@@ -0,0 +1,53 @@
+import pathlib
+import pandas as pd
+from app.analytics import QuarterlyCache, quarterly_report
+from app.kpis import FilterCtx
+
+def load_sample():
+    return pd.read_csv(pathlib.Path("data/samples/sample_orders.csv"), parse_dates=["order_date"])
+
+def test_cached_report_matches_and_reuses_months():
+    df = load_sample()
+    cache = QuarterlyCache()
+    for fiscal_start in (1, 4, 10):
+        for f in (FilterCtx(), FilterCtx(store="East"), FilterCtx(category="Audio", store="West")):
+            expected = quarterly_report(df, f, fiscal_start_month=fiscal_start)
+            got = quarterly_report(df, f, fiscal_start_month=fiscal_start, cache=cache)
+            pd.testing.assert_frame_equal(got, expected)
+    n_months = df["order_date"].dt.to_period("M").nunique()
+    assert cache.months_scanned == n_months          # fiscal/filter toggles never rescan
+
+def test_appended_rows_rescan_only_touched_months():
+    df = load_sample()
+    cache = QuarterlyCache()
+    quarterly_report(df, FilterCtx(), cache=cache)
+    scanned = cache.months_scanned
+    last = df["order_date"].max()
+    extra = pd.DataFrame({"order_id": ["N1", "N2"], "order_date": [last, last + pd.Timedelta(days=40)],
+                          "product": ["Webcam", "Webcam"], "category": ["Peripherals"] * 2,
+                          "store": ["East", "East"], "quantity": [1, 2], "unit_price": [10.0, 10.0],
+                          "revenue": [10.0, 20.0]})
+    grown = pd.concat([df, extra], ignore_index=True)
+    got = quarterly_report(grown, FilterCtx(), cache=cache)
+    assert cache.months_scanned == scanned + 2
+    pd.testing.assert_frame_equal(got, quarterly_report(grown, FilterCtx()))
+
+def test_label_edits_in_closed_months_are_detected():
+    df = load_sample()
+    cache = QuarterlyCache()
+    quarterly_report(df, FilterCtx(store="East"), cache=cache)
+    scanned = cache.months_scanned
+    edited = df.copy()
+    first = edited.index[edited["order_date"] == edited["order_date"].min()][0]
+    edited.loc[first, "store"] = "West" if edited.loc[first, "store"] == "East" else "East"  # same count/revenue
+    got = quarterly_report(edited, FilterCtx(store="East"), cache=cache)
+    assert cache.months_scanned == scanned + 1
+    pd.testing.assert_frame_equal(got, quarterly_report(edited, FilterCtx(store="East")))
+
+def test_unchanged_version_skips_the_history():
+    df = load_sample()
+    cache = QuarterlyCache()
+    expected = quarterly_report(df, FilterCtx(), cache=cache, version=3)
+    pd.testing.assert_frame_equal(quarterly_report(None, FilterCtx(), cache=cache, version=3), expected)
+    grown = pd.concat([df, df.tail(1).assign(order_id="N1")], ignore_index=True)
+    assert quarterly_report(grown, FilterCtx(), cache=cache, version=4)["orders"].sum() == expected["orders"].sum() + 1
@@ -0,0 +1,71 @@
+import os
+import time
+import pandas as pd
+from app.logger import save_run
+from app.run_store import RunStore
+
+def _checked(*statuses):
+    return [{"claim_id": str(i), "status": s} for i, s in enumerate(statuses)]
+
+def test_batches_are_indexed_and_queryable(tmp_path):
+    store = RunStore(tmp_path, flush_s=0.05, batch=3)
+    for i in range(7):
+        status = "❌ MISMATCH" if i == 4 else "✅ VERIFIED"
+        save_run({"i": i}, [], _checked("✅ VERIFIED", status), {"model": "m1" if i % 2 else "m2"},
+                 timings=[{"name": "kpis", "depth": 0, "seconds": 0.01}], store=store)
+    store.flush()
+    assert [p.name for p in tmp_path.iterdir() if p.is_dir()] == []   # no per-run directories
+    idx = store.index()
+    assert len(idx) == 7 and idx["offset"].nunique() == 3            # 3 + 3 + 1 per gzip member
+    assert len(store.index(model="m1")) == 3
+    bad = store.index(status="mismatch")
+    assert len(bad) == 1 and bad.loc[0, "mismatch"] == 1
+    rec = store.get(bad.loc[0, "run_id"])
+    assert rec["payload"] == {"i": 4} and rec["timings"][0]["name"] == "kpis"
+    assert [r["payload"]["i"] for r in store.read(model="m2")] == [0, 2, 4, 6]
+    assert store.index(end="2000-01-01").empty
+    store.close()
+
+def test_rotation_and_retention(tmp_path):
+    store = RunStore(tmp_path, segment_bytes=1, flush_s=0.05, batch=1, retention_days=1)
+    for i in range(3):
+        store.put({"run_id": f"r{i}", "settings": {}, "checked": []})
+        store.flush()
+    segs = sorted(tmp_path.glob("runs-*.jsonl.gz"))
+    assert len(segs) == 3   # every batch fills the 1-byte segment, forcing rotation
+    old = time.time() - 3 * 86400
+    os.utime(segs[0], (old, old))
+    assert store.apply_retention() == 1
+    assert not segs[0].exists()
+    assert sorted(store.index()["run_id"]) == ["r1", "r2"]
+    [day] = tmp_path.glob("index-*.jsonl")
+    assert len(day.read_text().splitlines()) == 3   # appended to only, never rewritten
+    store.close()
+
+def test_index_is_split_by_day_pruned_by_time_and_retired_with_retention(tmp_path):
+    store = RunStore(tmp_path, flush_s=0.05, batch=10, retention_days=5)
+    now = time.time()
+    for days_ago in (9, 3, 0):
+        store.put({"run_id": f"d{days_ago}", "ts": now - days_ago * 86400, "settings": {}, "checked": []})
+    store.flush()
+    assert len(store.index_files()) == 3
+    recent = now - 4 * 86400
+    assert len(store.index_files(start=pd.Timestamp(recent, unit="s"))) == 2
+    assert list(store.index(start=pd.Timestamp(recent, unit="s"))["run_id"]) == ["d3", "d0"]
+    store.apply_retention()
+    assert len(store.index_files()) == 2 and sorted(store.index()["run_id"]) == ["d0", "d3"]
+    store.close()
+
+def test_failed_batch_keeps_the_writer_alive(tmp_path, monkeypatch):
+    store = RunStore(tmp_path, flush_s=0.05, batch=1)
+    write = store._write
+    def broken(records):
+        raise OSError("disk full")
+    monkeypatch.setattr(store, "_write", broken)
+    store.put({"run_id": "lost", "settings": {}, "checked": []})
+    assert store.flush(timeout=5) is False and store.stats["write_errors"] == 1
+    monkeypatch.setattr(store, "_write", write)
+    store.put({"run_id": "kept", "settings": {}, "checked": []})
+    assert store.flush(timeout=5) is True
+    assert list(store.index()["run_id"]) == ["kept"]
+    store.close()
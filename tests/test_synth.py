@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+from app.data_loader import dataset_meta, load_orders, read_manifest
+from app.synth import SynthConfig, generate_chunk, generate_dataset
+
+CFG = SynthConfig(rows=2_500, chunk_rows=1_000, days=120, n_skus=40, n_stores=3, seed=11)
+
+def test_chunks_are_deterministic_and_sized():
+    a, b = generate_chunk(CFG, 2), generate_chunk(CFG, 2)
+    pd.testing.assert_frame_equal(a, b)
+    assert [len(generate_chunk(CFG, i)) for i in range(CFG.n_chunks)] == [1_000, 1_000, 500]
+    lines = a.groupby("order_id").agg(n=("product", "size"), days=("order_date", "nunique"),
+                                      stores=("store", "nunique"))
+    assert lines["n"].max() > 1 and lines["days"].max() == 1 and lines["stores"].max() == 1
+    assert (a["revenue"] == a["quantity"] * a["unit_price"]).all()
+
+def test_output_does_not_depend_on_worker_count(tmp_path):
+    one = generate_dataset(CFG, tmp_path / "one", workers=1)
+    two = generate_dataset(CFG, tmp_path / "two", workers=2)
+    assert one["rows"] == two["rows"] == CFG.rows
+    key = ["order_id", "product", "quantity"]
+    x = load_orders(tmp_path / "one").sort_values(key, ignore_index=True)
+    y = load_orders(tmp_path / "two").sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(x, y)
+    assert x["order_id"].nunique() < len(x)              # multi-line orders
+    assert dataset_meta(tmp_path / "one")["stores"] == sorted(x["store"].unique())
+    assert read_manifest(tmp_path / "one")["version"] == 1
+
+def test_non_empty_output_needs_force(tmp_path):
+    small = SynthConfig(rows=300, chunk_rows=300, days=30, n_skus=10, n_stores=2, seed=3)
+    root = tmp_path / "orders"
+    root.mkdir()
+    (root / "keep.parquet").write_bytes(b"real data")
+    with pytest.raises(FileExistsError):
+        generate_dataset(small, root, workers=1)
+    assert (root / "keep.parquet").exists()
+    assert generate_dataset(small, root, workers=1, force=True)["rows"] == 300
+    assert not (root / "keep.parquet").exists()
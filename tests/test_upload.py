@@ -0,0 +1,52 @@
+import pathlib
+import pandas as pd
+from app.upload import _clean, stream_clean_csv
+
+MAPPING = {"order_id": "Invoice", "order_date": "InvoiceDate", "product": "Description",
+           "quantity": "Qty", "unit_price": "Price", "store": "Country"}
+
+def export_like_pos(tmp_path):
+    df = pd.read_csv(pathlib.Path("data/samples/sample_orders.csv"))
+    raw = df.rename(columns=MAPPING)
+    raw.loc[3, "Qty"] = -1          # returns are dropped
+    raw.loc[5, "InvoiceDate"] = "n/a"  # unparseable dates are dropped
+    fp = tmp_path / "export.csv"
+    raw.to_csv(fp, index=False)
+    return fp
+
+def test_streamed_clean_matches_in_memory_clean(tmp_path):
+    fp = export_like_pos(tmp_path)
+    seen = []
+    streamed, before = stream_clean_csv(str(fp), MAPPING, block_size=8 << 10,
+                                        progress=lambda rows, secs, nbytes: seen.append(rows))
+    raw = pd.read_csv(fp)
+    expected = _clean(pd.DataFrame({tgt: raw[src] for tgt, src in MAPPING.items()}))
+    assert len(seen) > 5 and seen[-1] == len(raw)
+    assert len(streamed) == len(expected) == len(raw) - 2
+    assert streamed["order_date"].is_monotonic_increasing
+    a = streamed.astype({"order_id": str, "product": str, "category": str, "store": str}).sort_values("order_id")
+    b = expected.astype({"quantity": "int64"}).sort_values("order_id")
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True), check_dtype=False)
+    assert before["product"] > 0
+
+def test_streamed_dates_use_one_format_for_every_block(tmp_path):
+    n = 400
+    raw = pd.DataFrame({"Invoice": [f"I{i}" for i in range(2 * n)],
+                        "InvoiceDate": ["13/04/2024"] * n + ["03/04/2024"] * n,  # day-first, ambiguous later
+                        "Description": "Mouse", "Qty": 1, "Price": 9.5, "Country": "East"})
+    fp = tmp_path / "dates.csv"
+    raw.to_csv(fp, index=False)
+    df, _ = stream_clean_csv(str(fp), MAPPING, block_size=4 << 10)
+    assert len(df) == 2 * n
+    assert set(df["order_date"].dt.strftime("%Y-%m-%d")) == {"2024-04-13", "2024-04-03"}
+
+def test_date_format_comes_from_the_first_guessable_date(tmp_path):
+    n = 400
+    raw = pd.DataFrame({"Invoice": [f"I{i}" for i in range(2 * n + 1)],
+                        "InvoiceDate": ["n/a", "13/04/2024"] + ["03/04/2024"] * (2 * n - 1),
+                        "Description": "Mouse", "Qty": 1, "Price": 9.5, "Country": "East"})
+    fp = tmp_path / "dates.csv"
+    raw.to_csv(fp, index=False)
+    df, _ = stream_clean_csv(str(fp), MAPPING, block_size=4 << 10)
+    assert len(df) == 2 * n
+    assert set(df["order_date"].dt.strftime("%Y-%m-%d")) == {"2024-04-13", "2024-04-03"}